@@ -5,6 +5,14 @@
 """
 
 import re
+from bisect import bisect_right
+from itertools import islice
+
+from email_reply_parser import footers as _footers
+from email_reply_parser import locales as _locales
+from email_reply_parser import memory as _memory
+from email_reply_parser import profiles as _profiles
+from email_reply_parser import tracing as _tracing
 
 
 class EmailReplyParser(object):
@@ -12,38 +20,79 @@ class EmailReplyParser(object):
     """
 
     @staticmethod
-    def read(text):
+    def read(text, locales=None, trace=False, profile=None, memory=False, footers=None, cancel=None, progress=None,
+             sampler=None):
         """ Factory method that splits email into list of fragments
 
+            Safe to call from any number of threads at once: every call
+            parses into its own state and shares nothing but compiled
+            regexes.
+
             text - A string email body
+            locales - Optional list of locale names (see locales.LOCALES)
+                      whose quote headers and headers are recognized too
+            trace - Whether to record which rules decided each fragment
+                    (see tracing)
+            profile - Optional profiles.Profile disabling parser stages
+            memory - Whether to report the memory used by the parse
+                     (see memory)
+            footers - Optional footers.FooterDictionary, or phrases, whose
+                      paragraphs are signatures
+            cancel - Optional cancellation.CancellationToken, checked every
+                     EmailMessage.CHECK_INTERVAL lines
+            progress - Optional function called every CHECK_INTERVAL lines
+                       with the number of lines scanned and the total
+            sampler - Optional sampling.Sampler timing the stages of some
+                      of the reads
 
             Returns an EmailMessage instance
         """
-        return EmailMessage(text).read()
+        return EmailMessage(text, locales=locales, trace=trace, profile=profile, memory=memory,
+                            footers=footers, cancel=cancel, progress=progress, sampler=sampler).read()
 
     @staticmethod
-    def parse_reply(text):
+    def parse_reply(text, locales=None, profile=None, footers=None, cancel=None, sampler=None):
         """ Provides the reply portion of email.
 
             text - A string email body
+            locales - Optional list of locale names
+            profile - Optional profiles.Profile disabling parser stages
+            footers - Optional footers.FooterDictionary
+            cancel - Optional cancellation.CancellationToken
+            sampler - Optional sampling.Sampler
 
             Returns reply body message
         """
-        return EmailReplyParser.read(text).reply
+        return EmailMessage(text, locales=locales, profile=profile, footers=footers, cancel=cancel,
+                            sampler=sampler).read_reply()
 
     @staticmethod
-    def parse_chain(text):
+    def parse_chain(text, locales=None, profile=None, footers=None, cancel=None):
         """ Provides the email chain portion (quoted/forwarded content).
 
             text - A string email body
+            locales - Optional list of locale names
+            profile - Optional profiles.Profile disabling parser stages
+            footers - Optional footers.FooterDictionary
+            cancel - Optional cancellation.CancellationToken
 
             Returns email chain content
         """
-        return EmailReplyParser.read(text).chain
+        return EmailReplyParser.read(text, locales=locales, profile=profile, footers=footers, cancel=cancel).chain
 
 
 class EmailMessage(object):
     """ An email message represents a parsed email body.
+
+        read() keeps its scan state in a per-call _ScanState and only
+        publishes finished results on the instance, so an instance may be
+        shared between threads.
+
+        After a read, text is the normalized text the fragments point
+        into. Normalizing is not idempotent (only the first eight Outlook
+        boundaries are separated, for instance), so the message also keeps
+        the text it was given or last assigned, when normalization changed
+        it, and every read() starts over from that text.
     """
 
     SIG_REGEX = re.compile(r'(--|__|-\w)|(^Sent from my (\w+\s*){1,3})')
@@ -54,59 +103,386 @@ class EmailMessage(object):
     FROM_EMAIL_REGEX = re.compile(r'^\*?From:\*?.*@.*')
     # More specific regex for To headers that contain email addresses
     TO_EMAIL_REGEX = re.compile(r'^\*?To:\*?.*@.*')
-    # More specific regex for Sent headers that contain date/time patterns
-    SENT_EMAIL_REGEX = re.compile(r'^\*?Sent:\*?.*\d{1,2}.*\d{4}.*')
+    # More specific regex for Sent headers that contain date/time patterns.
+    # Equivalent to r'^\*?Sent:\*?.*\d{1,2}.*\d{4}.*' but anchored on the first
+    # digit so it cannot backtrack quadratically on long runs of numbers.
+    SENT_EMAIL_REGEX = re.compile(r'^\*?Sent:\*?[^\d\n]*\d.*\d{4}')
     # More specific regex for Subject headers
     SUBJECT_EMAIL_REGEX = re.compile(r'^\*?Subject:\*?.*')
     # Regex for asterisk-wrapped headers (Outlook format)
     ASTERISK_HEADER_REGEX = re.compile(r'^\*?(From|Sent|To|Subject):\*?.*')
-    # Regex for concatenated headers (multiple headers on one line)
+    # Regex for concatenated headers (multiple headers on one line).
+    # Applied through _has_concatenated_headers(), which is linear.
     CONCATENATED_HEADERS_REGEX = re.compile(r'From:.*Sent:.*To:.*Subject:')
+    CONCATENATED_HEADERS = ('From:', 'Sent:', 'To:', 'Subject:')
+    # Applied through _find_multi_quote_header(), which is linear.
     _MULTI_QUOTE_HDR_REGEX = r'(?!On.*On\s.+?wrote:)(On\s(.+?)wrote:)'
     MULTI_QUOTE_HDR_REGEX = re.compile(_MULTI_QUOTE_HDR_REGEX, re.DOTALL | re.MULTILINE)
     MULTI_QUOTE_HDR_REGEX_MULTILINE = re.compile(_MULTI_QUOTE_HDR_REGEX, re.DOTALL)
+    # Outlook style reply immediately above the signature boundary line.
+    # Applied line by line through OUTLOOK_BOUNDARY_REGEX in _normalize().
+    OUTLOOK_SEPARATOR_REGEX = re.compile('([^\n])(?=\n ?[_-]{7,})')
+    OUTLOOK_BOUNDARY_REGEX = re.compile(' ?[_-]{7,}')
+    OUTLOOK_BOUNDARY_STARTS = (' ', '_', '-')
+    # Inline headers without a preceding line break.
+    # Applied through _inline_header_starts(), which is linear.
+    INLINE_HEADERS_REGEX = re.compile(
+        r'(?<!\n)(?<!\*)(From:[^@\n]*@[^\n]*?(?:Sent:|To:|Subject:)[^\n]*?(?:Sent:|To:|Subject:))')
+    INLINE_HEADER_MARKER_REGEX = re.compile('Sent:|To:|Subject:')
+    # A line that is neither blank nor quoted, which ends a quoted tail.
+    # Applied through _unquoted_line().
+    UNQUOTED_LINE_REGEX = re.compile(r'^(?![^\S\n]*$|>)', re.MULTILINE)
+    # Lines longer than twice this many characters (base64 pasted inline,
+    # minified JSON, log dumps) are classified by their first and last
+    # LINE_WINDOW characters only, and the fragments holding them are
+    # flagged opaque.
+    LINE_WINDOW = 1024
+    # Lines scanned between two checks of the cancellation token and two
+    # calls of the progress callback
+    CHECK_INTERVAL = 4096
 
-    def __init__(self, text):
+    def __init__(self, text, locales=None, trace=False, profile=None, memory=False, footers=None, cancel=None,
+                 progress=None, sampler=None):
         self.fragments = []
         self.fragment = None
         self.text = text.replace('\r\n', '\n')
         self.found_visible = False
+        self.locales = _locales.matcher(locales) if locales else None
+        self.footers = _footers.dictionary(footers) if footers is not None else None
+        self.tracing = trace
+        self.profile = profile or _profiles.DEFAULT
+        self.trace = None
+        self.measuring = memory
+        self.memory = None
+        self.reply_spans = None
+        self.cancel = cancel
+        self.progress = progress
+        self.sampler = sampler
 
-    def read(self):
+    def read(self, table=None):
         """ Creates new fragment for each line
             and labels as a signature, quote, or hidden.
 
+            table - Optional LineTable of the text, whose lines and line
+                    rules are used instead of normalizing and classifying
+                    again; the line rules are then not traced
+
             Returns EmailMessage instance
         """
 
-        self.found_visible = False
+        sampled = self.sampler is not None and self.sampler.tick()
+        measured = _memory.start() if self.measuring else None
+        try:
+            trace = _tracing.Trace() if self.tracing else None
+            if trace is not None or sampled:
+                started = _tracing.clock()
+            if trace is not None:
+                trace.messages = 1
+            state = self._prepare(table, trace)
+            if trace is not None or sampled:
+                normalized = _tracing.clock()
+            if trace is not None and table is None:
+                trace.time(_tracing.NORMALIZE, normalized - started, True)
 
-        is_multi_quote_header = self.MULTI_QUOTE_HDR_REGEX_MULTILINE.search(self.text)
-        if is_multi_quote_header:
-            self.text = self.MULTI_QUOTE_HDR_REGEX.sub(is_multi_quote_header.groups()[0].replace('\n', ''), self.text)
+            self._scan(state)
+            if sampled:
+                scanned = _tracing.clock()
+            self._publish(state)
+        except BaseException:
+            if measured is not None:
+                _memory.finish(measured)
+            raise
 
-        # Fix any outlook style replies, with the reply immediately above the signature boundary line
-        #   See email_2_2.txt for an example
-        self.text = re.sub('([^\n])(?=\n ?[_-]{7,})', '\\1\n', self.text, re.MULTILINE)
+        if sampled:
+            self.sampler.record(state.source, normalized - started, scanned - normalized, _tracing.clock() - scanned)
+        if measured is not None:
+            self.memory = _memory.report(self, state, _memory.finish(measured))
+        return self
 
-        # Fix inline headers by adding line breaks before them
-        # This helps parse headers that appear without line breaks
-        # Only split when we detect a complete email header sequence with email addresses
-        # Look for From: with email address followed by other headers
-        self.text = re.sub(r'(?<!\n)(?<!\*)(From:[^@\n]*@[^\n]*?(?:Sent:|To:|Subject:)[^\n]*?(?:Sent:|To:|Subject:))', r'\n\1', self.text)
+    def read_reply(self, table=None):
+        """ Finds the reply like read().reply without building the fragments.
 
-        self.lines = self.text.split('\n')
-        self.lines.reverse()
+            Lines are normalized and classified from the top, and the read
+            stops at the first line below which nothing can be part of the
+            reply or change it: a header line, which starts or joins a
+            header block hiding everything below it, or a quoted line
+            followed by nothing but quoted and blank lines. The text below
+            that line is not split into lines, except as far as the
+            look-ahead of a long dash line needs. Finished fragments are
+            reduced to the lines of those in the reply, so nothing is
+            copied out of hidden or quoted text.
+
+            Sets reply_spans to the (start, end) offsets of the parts of
+            the reply in the normalized text. The whole text is normalized
+            only when text is next accessed.
+
+            table - Optional LineTable of the text
+
+            Returns the reply string
+        """
+        sampled = self.sampler is not None and self.sampler.tick()
+        if sampled:
+            started = _tracing.clock()
+        if table is None:
+            state = self._prepare_reply()
+        else:
+            state = self._prepare(table)
+            self._stop_at_hidden(state)
+        state.spans = []
+
+        if sampled:
+            normalized = _tracing.clock()
+        self._scan(state)
+        if sampled:
+            scanned = _tracing.clock()
+        self._finish_fragment(state)
+
+        lines = state.lines
+        spans = []
+        parts = []
+        for first, last in reversed(state.spans):
+            part = lines[first] if first == last else '\n'.join(lines[first:last + 1])
+            content = part.strip()
+            start = state.offsets[first] + (len(part) - len(part.lstrip()) if content else 0)
+            spans.append((start, start + len(content)))
+            parts.append(content)
+
+        self._text = state.text
+        self.reply_spans = spans
+        reply = '\n'.join(parts)
+        if sampled:
+            self.sampler.record(state.source, normalized - started, scanned - normalized, _tracing.clock() - scanned)
+        return reply
+
+    def line_table(self):
+        """ Normalizes the text and applies the line rules to every line,
+            once for any number of reads with different assembly settings.
+
+            Returns a LineTable
+        """
+        text, lines, offsets = self._normalize(self._source, self.profile)
+        window = self._line_window
+        features = [LineTable.pack(*self._classify(window(line))) for line in lines]
+        return LineTable(self._source, text, lines, offsets, features, self.profile, self.locales)
+
+    def _prepare(self, table, trace=None):
+        """ Starts a read, from a LineTable when given one.
+
+            Returns the _ScanState of the read
+        """
+        source = self._source
+        if table is None:
+            text, lines, offsets = self._normalize(source, self.profile)
+            state = _ScanState(text, lines, offsets, trace)
+            state.source = source
+            return state
+        if source is not table.source and source != table.source:
+            raise ValueError('The line table was built from another text')
+        if table.locales is not self.locales:
+            raise ValueError('The line table was built with other locales')
+        for stage in LineTable.STAGES:
+            if getattr(table.profile, stage) != getattr(self.profile, stage):
+                raise ValueError('The line table was built with stage %r %s'
+                                 % (stage, 'enabled' if getattr(table.profile, stage) else 'disabled'))
+        state = _ScanState(table.text, table.lines, table.offsets, trace)
+        state.source = table.source
+        state.features = table.features
+        return state
+
+    def _prepare_reply(self):
+        """ Starts a read_reply() without a LineTable: normalizes and
+            classifies the lines from the top, up to the first line below
+            which nothing can be part of the reply.
+
+            Returns the _ScanState of the read, with the line rules applied
+        """
+        text = self._source
+        merge = self._multi_quote_header_lines(text) if self.profile.multi_quote_header else None
+        return self._classify_reply(text, _TextLines(text), merge, 'From:' in text, self._unquoted_line)
+
+    def _classify_reply(self, text, reader, merge, has_from, unquoted_line):
+        """ Normalizes and classifies lines for _prepare_reply() until the
+            first line below which nothing can be part of the reply.
+
+            text - the email body
+            reader - iterator over the lines of text, whose pos attribute
+                     is the offset of the next line, None after the last one
+            merge - what _multi_quote_header_lines() found, or None
+            has_from - whether text holds a "From:"
+            unquoted_line - _unquoted_line() or an equivalent for text
+
+            Returns the _ScanState of the read, with the line rules applied
+        """
+        profile = self.profile
+        normalized = self._normalized_lines(reader, merge, profile, profile.inline_headers and has_from)
+
+        window = self._line_window
+        lines = []
+        offsets = []
+        features = []
+        offset = 0
+        # Offset of a line that keeps the text from ending in a quoted tail
+        unquoted = -1
+        for line, source in normalized:
+            bits = LineTable.pack(*self._classify(window(line)))
+            lines.append(line)
+            offsets.append(offset)
+            features.append(bits)
+            offset += len(line) + 1
+            if self._hides_below(line, bits):
+                break
+            if bits & LineTable.QUOTED and source is not None and reader.pos is not None and reader.pos > unquoted:
+                unquoted = unquoted_line(text, reader.pos, merge)
+                if unquoted is None:
+                    break
+            if self.cancel is not None and not len(lines) % self.CHECK_INTERVAL:
+                self.cancel.check()
+
+        state = _ScanState(None, lines, offsets)
+        state.source = text
+        state.features = features
+        state.rest = (line for line, _ in normalized)
+        return state
+
+    def _stop_at_hidden(self, state):
+        """ Drops the lines of a state read from a LineTable below the
+            first one that hides everything below it, as _prepare_reply()
+            does.
+
+            state - the _ScanState of the current read_reply() call
+        """
+        for i, (line, bits) in enumerate(zip(state.lines, state.features)):
+            if self._hides_below(line, bits):
+                state.rest = islice(state.lines, i + 1, None)
+                state.lines = state.lines[:i + 1]
+                state.offsets = state.offsets[:i + 1]
+                state.features = state.features[:i + 1]
+                return
+
+    @staticmethod
+    def _hides_below(line, bits):
+        """ Decides whether a line is in a header block whatever follows it.
+
+            A header line that is not a quote header starts a headers
+            fragment, or joins one, and a headers fragment hides every
+            fragment below it. Lines starting with a dash are left out, as
+            the bullet count of a signature check could reach below them.
+
+            line - a normalized row of the email message
+            bits - its LineTable feature bits
+
+            Returns True or False
+        """
+        return bits & LineTable.HEADER and not bits & LineTable.QUOTE_HEADER and not line.lstrip().startswith('-')
+
+    @classmethod
+    def _unquoted_line(cls, text, pos, merge):
+        """ Finds the first line from pos on that keeps the rest of the text
+            from being a quoted tail, in which every line is blank or
+            quoted and stays so once normalized. Below a quoted line, such
+            a tail only holds hidden and quoted fragments.
+
+            text - the email body
+            pos - offset of a line in text
+            merge - what _multi_quote_header_lines() found, or None
+
+            Returns the offset of that line, or None when there is none
+        """
+        match = cls.UNQUOTED_LINE_REGEX.search(text, pos)
+        limit = match.start() if match else len(text)
+        if merge is not None:
+            # Collapsing the quote header lines could make up an inline header
+            start = text.rfind('\n', 0, merge[2]) + 1
+            end = text.find('\n', merge[3])
+            if start >= pos and text.find('From:', start, len(text) if end < 0 else end) >= 0:
+                limit = min(limit, start)
+        found = text.find('From:', pos, limit)
+        while found >= 0:
+            start = text.rfind('\n', 0, found) + 1
+            end = text.find('\n', found)
+            if end < 0:
+                end = len(text)
+            if cls._inline_header_starts(text[start:end]):
+                return start
+            found = text.find('From:', end, limit)
+        return limit if limit < len(text) else None
+
+    def _scan(self, state):
+        """ Scans the lines bottom-up, checking the cancellation token and
+            reporting progress every CHECK_INTERVAL lines.
+
+            state - the _ScanState of the current read() call
+        """
+        lines = state.lines
+        features = state.features
+        if self.cancel is None and self.progress is None:
+            if features is None:
+                for line in reversed(lines):
+                    self._scan_line(state, line)
+            else:
+                for line, bits in zip(reversed(lines), reversed(features)):
+                    self._scan_line(state, line, LineTable.FEATURES[bits])
+            return
+
+        if self.cancel is not None:
+            self.cancel.check()
+        total = len(lines)
+        remaining = reversed(lines) if features is None else zip(reversed(lines), reversed(features))
+        done = 0
+        while done < total:
+            for item in islice(remaining, self.CHECK_INTERVAL):
+                if features is None:
+                    self._scan_line(state, item)
+                else:
+                    self._scan_line(state, item[0], LineTable.FEATURES[item[1]])
+            done = min(done + self.CHECK_INTERVAL, total)
+            if self.cancel is not None:
+                self.cancel.check()
+            if self.progress is not None:
+                self.progress(done, total)
+
+    def _publish(self, state):
+        """ Finishes a scan and publishes its results on the instance.
+
+            state - the _ScanState of the current read() call
 
-        for line in self.lines:
-            self._scan_line(line)
+            Returns EmailMessage instance
+        """
+        self._finish_fragment(state)
 
-        self._finish_fragment()
+        state.fragments.reverse()
 
-        self.fragments.reverse()
+        self._text = state.text
+        self.fragments = state.fragments
+        self.fragment = None
+        self.found_visible = state.found_visible
+        self.trace = state.trace
 
         return self
 
+    @property
+    def text(self):
+        """ The text of the message, normalized once it has been read
+        """
+        text = self._text
+        if text is None:
+            # read_reply() does not normalize the whole text
+            text = self._text = self._normalize(self._source, self.profile)[0]
+        return text
+
+    @text.setter
+    def text(self, text):
+        # The text every read() starts from
+        self._source = text
+        self._text = text
+
+    @property
+    def lines(self):
+        """ Lines of the text, last line first. Rebuilt on every access
+            rather than kept after read().
+        """
+        return self.text.split('\n')[::-1]
+
     @property
     def reply(self):
         """ Captures reply message within email
@@ -127,64 +503,75 @@ class EmailMessage(object):
                 chain.append(f.content)
         return '\n'.join(chain)
 
-    def _scan_line(self, line):
+    def _scan_line(self, state, line, features=None):
         """ Reviews each line in email message and determines fragment type
 
+            state - the _ScanState of the current read() call
             line - a row of text from an email message
+            features - (is_quote_header, is_quoted, is_header) of the line
+                       when already known from a LineTable
         """
-        is_quote_header = self.QUOTE_HDR_REGEX.match(line) is not None
-        is_quoted = self.QUOTED_REGEX.match(line) is not None
-        
-        # Check for asterisk-wrapped headers first (Outlook format)
-        is_asterisk_header = self.ASTERISK_HEADER_REGEX.match(line) is not None and line.count('*') >= 2
-        
-        # Check for concatenated headers (multiple headers on one line)
-        is_concatenated_headers = self.CONCATENATED_HEADERS_REGEX.search(line) is not None
-        
-        # Use more specific logic for regular headers to avoid matching body text
-        is_from_header = line.startswith('From:') and not line.startswith('*From:') and self.FROM_EMAIL_REGEX.match(line) is not None
-        is_to_header = line.startswith('To:') and not line.startswith('*To:') and self.TO_EMAIL_REGEX.match(line) is not None
-        is_sent_header = line.startswith('Sent:') and not line.startswith('*Sent:') and self.SENT_EMAIL_REGEX.match(line) is not None
-        is_subject_header = line.startswith('Subject:') and not line.startswith('*Subject:') and self.SUBJECT_EMAIL_REGEX.match(line) is not None
-        
-        is_header = is_quote_header or is_asterisk_header or is_concatenated_headers or is_from_header or is_to_header or is_sent_header or is_subject_header
+        # Everything below looks at a bounded window of the line
+        raw_line = line
+        line = self._line_window(raw_line)
+        is_blank = not line or line.isspace()
+
+        trace = state.trace
+        if features is not None:
+            is_quote_header, is_quoted, is_header = features
+            fired = ()
+        elif trace is None:
+            is_quote_header, is_quoted, is_header = self._classify(line)
+        else:
+            is_quote_header, is_quoted, is_header, fired = self._classify_traced(trace, line)
+
+        if state.footer:
+            # The line below is a known footer, which ends the signature
+            # fragment it tops
+            self._finish_fragment(state)
+            state.footer = False
 
-        if self.fragment and len(line.strip()) == 0:
-            last_line = self.fragment.lines[-1].strip()
+        if state.fragment and is_blank:
+            if trace is not None:
+                started = _tracing.clock()
+            rule = _tracing.SIGNATURE_CHECK
+            raw_last_line = state.fragment.lines[-1]
+            last_line = self._line_window(raw_last_line).strip()
             if self.SIG_REGEX.match(last_line):
                 # Check if this looks like a real signature or content
                 is_signature = False
                 
                 if last_line.startswith('Sent from my'):
+                    rule = _tracing.SENT_FROM_MY
                     is_signature = True
                 elif last_line.startswith('--') and not any(c.isalpha() for c in last_line):
                     # Pure dash separators like "--------" 
                     # Only apply look-ahead for long dash lines (8+ characters) that might be content separators
+                    rule = _tracing.DASH_SIGNATURE
                     if len(last_line) >= 8:
-                        # Check if there's substantial content after this line that suggests it's a content separator
-                        remaining_lines = self.text.split('\n')[self.text.count('\n', 0, self.text.find(last_line)) + 1:]
-                        
-                        # Look for signs this is quoted content (email headers, etc.) vs meaningful content
-                        has_email_headers = any('From:' in line or 'Sent:' in line or 'Subject:' in line for line in remaining_lines[:5])
-                        meaningful_content_lines = [l for l in remaining_lines if l.strip() and len(l.strip()) > 20 and not l.strip().startswith('*') and 'From:' not in l and 'Sent:' not in l]
-                        
-                        # Only treat as content separator if there's substantial meaningful content AND no email headers
-                        if len(meaningful_content_lines) >= 3 and not has_email_headers:
-                            pass  # Don't mark as signature - treat as content separator
+                        if len(raw_last_line) > 2 * self.LINE_WINDOW:
+                            # Located by its leading window only
+                            separator = raw_last_line.lstrip()[:self.LINE_WINDOW]
                         else:
+                            separator = last_line
+                        if not self.profile.dash_lookahead or not self._is_content_separator(state, separator):
                             is_signature = True
+                        else:
+                            rule = _tracing.DASH_LOOKAHEAD
                     else:
                         # Short dash patterns like "--" are always signatures
                         is_signature = True
                 elif last_line.startswith('__') and not any(c.isalpha() for c in last_line):
                     # Pure underscore separators
+                    rule = _tracing.UNDERSCORE_SIGNATURE
                     is_signature = True
                 elif last_line.startswith('-') and len(last_line.split()) <= 3:
                     # Single dash lines - check if it's part of a bullet list
                     # Count consecutive lines starting with single dash
+                    rule = _tracing.BULLET_COUNTER
                     consecutive_dash_lines = 0
-                    for i in range(len(self.fragment.lines) - 1, -1, -1):
-                        line_content = self.fragment.lines[i].strip()
+                    for i in range(len(state.fragment.lines) - 1, -1, -1):
+                        line_content = state.fragment.lines[i].lstrip()
                         if line_content.startswith('-') and not line_content.startswith('--'):
                             consecutive_dash_lines += 1
                         else:
@@ -195,18 +582,126 @@ class EmailMessage(object):
                     if consecutive_dash_lines == 1:
                         is_signature = True
                 
+                if trace is not None and rule != _tracing.SIGNATURE_CHECK:
+                    trace.fire(state.fragment, rule)
+
                 if is_signature:
-                    self.fragment.signature = True
-                    self._finish_fragment()
+                    state.fragment.signature = True
+                    self._finish_fragment(state)
 
-        if self.fragment \
-                and ((self.fragment.headers == is_header and self.fragment.quoted == is_quoted) or
-                         (self.fragment.quoted and (is_quote_header or len(line.strip()) == 0))):
+            if trace is not None:
+                trace.time(rule, _tracing.clock() - started, rule != _tracing.SIGNATURE_CHECK)
 
-            self.fragment.lines.append(line)
+        if state.fragment \
+                and ((state.fragment.headers == is_header and state.fragment.quoted == is_quoted) or
+                         (state.fragment.quoted and (is_quote_header or is_blank))):
+
+            state.fragment.lines.append(raw_line)
         else:
-            self._finish_fragment()
-            self.fragment = Fragment(is_quoted, line, headers=is_header)
+            self._finish_fragment(state)
+            state.fragment = Fragment(is_quoted, raw_line, headers=is_header)
+        if self.footers is not None and not is_blank and not (state.fragment.quoted or state.fragment.headers):
+            if trace is not None:
+                started = _tracing.clock()
+            state.footer = self.footers.search(line)
+            if trace is not None:
+                trace.time(_tracing.FOOTER, _tracing.clock() - started, state.footer)
+            if state.footer:
+                # The footer line and everything below it in the fragment
+                # are a signature
+                state.fragment.signature = True
+                if trace is not None:
+                    trace.fire(state.fragment, _tracing.FOOTER)
+        if line is not raw_line:
+            state.fragment.opaque = True
+        if trace is not None:
+            for rule in fired:
+                trace.fire(state.fragment, rule)
+
+    def _classify(self, line):
+        """ Applies the line rules
+
+            line - a row of the email message, bounded by _line_window()
+
+            Returns (is_quote_header, is_quoted, is_header)
+        """
+        is_quoted = self.QUOTED_REGEX.match(line) is not None
+        if self.locales is None and ':' not in line:
+            # Every header and quote header rule needs a colon
+            return False, is_quoted, False
+
+        is_quote_header = self.QUOTE_HDR_REGEX.match(line) is not None
+        
+        # Check for asterisk-wrapped headers first (Outlook format)
+        is_asterisk_header = self.ASTERISK_HEADER_REGEX.match(line) is not None and line.count('*') >= 2
+        
+        # Check for concatenated headers (multiple headers on one line)
+        is_concatenated_headers = self.profile.concatenated_headers and self._has_concatenated_headers(line)
+        
+        # Use more specific logic for regular headers to avoid matching body text
+        is_from_header = line.startswith('From:') and not line.startswith('*From:') and self.FROM_EMAIL_REGEX.match(line) is not None
+        is_to_header = line.startswith('To:') and not line.startswith('*To:') and self.TO_EMAIL_REGEX.match(line) is not None
+        is_sent_header = line.startswith('Sent:') and not line.startswith('*Sent:') and self.SENT_EMAIL_REGEX.match(line) is not None
+        is_subject_header = line.startswith('Subject:') and not line.startswith('*Subject:') and self.SUBJECT_EMAIL_REGEX.match(line) is not None
+        
+        is_header = is_quote_header or is_asterisk_header or is_concatenated_headers or is_from_header or is_to_header or is_sent_header or is_subject_header
+
+        if self.locales is not None and not is_header:
+            kind = self.locales.match(line)
+            is_quote_header = kind == _locales.QUOTE_HEADER
+            is_header = kind != 0
+
+        return is_quote_header, is_quoted, is_header
+
+    def _classify_traced(self, trace, line):
+        """ Applies the line rules one by one, timing each
+
+            Must decide exactly like _classify().
+
+            trace - the tracing.Trace of the current read() call
+            line - a row of the email message, bounded by _line_window()
+
+            Returns (is_quote_header, is_quoted, is_header, fired rule ids)
+        """
+        clock = _tracing.clock
+        fired = []
+
+        def timed(rule, check):
+            started = clock()
+            hit = check()
+            trace.time(rule, clock() - started, hit)
+            if hit:
+                fired.append(rule)
+            return hit
+
+        is_quote_header = timed(_tracing.QUOTE_HEADER, lambda: self.QUOTE_HDR_REGEX.match(line) is not None)
+        is_quoted = timed(_tracing.QUOTED, lambda: self.QUOTED_REGEX.match(line) is not None)
+        is_asterisk_header = timed(_tracing.ASTERISK_HEADER, lambda: (
+            self.ASTERISK_HEADER_REGEX.match(line) is not None and line.count('*') >= 2))
+        is_concatenated_headers = self.profile.concatenated_headers and \
+            timed(_tracing.CONCATENATED_HEADERS, lambda: self._has_concatenated_headers(line))
+        is_from_header = timed(_tracing.FROM_HEADER, lambda: (
+            line.startswith('From:') and self.FROM_EMAIL_REGEX.match(line) is not None))
+        is_to_header = timed(_tracing.TO_HEADER, lambda: (
+            line.startswith('To:') and self.TO_EMAIL_REGEX.match(line) is not None))
+        is_sent_header = timed(_tracing.SENT_HEADER, lambda: (
+            line.startswith('Sent:') and self.SENT_EMAIL_REGEX.match(line) is not None))
+        is_subject_header = timed(_tracing.SUBJECT_HEADER, lambda: (
+            line.startswith('Subject:') and self.SUBJECT_EMAIL_REGEX.match(line) is not None))
+
+        is_header = is_quote_header or is_asterisk_header or is_concatenated_headers or is_from_header \
+            or is_to_header or is_sent_header or is_subject_header
+
+        if self.locales is not None and not is_header:
+            started = clock()
+            kind = self.locales.match(line)
+            trace.time(_tracing.LOCALE, clock() - started, kind != 0)
+            if kind:
+                fired.append(_tracing.LOCALE)
+            is_quote_header = kind == _locales.QUOTE_HEADER
+            is_header = kind != 0
+
+        return is_quote_header, is_quoted, is_header, fired
 
     def quote_header(self, line):
         """ Determines whether line is part of a quoted area
@@ -217,34 +712,458 @@ class EmailMessage(object):
         """
         return self.QUOTE_HDR_REGEX.match(line[::-1]) is not None
 
-    def _finish_fragment(self):
+    @classmethod
+    def _line_window(cls, line):
+        """ Bounds the part of a line the classifier looks at
+
+            line - a row of the email message
+
+            Returns the line itself, or its first and last LINE_WINDOW
+            characters joined by a space when it is longer than twice that
+        """
+        window = cls.LINE_WINDOW
+        if len(line) <= 2 * window:
+            return line
+        return line[:window] + ' ' + line[-window:]
+
+    @classmethod
+    def _has_concatenated_headers(cls, line):
+        """ Linear equivalent of CONCATENATED_HEADERS_REGEX.search(line)
+
+            line - a row of the email message
+
+            Returns True or False
+        """
+        pos = 0
+        for header in cls.CONCATENATED_HEADERS:
+            pos = line.find(header, pos)
+            if pos < 0:
+                return False
+            pos += len(header)
+        return True
+
+    @staticmethod
+    def _find_multi_quote_header(text):
+        """ Linear equivalent of MULTI_QUOTE_HDR_REGEX_MULTILINE.search(text)
+
+            The regex picks the last "On<whitespace>" that still has a "wrote:"
+            after it, which can be found directly instead of backtracking from
+            every "On" in the text.
+
+            text - the email body
+
+            Returns (start, end) of the quote header or None
+        """
+        wrote = text.rfind('wrote:')
+        if wrote < 0:
+            return None
+        start = text.rfind('On', 0, max(wrote - 2, 0))
+        while start >= 0 and not text[start + 2].isspace():
+            start = text.rfind('On', 0, start + 1)
+        if start < 0:
+            return None
+        return start, text.find('wrote:', start + 4) + len('wrote:')
+
+    @classmethod
+    def _inline_header_starts(cls, line, first_line=False):
+        """ Linear equivalent of INLINE_HEADERS_REGEX applied to one line
+
+            Once a "From:" fails to match, every later "From:" on the line
+            fails too, so the search stops there.
+
+            line - a row of the email message
+            first_line - whether the line starts the email body, in which
+                         case a header at its very start is split off too
+
+            Returns the positions at which a line break is inserted
+        """
+        starts = []
+        pos = line.find('From:')
+        while pos >= 0:
+            if (pos == 0 and not first_line) or (pos > 0 and line[pos - 1] == '*'):
+                pos = line.find('From:', pos + 1)
+                continue
+            at = line.find('@', pos + 5)
+            first = at >= 0 and cls.INLINE_HEADER_MARKER_REGEX.search(line, at + 1)
+            second = first and cls.INLINE_HEADER_MARKER_REGEX.search(line, first.end())
+            if not second:
+                break
+            starts.append(pos)
+            pos = line.find('From:', second.end())
+        return starts
+
+    @classmethod
+    def _normalize(cls, text, profile=_profiles.DEFAULT):
+        """ Rewrites the email body in a single pass over its lines.
+
+            Collapses a multi-line quote header onto one line, separates
+            Outlook style replies from the boundary line right below them
+            and breaks inline headers onto their own lines.
+
+            text - the email body
+            profile - the profiles.Profile whose stages are applied
+
+            Returns (text, lines, offsets), offsets[i] being the position
+            of lines[i] in the normalized text
+        """
+        lines = text.split('\n')
+        merge = cls._multi_quote_header_lines(text) if profile.multi_quote_header else None
+
+        out = []
+        offsets = []
+        offset = 0
+        changed = merge is not None
+        for line, source in cls._normalized_lines(lines, merge, profile, profile.inline_headers and 'From:' in text):
+            if source is None:
+                changed = True
+            out.append(line)
+            offsets.append(offset)
+            offset += len(line) + 1
+
+        # An unchanged body is not copied again
+        return ('\n'.join(out) if changed else text), out, offsets
+
+    @classmethod
+    def _multi_quote_header_lines(cls, text):
+        """ Finds the lines a multi-line quote header is wrapped over.
+
+            text - the email body
+
+            Returns (first, last, start, end): the indices of the first and
+            the last of those lines and the offsets of the quote header in
+            text, or None when there is no quote header
+        """
+        span = cls._find_multi_quote_header(text)
+        if not span:
+            return None
+        start, end = span
+        first = text.count('\n', 0, start)
+        return first, first + text.count('\n', start, end), start, end
+
+    @classmethod
+    def _normalized_lines(cls, lines, merge, profile, inline_headers):
+        """ Rewrites the lines of an email body one at a time, for
+            _normalize() and for reads that stop before the last line.
+
+            lines - iterable over the lines of the body
+            merge - what _multi_quote_header_lines() found, or None
+            profile - the profiles.Profile whose stages are applied
+            inline_headers - whether to break inline headers onto their
+                             own lines, which needs a "From:" in the body
+
+            Yields (line, source) pairs, source being the index of the line
+            of the body when it is yielded unchanged and None otherwise
+        """
+        first, last = merge[:2] if merge else (-1, -1)
+        merged = None
+        previous = None
+        # Fix any outlook style replies, with the reply immediately above the signature boundary line
+        #   See email_2_2.txt for an example
+        # Only the first eight are fixed: the original re.sub call received re.MULTILINE (== 8)
+        # as its count argument, and that behavior is kept.
+        boundaries = 8 if profile.outlook_separator else 0
+        for i, line in enumerate(lines):
+            source = i
+            if first <= i <= last:
+                # The quote header lines are collapsed onto the first one
+                if i == first:
+                    merged = [line]
+                else:
+                    merged.append(line)
+                if i < last:
+                    continue
+                line = ''.join(merged)
+                source = None
+
+            if boundaries and previous and line.startswith(cls.OUTLOOK_BOUNDARY_STARTS) \
+                    and cls.OUTLOOK_BOUNDARY_REGEX.match(line):
+                boundaries -= 1
+                yield '', None
+
+            # Fix inline headers by adding line breaks before them
+            # This helps parse headers that appear without line breaks
+            # Only split when we detect a complete email header sequence with email addresses
+            # Look for From: with email address followed by other headers
+            if inline_headers and 'From:' in line:
+                starts = cls._inline_header_starts(line, previous is None)
+                if starts:
+                    begin = 0
+                    for pos in starts:
+                        yield line[begin:pos], None
+                        begin = pos
+                    line = line[begin:]
+                    source = None
+
+            previous = line
+            yield line, source
+
+    def _is_content_separator(self, state, separator):
+        """ Decides whether a long dash line separates content rather than
+            starting a signature, based on the lines that follow it.
+
+            state - the _ScanState of the current read() call
+            separator - the stripped dash line
+
+            Returns True or False
+        """
+        forward = state.lines
+        if state.meaningful_after is None:
+            # Number of meaningful lines from each line to the end of the text,
+            # counted up to three only below the lines of a read_reply() scan
+            counts = [0] * (len(forward) + 1)
+            if state.rest is not None:
+                counts[-1] = self._meaningful_below(state, 3)
+            for i in range(len(forward) - 1, -1, -1):
+                counts[i] = counts[i + 1] + self._is_meaningful(forward[i])
+            state.meaningful_after = counts
+
+        index = state.separator_lines.get(separator)
+        if index is None:
+            if state.text is None:
+                index = next(i for i, line in enumerate(forward) if separator in line)
+            else:
+                index = bisect_right(state.offsets, state.text.find(separator)) - 1
+            state.separator_lines[separator] = index
+
+        # Look for signs this is quoted content (email headers, etc.) vs meaningful content
+        following = forward[index + 1:index + 6]
+        if len(following) < 5 and state.rest is not None:
+            following += self._lines_below(state, 5 - len(following))
+        has_email_headers = any('From:' in line or 'Sent:' in line or 'Subject:' in line
+                                for line in map(self._line_window, following))
+
+        # Only treat as content separator if there's substantial meaningful content AND no email headers
+        return state.meaningful_after[index + 1] >= 3 and not has_email_headers
+
+    def _is_meaningful(self, line):
+        """ Decides whether a line below a long dash line is content.
+
+            line - a row of the email message
+
+            Returns True or False
+        """
+        l = self._line_window(line)
+        stripped = l.strip()
+        return len(stripped) > 20 and not stripped.startswith('*') and 'From:' not in l and 'Sent:' not in l
+
+    def _lines_below(self, state, count):
+        """ Normalizes the lines below those of a read_reply() scan as far
+            as needed.
+
+            state - the _ScanState of the current read_reply() call
+            count - number of lines wanted
+
+            Returns up to count lines from the first line below
+        """
+        below = state.below
+        while len(below) < count:
+            line = next(state.rest, None)
+            if line is None:
+                break
+            below.append(line)
+        return below[:count]
+
+    def _meaningful_below(self, state, most):
+        """ Counts the meaningful lines below those of a read_reply() scan,
+            normalizing no more of them than needed.
+
+            state - the _ScanState of the current read_reply() call
+            most - number of meaningful lines after which to stop counting
+
+            Returns the count
+        """
+        count = 0
+        i = 0
+        while count < most and i < len(self._lines_below(state, i + 1)):
+            count += self._is_meaningful(state.below[i])
+            i += 1
+        return count
+
+    def _finish_fragment(self, state):
         """ Creates fragment
+
+            state - the _ScanState of the current read() call
         """
 
-        if self.fragment:
-            self.fragment.finish()
-            if self.fragment.headers:
+        if state.fragment:
+            # The fragment holds the lines right above those already consumed
+            last = len(state.lines) - state.consumed - 1
+            state.consumed += len(state.fragment.lines)
+            state.fragment.start = state.offsets[len(state.lines) - state.consumed]
+            state.fragment.end = state.offsets[last] + len(state.lines[last])
+            lean = state.spans is not None
+            if lean:
+                blank = all(not line or line.isspace() for line in state.fragment.lines)
+            else:
+                state.fragment.finish()
+                blank = len(state.fragment.content.strip()) == 0
+            if state.fragment.headers:
                 # Regardless of what's been seen to this point, if we encounter a headers fragment,
                 # all the previous fragments should be marked hidden and found_visible set to False.
-                self.found_visible = False
-                for f in self.fragments:
+                state.found_visible = False
+                if lean:
+                    del state.spans[:]
+                for f in state.fragments[state.hidden_upto:]:
                     f.hidden = True
-            if not self.found_visible:
-                if self.fragment.quoted \
-                        or self.fragment.headers \
-                        or self.fragment.signature \
-                        or (len(self.fragment.content.strip()) == 0):
+                    if state.trace is not None:
+                        state.trace.fire(f, _tracing.HIDDEN_BY_HEADERS)
+                state.hidden_upto = len(state.fragments)
+                if state.trace is not None:
+                    state.trace.fire(state.fragment, _tracing.HEADERS_HIDE_PREVIOUS)
+            if not state.found_visible:
+                if state.fragment.quoted \
+                        or state.fragment.headers \
+                        or state.fragment.signature \
+                        or blank:
 
-                    self.fragment.hidden = True
+                    state.fragment.hidden = True
+                    if state.trace is not None:
+                        state.trace.fire(state.fragment, _tracing.HIDDEN_BEFORE_VISIBLE)
                 else:
-                    self.found_visible = True
-            self.fragments.append(self.fragment)
+                    state.found_visible = True
+            if not lean:
+                state.fragments.append(state.fragment)
+            elif not (state.fragment.hidden or state.fragment.quoted):
+                state.spans.append((len(state.lines) - state.consumed, last))
+        state.fragment = None
+
+
+class _TextLines(object):
+    """ Iterates over the lines of a text without splitting all of it.
+
+        pos - offset of the next line in the text, None after the last one
+    """
+
+    __slots__ = ('text', 'pos')
+
+    def __init__(self, text):
+        self.text = text
+        self.pos = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        pos = self.pos
+        if pos is None:
+            raise StopIteration
+        end = self.text.find('\n', pos)
+        if end < 0:
+            self.pos = None
+            return self.text[pos:]
+        self.pos = end + 1
+        return self.text[pos:end]
+
+
+class _ScanState(object):
+    """ Mutable state of a single EmailMessage.read() call.
+    """
+
+    __slots__ = ('text', 'lines', 'offsets', 'fragments', 'fragment', 'found_visible',
+                 'consumed', 'hidden_upto', 'separator_lines', 'meaningful_after', 'trace', 'spans',
+                 'footer', 'features', 'source', 'rest', 'below')
+
+    def __init__(self, text, lines, offsets, trace=None):
+        self.text = text
+        # The text read, before normalization
+        self.source = text
+        self.lines = lines
+        self.offsets = offsets
+        self.fragments = []
         self.fragment = None
+        self.found_visible = False
+        # Number of lines, counted from the bottom, in finished fragments
+        self.consumed = 0
+        # Fragments before this index are hidden already
+        self.hidden_upto = 0
+        # Line index of each dash separator seen by the look-ahead
+        self.separator_lines = {}
+        # Number of meaningful lines from each line to the end, built lazily
+        self.meaningful_after = None
+        # tracing.Trace when reading with trace=True
+        self.trace = trace
+        # First and last lines of the reply fragments when only the reply is read
+        self.spans = None
+        # Whether the top line of the current fragment is a known footer
+        self.footer = False
+        # LineTable.features when reading from a LineTable or reading the reply
+        self.features = None
+        # Iterator over the normalized lines below lines, when read_reply()
+        # stopped early, and those of them taken so far
+        self.rest = None
+        self.below = []
+
+
+class LineTable(object):
+    """ Normalized lines of a text with the line rules applied, built by
+        EmailMessage.line_table().
+
+        Fragment assembly only needs three bits per line, so reads that
+        differ in assembly settings (the dash_lookahead stage, footers,
+        read() or read_reply()) can share one table instead of normalizing
+        and classifying the text again. The stages that change the lines
+        or their bits (STAGES) and the locales are fixed by the table.
+
+        source - the text the table was built from
+        text, lines, offsets - the normalized text, its lines and their
+                               offsets
+        features - one int per line, a combination of QUOTE_HEADER, QUOTED
+                   and HEADER
+        profile - the profiles.Profile the table was built with
+        locales - the LocaleMatcher the table was built with, or None
+    """
+
+    QUOTE_HEADER = 1
+    QUOTED = 2
+    HEADER = 4
+
+    # Profile stages applied while building a table
+    STAGES = ('multi_quote_header', 'outlook_separator', 'inline_headers', 'concatenated_headers')
+
+    # (is_quote_header, is_quoted, is_header) of every combination of bits
+    FEATURES = [(bool(bits & 1), bool(bits & 2), bool(bits & 4)) for bits in range(8)]
+
+    __slots__ = ('source', 'text', 'lines', 'offsets', 'features', 'profile', 'locales')
+
+    def __init__(self, source, text, lines, offsets, features, profile, locales):
+        self.source = source
+        self.text = text
+        self.lines = lines
+        self.offsets = offsets
+        self.features = features
+        self.profile = profile
+        self.locales = locales
+
+    @staticmethod
+    def pack(is_quote_header, is_quoted, is_header):
+        """ Returns the feature bits of a line
+        """
+        return (LineTable.QUOTE_HEADER if is_quote_header else 0) | (LineTable.QUOTED if is_quoted else 0) \
+            | (LineTable.HEADER if is_header else 0)
+
+    def read(self, profile=None, footers=None, reply_only=False):
+        """ Assembles the fragments of the text with given settings.
+
+            profile - Optional profiles.Profile, which must agree with the
+                      one of the table on STAGES
+            footers - Optional footers.FooterDictionary
+            reply_only - Whether to return only the reply, as read_reply()
+
+            Returns an EmailMessage instance, or the reply string
+        """
+        message = EmailMessage(self.source, locales=self.locales, profile=profile or self.profile, footers=footers)
+        return message.read_reply(self) if reply_only else message.read(self)
 
 
 class Fragment(object):
     """ A Fragment is a part of
         an Email Message, labeling each part.
+
+        start and end delimit the lines of the fragment in the text of the
+        EmailMessage it was read from. opaque is set when the fragment holds
+        lines too long to be classified whole (see EmailMessage.LINE_WINDOW).
+        rules lists the ids of the rules that decided its labels when the
+        message was read with trace=True (see tracing).
     """
 
     def __init__(self, quoted, first_line, headers=False):
@@ -252,8 +1171,12 @@ class Fragment(object):
         self.headers = headers
         self.hidden = False
         self.quoted = quoted
+        self.opaque = False
+        self.rules = None
         self._content = None
         self.lines = [first_line]
+        self.start = None
+        self.end = None
 
     def finish(self):
         """ Creates block of content with lines
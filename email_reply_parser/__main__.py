@@ -0,0 +1,5 @@
+import sys
+
+from email_reply_parser.worker import main
+
+sys.exit(main())
@@ -0,0 +1,154 @@
+"""
+    Shared-memory arena of email bodies for multi-process parsing.
+
+    All bodies are written once, UTF-8 encoded, into one
+    multiprocessing.shared_memory block behind an offset table:
+
+        count:u64 offsets:(count + 1) * u64 bodies
+
+    Workers attach to the block by name and decode the bodies they are
+    given by index straight from it, so a task only carries the block name
+    and a list of indices. Results travel back in the compact span/flag
+    format of serialization.dumps() without the text.
+
+    multiprocessing.shared_memory needs Python 3.8. Before that the arena
+    is a private buffer without a name, and tasks carry their bodies
+    pickled as they do with the processes backend.
+
+    Example:
+
+        from email_reply_parser.arena import TextArena
+
+        with TextArena(bodies) as arena:
+            arena.text(0) == bodies[0]
+"""
+
+from array import array
+
+# Blocks attached by this process, by name
+_attached = {}
+
+
+def _shared_memory():
+    """ Returns the multiprocessing.shared_memory module, or None before
+        Python 3.8.
+    """
+    try:
+        from multiprocessing import shared_memory
+    except ImportError:
+        return None
+    return shared_memory
+
+
+def available():
+    """ Tells whether arenas are created in shared memory.
+    """
+    return _shared_memory() is not None
+
+
+class TextArena(object):
+    """ Email bodies stored in a shared memory block.
+
+        texts - List of string email bodies
+
+        The creating process owns the block and must close() it, which
+        also unlinks it.
+
+        name - Name of the block, or None when shared memory is not
+               available and the bodies are kept in a private buffer
+    """
+
+    def __init__(self, texts):
+        encoded = [text.encode('utf-8') for text in texts]
+        header = 8 * (len(encoded) + 2)
+        table = array('Q', [len(encoded)])
+        position = header
+        for data in encoded:
+            table.append(position)
+            position += len(data)
+        table.append(position)
+
+        self.count = len(encoded)
+        self.size = position
+        shared_memory = _shared_memory()
+        if shared_memory is None:
+            self._shm = None
+            self.name = None
+            self._buf = memoryview(bytearray(max(position, 1)))
+        else:
+            self._shm = shared_memory.SharedMemory(create=True, size=max(position, 1))
+            self.name = self._shm.name
+            self._buf = self._shm.buf
+        buf = self._buf
+        buf[:header] = table.tobytes()
+        for data, start in zip(encoded, table[1:]):
+            buf[start:start + len(data)] = data
+
+    def text(self, index):
+        """ Returns the body at an index
+        """
+        return read_text(self._buf, index)
+
+    def close(self):
+        """ Releases and unlinks the block.
+        """
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+        self._buf = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+
+def read_text(buf, index):
+    """ Decodes one body from an arena buffer.
+
+        buf - memoryview of an arena block
+        index - Position of the body in the arena
+
+        Returns a string
+    """
+    table = buf[:8 * (index + 3)].cast('Q')
+    try:
+        if index < 0 or index >= table[0]:
+            raise IndexError('Arena has no body at %d' % index)
+        return str(buf[table[index + 1]:table[index + 2]], 'utf-8')
+    finally:
+        table.release()
+
+
+def attach(name):
+    """ Attaches to an arena block created by another process.
+
+        Blocks are attached once per process and kept open, pool workers
+        parse many batches of the same arena.
+
+        name - Name of the block
+
+        Returns a memoryview of the block
+    """
+    shm = _attached.get(name)
+    if shm is None:
+        shared_memory = _shared_memory()
+        if shared_memory is None:
+            raise RuntimeError('Attaching to an arena needs multiprocessing.shared_memory (Python 3.8)')
+        for previous in _attached.values():
+            previous.close()
+        _attached.clear()
+        try:
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # Before Python 3.13 attaching registers the block again with
+            # the resource tracker, which pool workers share with the
+            # creating process, so the registration stays balanced
+            shm = shared_memory.SharedMemory(name=name)
+        _attached[name] = shm
+    return shm.buf
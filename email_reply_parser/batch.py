@@ -0,0 +1,261 @@
+"""
+    Batch parsing of many email bodies.
+
+    EmailReplyParser.read is re-entrant: every call parses into its own
+    state, and the only objects shared between calls are compiled regexes,
+    which are safe to use from several threads. The "threads" backend can
+    therefore run parses side by side; on free-threaded CPython builds it
+    scales with the number of cores, on regular builds the GIL serializes
+    the work.
+
+    The "processes" backend sends batches of bodies to a process pool. A
+    Scheduler estimates the cost of every body from its length and line
+    count, starts with the most expensive ones so that a giant message
+    gets a worker of its own early on, and packs the rest into batches
+    sized from the throughput the workers report.
+
+    The "shared_memory" backend schedules the same way, but writes all
+    bodies once into a shared memory TextArena. Workers read their bodies
+    from it by index and send back only the compact span/flag encoding of
+    serialization.dumps(); the results are read-only
+    serialization.ParsedMessage views over the original bodies. Before
+    Python 3.8, which added multiprocessing.shared_memory, the bodies are
+    pickled with their batches instead and the results are the same views.
+
+    Example:
+
+        from email_reply_parser.batch import parse_many
+
+        messages = parse_many(bodies, backend='threads', max_workers=8)
+        replies = parse_many(bodies, backend='processes', parse=EmailReplyParser.parse_reply)
+"""
+
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from time import perf_counter
+
+from email_reply_parser import EmailReplyParser
+from email_reply_parser import arena as _arena
+from email_reply_parser import serialization
+
+BACKENDS = ('serial', 'threads', 'processes', 'shared_memory')
+
+
+def parse_many(texts, backend='serial', max_workers=None, parse=EmailReplyParser.read, scheduler=None):
+    """ Parses many email bodies.
+
+        texts - Iterable of string email bodies
+        backend - 'serial' to parse in the calling thread, 'threads' to use
+                  a ThreadPoolExecutor, 'processes' to use a
+                  ProcessPoolExecutor fed by a Scheduler, 'shared_memory'
+                  to do the same with bodies passed in shared memory
+        max_workers - Number of workers, defaults to the executor's
+        parse - Function applied to every body, EmailReplyParser.read by
+                default; EmailReplyParser.parse_reply is a common choice.
+                Must be picklable for the process backends, and return an
+                EmailMessage parsed with the default profile for the
+                shared_memory backend.
+        scheduler - Scheduler for the process backends, a new one by default
+
+        Returns a list of results in input order
+    """
+    if backend == 'serial':
+        return [parse(text) for text in texts]
+    if backend == 'threads':
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(parse, texts))
+    if backend == 'processes':
+        texts = list(texts)
+        workers = max_workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return run_scheduled(executor, texts, parse, scheduler or Scheduler(workers))
+    if backend == 'shared_memory':
+        texts = list(texts)
+        workers = max_workers or os.cpu_count() or 1
+        # The arena is created first, so that the workers share the
+        # resource tracker of this process
+        with _arena.TextArena(texts) as text_arena:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                return run_scheduled(executor, texts, parse, scheduler or Scheduler(workers), text_arena)
+    raise ValueError('Unknown backend %r, expected one of %s' % (backend, ', '.join(BACKENDS)))
+
+
+def run_scheduled(executor, texts, parse, scheduler, text_arena=None):
+    """ Parses bodies in the batches planned by a scheduler.
+
+        executor - A concurrent.futures executor
+        texts - List of string email bodies
+        parse - Function applied to every body
+        scheduler - A Scheduler, reset for these bodies
+        text_arena - Optional arena.TextArena holding texts, from which the
+                     workers read the bodies; results are then
+                     serialization.ParsedMessage instances
+
+        Returns a list of results in input order
+    """
+    results = [None] * len(texts)
+    scheduler.start(texts)
+    pending = {}
+
+    def submit():
+        batch = scheduler.next_batch()
+        if batch is None:
+            return False
+        indices, cost = batch
+        if text_arena is None:
+            future = executor.submit(_parse_batch, parse, [texts[i] for i in indices])
+        elif text_arena.name is None:
+            future = executor.submit(_parse_compact_batch, parse, [texts[i] for i in indices])
+        else:
+            future = executor.submit(_parse_arena_batch, parse, text_arena.name, indices)
+        pending[future] = (indices, cost)
+        return True
+
+    while len(pending) < scheduler.in_flight and submit():
+        pass
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            indices, cost = pending.pop(future)
+            seconds, parsed = future.result()
+            scheduler.observe(cost, seconds)
+            if text_arena is None:
+                for i, result in zip(indices, parsed):
+                    results[i] = result
+            else:
+                for i, data in zip(indices, parsed):
+                    results[i] = serialization.loads(data, text=texts[i])
+        while len(pending) < scheduler.in_flight and submit():
+            pass
+    return results
+
+
+def _parse_batch(parse, texts):
+    """ Parses one batch in a worker.
+
+        Returns (seconds spent parsing, list of results)
+    """
+    started = perf_counter()
+    results = [parse(text) for text in texts]
+    return perf_counter() - started, results
+
+
+def _parse_compact_batch(parse, texts):
+    """ Parses one batch in a worker, for an arena without shared memory.
+
+        Returns (seconds spent parsing, list of serialization.dumps() results)
+    """
+    started = perf_counter()
+    results = [serialization.dumps(parse(text)) for text in texts]
+    return perf_counter() - started, results
+
+
+def _parse_arena_batch(parse, name, indices):
+    """ Parses one batch of arena bodies in a worker.
+
+        Returns (seconds spent parsing, list of serialization.dumps() results)
+    """
+    started = perf_counter()
+    buf = _arena.attach(name)
+    results = [serialization.dumps(parse(_arena.read_text(buf, i))) for i in indices]
+    return perf_counter() - started, results
+
+
+class Scheduler(object):
+    """ Plans batches of bodies for a pool of workers.
+
+        Bodies are handed out most expensive first. A batch is filled until
+        its estimated cost reaches the current budget, so a body costing
+        more than the budget travels alone. The budget aims at
+        target_seconds of work per batch at the throughput observed so far,
+        and shrinks towards the end so that the last batches are spread
+        over all workers.
+
+        workers - Number of workers of the pool
+        target_seconds - Desired parsing time per batch
+        initial_budget - Batch cost before any throughput is known
+        min_budget, max_budget - Bounds of the batch cost
+        smoothing - Weight of the latest observation in the throughput
+                    estimate
+    """
+
+    # Cost of a line break relative to a character, every line goes
+    # through the classifier
+    LINE_COST = 40
+
+    def __init__(self, workers, target_seconds=0.05, initial_budget=1 << 16, min_budget=1 << 10,
+                 max_budget=1 << 24, smoothing=0.3):
+        self.workers = workers
+        self.target_seconds = target_seconds
+        self.initial_budget = initial_budget
+        self.min_budget = min_budget
+        self.max_budget = max_budget
+        self.smoothing = smoothing
+        # Two batches per worker, so none idles while its next one is sent
+        self.in_flight = 2 * workers
+        self.throughput = None
+        self.batches = []
+        self._costs = []
+        self._order = []
+        self._next = 0
+        self._remaining = 0
+
+    @classmethod
+    def cost(cls, text):
+        """ Estimates the parsing cost of a body.
+        """
+        return len(text) + cls.LINE_COST * text.count('\n') + 1
+
+    def start(self, texts):
+        """ Plans a new list of bodies, keeping the observed throughput.
+        """
+        self._costs = [self.cost(text) for text in texts]
+        self._order = sorted(range(len(texts)), key=self._costs.__getitem__, reverse=True)
+        self._next = 0
+        self._remaining = sum(self._costs)
+        self.batches = []
+
+    @property
+    def budget(self):
+        """ Returns the cost the next batch is filled up to
+        """
+        if self.throughput is None:
+            budget = self.initial_budget
+        else:
+            budget = self.throughput * self.target_seconds
+        budget = min(budget, self._remaining // (2 * self.workers))
+        return int(max(self.min_budget, min(self.max_budget, budget)))
+
+    def next_batch(self):
+        """ Takes the next batch off the plan.
+
+            Returns (indices, estimated cost) or None when done
+        """
+        if self._next >= len(self._order):
+            return None
+        budget = self.budget
+        indices = []
+        total = 0
+        while self._next < len(self._order):
+            index = self._order[self._next]
+            cost = self._costs[index]
+            if indices and total + cost > budget:
+                break
+            indices.append(index)
+            total += cost
+            self._next += 1
+        self._remaining -= total
+        self.batches.append(len(indices))
+        return indices, total
+
+    def observe(self, cost, seconds):
+        """ Updates the throughput estimate from a finished batch.
+
+            cost - Estimated cost of the batch
+            seconds - Time the worker spent parsing it
+        """
+        throughput = cost / max(seconds, 1e-6)
+        if self.throughput is None:
+            self.throughput = throughput
+        else:
+            self.throughput += self.smoothing * (throughput - self.throughput)
@@ -0,0 +1,140 @@
+"""
+    Benchmarks for batch parsing and for loading stored results.
+
+    Thread scaling is only expected to be near-linear on free-threaded
+    CPython builds (python3.13t and later); with the GIL enabled the
+    threads backend runs at roughly single-thread speed. Loading results
+    stored with serialization.dumps(), text included, has to stay faster
+    than unpickling the same messages, and the command fails when it is
+    not.
+
+        python -m email_reply_parser.bench [fixtures_dir]
+"""
+
+import os
+import pickle
+import sys
+import time
+
+from email_reply_parser import EmailReplyParser, harness, serialization
+from email_reply_parser.batch import parse_many
+
+
+def gil_enabled():
+    """ Returns whether the running interpreter has the GIL enabled.
+    """
+    is_gil_enabled = getattr(sys, '_is_gil_enabled', None)
+    return True if is_gil_enabled is None else is_gil_enabled()
+
+
+def corpus(fixtures_dir=None, count=2000):
+    """ Builds a benchmark corpus.
+
+        fixtures_dir - Optional directory of .txt email bodies mixed into
+                       the generated bodies
+        count - Number of generated bodies
+
+        Returns a list of string email bodies
+    """
+    fixtures = list(harness.fixture_corpus(fixtures_dir)) if fixtures_dir else []
+    generated = harness.generated_corpus(count, fixtures=fixtures)
+    return [text for _, text in fixtures] + [text for _, text in generated]
+
+
+def thread_scaling(texts, thread_counts=(1, 2, 4, 8), repeat=3):
+    """ Times parse_many(backend='threads') at several thread counts.
+
+        texts - List of string email bodies
+        thread_counts - Worker counts to measure
+        repeat - Runs per thread count, the fastest one is kept
+
+        Returns a list of (threads, seconds, speedup, efficiency) tuples,
+        speedup being relative to the first thread count
+    """
+    rows = []
+    baseline = None
+    for threads in thread_counts:
+        best = None
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            parse_many(texts, backend='threads', max_workers=threads)
+            elapsed = time.perf_counter() - t0
+            if best is None or elapsed < best:
+                best = elapsed
+        if baseline is None:
+            baseline = best
+        speedup = baseline / best
+        rows.append((threads, best, speedup, speedup * thread_counts[0] / threads))
+    return rows
+
+
+def load_speed(texts, repeat=3):
+    """ Times serialization.loads() of the parsed texts, stored with their
+        text, against pickle.loads() of the same messages.
+
+        texts - List of string email bodies
+        repeat - Runs of each, the fastest one is kept
+
+        Returns (loads seconds, pickle.loads seconds) for all the texts
+    """
+    messages = [EmailReplyParser.read(text) for text in texts]
+    stored = [serialization.dumps(message, include_text=True) for message in messages]
+    pickled = [pickle.dumps(message) for message in messages]
+    timings = []
+    for load, items in ((serialization.loads, stored), (pickle.loads, pickled)):
+        best = None
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            for data in items:
+                load(data)
+            elapsed = time.perf_counter() - t0
+            if best is None or elapsed < best:
+                best = elapsed
+        timings.append(best)
+    return tuple(timings)
+
+
+def check_load_speed(texts, repeat=3):
+    """ Asserts that serialization.loads() beats pickle.loads() on texts.
+
+        texts - List of string email bodies
+        repeat - Runs of each, the fastest one is kept
+
+        Returns (loads seconds, pickle.loads seconds)
+    """
+    loads, unpickle = load_speed(texts, repeat)
+    if loads >= unpickle:
+        raise AssertionError('serialization.loads() took %.4fs, pickle.loads() %.4fs' % (loads, unpickle))
+    return loads, unpickle
+
+
+def format_rows(rows):
+    """ Formats thread_scaling() rows as a table.
+    """
+    out = ['threads   seconds   speedup   efficiency']
+    for threads, seconds, speedup, efficiency in rows:
+        out.append('%7d %9.4f %8.2fx %11.0f%%' % (threads, seconds, speedup, efficiency * 100))
+    return '\n'.join(out)
+
+
+def main(argv=None):
+    """ Command line entry point.
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    texts = corpus(argv[0] if argv else None)
+    cpus = os.cpu_count() or 1
+    thread_counts = [n for n in (1, 2, 4, 8, 16) if n <= max(cpus, 1)] or [1]
+    sys.stdout.write('%d messages, %d cpus, GIL %s\n' % (
+        len(texts), cpus, 'enabled' if gil_enabled() else 'disabled'))
+    sys.stdout.write(format_rows(thread_scaling(texts, thread_counts)) + '\n')
+    try:
+        loads, unpickle = check_load_speed(texts)
+    except AssertionError as e:
+        sys.stderr.write('%s\n' % e)
+        return 1
+    sys.stdout.write('loads %.4fs, pickle.loads %.4fs (%.1fx)\n' % (loads, unpickle, unpickle / loads))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,311 @@
+"""
+    Machine-independent performance counters for regression tests.
+
+    Timing-based tests are flaky and only catch large regressions, so the
+    performance tests count work instead of measuring it: the lines the
+    parser scans, the calls made on the regexes of EmailMessage and the
+    characters those calls are given, the Python instructions executed in
+    this package, and the peak memory traced by tracemalloc. The counts
+    depend only on the input and the code, so budgets can be asserted per
+    fixture, and a change in complexity shows up as counts that stop
+    growing linearly with generated threads.
+
+    Example:
+
+        from email_reply_parser import budgets
+
+        counts = budgets.measure(body)
+        counts.regex_calls, counts.instructions
+
+        counts = [budgets.measure(budgets.thread(n)) for n in (1, 10, 100)]
+        budgets.exponent(counts, 'instructions')
+"""
+
+import math
+import sys
+import types
+
+from email_reply_parser import EmailMessage
+from email_reply_parser import memory as _memory
+from email_reply_parser import redos
+
+_PACKAGE = __name__.partition('.')[0]
+
+# Counted quantities, in the order of Counts.as_dict()
+FIELDS = ('lines', 'regex_calls', 'regex_chars', 'instructions', 'peak_bytes')
+
+
+class Counts(object):
+    """ Work done by one parse.
+
+        lines - Lines passed to _scan_line
+        regex_calls - Calls made on the regexes of EmailMessage
+        regex_chars - Characters those calls were given to look at
+        instructions - Python instructions executed in this package, or
+                       None when not counted
+        peak_bytes - Peak memory traced during the parse, or None when not
+                     measured
+        chars - Length of the input
+    """
+
+    def __init__(self, chars):
+        self.chars = chars
+        self.lines = 0
+        self.regex_calls = 0
+        self.regex_chars = 0
+        self.instructions = None
+        self.peak_bytes = None
+
+    def as_dict(self):
+        return dict((field, getattr(self, field)) for field in FIELDS)
+
+    def __repr__(self):
+        return '<Counts %s>' % ' '.join('%s=%s' % item for item in sorted(self.as_dict().items()))
+
+
+class _CountingRegex(object):
+    """ Stands in for a compiled regex and counts what it is asked to do.
+    """
+
+    def __init__(self, regex, counts):
+        self._regex = regex
+        self._counts = counts
+
+    def _count(self, string, pos):
+        self._counts.regex_calls += 1
+        self._counts.regex_chars += max(len(string) - pos, 0)
+
+    def match(self, string, pos=0, *args):
+        self._count(string, pos)
+        return self._regex.match(string, pos, *args)
+
+    def search(self, string, pos=0, *args):
+        self._count(string, pos)
+        return self._regex.search(string, pos, *args)
+
+    def fullmatch(self, string, pos=0, *args):
+        self._count(string, pos)
+        return self._regex.fullmatch(string, pos, *args)
+
+    def finditer(self, string, pos=0, *args):
+        self._count(string, pos)
+        return self._regex.finditer(string, pos, *args)
+
+    def findall(self, string, pos=0, *args):
+        self._count(string, pos)
+        return self._regex.findall(string, pos, *args)
+
+    def sub(self, repl, string, *args):
+        self._count(string, 0)
+        return self._regex.sub(repl, string, *args)
+
+    def split(self, string, *args):
+        self._count(string, 0)
+        return self._regex.split(string, *args)
+
+    def __getattr__(self, name):
+        return getattr(self._regex, name)
+
+
+def _counting_class(base, counts):
+    """ Builds a subclass of base whose regexes and line scans are counted
+        into counts.
+    """
+    attributes = dict((name, _CountingRegex(getattr(base, name), counts)) for name in redos.regexes())
+
+    def _scan_line(self, state, line, features=None):
+        counts.lines += 1
+        if features is None:
+            return base._scan_line(self, state, line)
+        return base._scan_line(self, state, line, features)
+
+    attributes['_scan_line'] = _scan_line
+    return type('Counting' + base.__name__, (base,), attributes)
+
+
+def _count_instructions(function):
+    """ Calls function, counting the Python instructions executed in this
+        package except for the counting wrappers of this module.
+
+        Returns (result, number of instructions)
+    """
+    if getattr(sys, 'monitoring', None) is not None:
+        return _count_monitored(function)
+    return _count_traced(function)
+
+
+def _count_traced(function):
+    """ Counts instructions with opcode tracing, before Python 3.12.
+    """
+    executed = [0]
+
+    def local(frame, event, arg):
+        if event == 'opcode':
+            executed[0] += 1
+        return local
+
+    def tracer(frame, event, arg):
+        module = frame.f_globals.get('__name__', '')
+        if module.partition('.')[0] != _PACKAGE or module == __name__:
+            return None
+        frame.f_trace_opcodes = True
+        return local
+
+    previous = sys.gettrace()
+    sys.settrace(tracer)
+    try:
+        result = function()
+    finally:
+        sys.settrace(previous)
+    return result, executed[0]
+
+
+def _count_monitored(function):
+    """ Counts instructions with sys.monitoring, from Python 3.12 on.
+
+        sys.settrace is built on sys.monitoring there, and opcode tracing
+        set up from the call event misses the first traced call in a
+        process, so the INSTRUCTION event is enabled directly on the code
+        objects of the package instead.
+    """
+    monitoring = sys.monitoring
+    tool = next((tool for tool in range(monitoring.PROFILER_ID, 6) if monitoring.get_tool(tool) is None), None)
+    if tool is None:
+        raise RuntimeError('No free sys.monitoring tool id to count instructions')
+    executed = [0]
+
+    def instruction(code, offset):
+        executed[0] += 1
+
+    codes = _package_codes()
+    monitoring.use_tool_id(tool, __name__)
+    try:
+        monitoring.register_callback(tool, monitoring.events.INSTRUCTION, instruction)
+        for code in codes:
+            monitoring.set_local_events(tool, code, monitoring.events.INSTRUCTION)
+        result = function()
+    finally:
+        for code in codes:
+            monitoring.set_local_events(tool, code, monitoring.events.NO_EVENTS)
+        monitoring.register_callback(tool, monitoring.events.INSTRUCTION, None)
+        monitoring.free_tool_id(tool)
+    return result, executed[0]
+
+
+def _package_codes():
+    """ Returns the code objects of the functions of this package, nested
+        ones included, except for those of this module.
+    """
+    codes = []
+    seen = set()
+
+    def add(code):
+        if id(code) in seen:
+            return
+        seen.add(id(code))
+        codes.append(code)
+        for const in code.co_consts:
+            if isinstance(const, types.CodeType):
+                add(const)
+
+    def visit(value, module):
+        if isinstance(value, (staticmethod, classmethod)):
+            value = value.__func__
+        if isinstance(value, property):
+            for accessor in (value.fget, value.fset, value.fdel):
+                if accessor is not None:
+                    visit(accessor, module)
+        elif isinstance(value, types.FunctionType):
+            if value.__module__ == module:
+                add(value.__code__)
+        elif isinstance(value, type) and value.__module__ == module and id(value) not in seen:
+            seen.add(id(value))
+            for member in vars(value).values():
+                visit(member, module)
+
+    for name, module in list(sys.modules.items()):
+        if module is not None and name.partition('.')[0] == _PACKAGE and name != __name__:
+            for value in list(vars(module).values()):
+                visit(value, name)
+    return codes
+
+
+def measure(text, locales=None, profile=None, instructions=True, memory=True, message_class=EmailMessage):
+    """ Counts the work of reading one email.
+
+        text - The email body
+        locales - Optional list of locale names
+        profile - Optional profiles.Profile
+        instructions - Whether to count Python instructions, which makes
+                       the parse about a hundred times slower
+        memory - Whether to trace the peak memory of the parse, as
+                 memory.start() and finish() do for reads with memory=True
+        message_class - EmailMessage or a subclass to measure
+
+        Returns a Counts instance
+    """
+    counts = Counts(len(text))
+    cls = _counting_class(message_class, counts)
+    # Warm up caches (locale matchers, ...) so that they are not counted
+    message_class(text, locales=locales, profile=profile).read()
+
+    read = lambda: cls(text, locales=locales, profile=profile).read()
+    if memory:
+        token = _memory.start()
+        try:
+            read()
+        finally:
+            counts.peak_bytes = _memory.finish(token)
+    if instructions:
+        _, counts.instructions = _count_instructions(read)
+    if not (memory or instructions):
+        read()
+    # Every mode above parsed once with the counting class
+    runs = int(memory) + int(instructions) + int(not (memory or instructions))
+    counts.lines //= runs
+    counts.regex_calls //= runs
+    counts.regex_chars //= runs
+    return counts
+
+
+def thread(size):
+    """ Generates a reply thread of a given number of earlier messages.
+
+        Every earlier message adds an attribution line, a header block, a
+        few lines of text and a signature. Quoting depth cycles from zero
+        to three levels, so the body grows linearly with size.
+
+        size - Number of earlier messages
+
+        Returns a string
+    """
+    lines = ['Thanks, that works for me.', '', 'Jane', '']
+    for i in range(size):
+        prefix = '> ' * (i % 4)
+        lines.extend(prefix + line for line in [
+            'On Mon, Jan %d, 2024 at 9:%02d AM Person %d <p%d@example.com> wrote:' % (i % 28 + 1, i % 60, i, i),
+            'From: Person %d <p%d@example.com>' % (i, i),
+            'Sent: Monday, January %d, 2024 9:%02d AM' % (i % 28 + 1, i % 60),
+            'Subject: Re: plan %d' % i,
+            '',
+            'Message %d says the plan - step %d - is fine.' % (i, i),
+            'Sent from my phone',
+            '',
+            '--',
+            'Person %d' % i,
+            '',
+        ])
+    return '\n'.join(lines)
+
+
+def exponent(counts, field):
+    """ Estimates how a counted quantity grows with the input size.
+
+        counts - Counts of inputs of increasing size
+        field - One of FIELDS
+
+        Returns the exponent k in value ~ chars ** k between the smallest
+        and the largest input
+    """
+    first, last = counts[0], counts[-1]
+    return math.log(float(getattr(last, field)) / getattr(first, field)) / math.log(float(last.chars) / first.chars)
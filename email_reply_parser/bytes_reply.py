@@ -0,0 +1,279 @@
+"""
+    Reply parsing of raw bytes without decoding the whole body.
+
+    MTAs hand over message bodies as bytes, and decoding all of them only
+    to find a reply near the top wastes most of the work. A
+    BytesEmailMessage finds the line breaks, the quote header and the
+    quoted tail on the bytes, and decodes the lines it reads one at a
+    time with the declared charset, so parse_reply_bytes() decodes no
+    more than the lines read_reply() stops at. The reply is the same as
+    that of the decoded text.
+
+    This needs a charset in which every byte below 0x80 is the ASCII
+    character of that code wherever it appears, so that a line break is
+    never part of another character and each line decodes on its own:
+    UTF-8, ASCII, the ISO 8859 and Windows code pages and the like. Other
+    charsets (UTF-16, Shift JIS, ISO 2022 ...) raise ValueError; decode
+    those bodies and use EmailMessage instead.
+
+    Example:
+
+        from email_reply_parser.bytes_reply import parse_reply_bytes
+
+        parse_reply_bytes(body, charset='cp1252')
+"""
+
+import codecs
+import re
+
+from email_reply_parser import EmailMessage
+
+# Lines that are neither blank nor quoted, as UNQUOTED_LINE_REGEX of
+# EmailMessage. ASCII whitespace only, so a line taken for blank here is
+# blank once decoded too.
+UNQUOTED_LINE_REGEX = re.compile(br'^(?![^\S\n]*$|>)', re.MULTILINE)
+# Bytes decoded to look at the characters after an "On", enough for two
+# characters in every accepted charset
+_PEEK = 16
+
+_checked = {}
+
+
+def check_charset(charset):
+    """ Looks up a charset and checks that lines of bytes in it can be
+        parsed and decoded one at a time.
+
+        charset - A codec name or alias
+
+        Returns the normalized codec name
+    """
+    try:
+        name = codecs.lookup(charset).name
+    except LookupError:
+        raise ValueError('Unknown charset %r' % charset)
+    usable = _checked.get(name)
+    if usable is None:
+        usable = _checked[name] = _is_ascii_transparent(name)
+    if not usable:
+        raise ValueError('Charset %r is not ASCII compatible, decode the body first' % charset)
+    return name
+
+
+def _is_ascii_transparent(name):
+    """ Tells whether every byte below 0x80 decodes to its ASCII character
+        in a codec, whatever precedes it.
+    """
+    codes = bytes(range(128))
+    try:
+        if codes.decode(name) != codes.decode('ascii'):
+            return False
+        for high in range(128, 256):
+            for low in range(128):
+                for probe in (bytes([high, low]), bytes([high, high, low])):
+                    decoded = probe.decode(name, 'replace')
+                    if decoded[-1:] != chr(low) or (b'a' + probe).decode(name, 'replace') != 'a' + decoded:
+                        return False
+        # A byte order mark is only dropped at the start of the text
+        return (b'a' + codecs.BOM_UTF8).decode(name, 'replace') == 'a' + codecs.BOM_UTF8.decode(name, 'replace')
+    except (UnicodeError, TypeError, LookupError):
+        return False
+
+
+class _DecodedLines(object):
+    """ Iterates over the lines of bytes, decoding each one as it is taken.
+
+        pos - offset of the next line in data, None after the last one
+    """
+
+    __slots__ = ('data', 'pos', 'charset', 'errors')
+
+    def __init__(self, data, charset, errors):
+        self.data = data
+        self.pos = 0
+        self.charset = charset
+        self.errors = errors
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        pos = self.pos
+        if pos is None:
+            raise StopIteration
+        end = self.data.find(b'\n', pos)
+        if end < 0:
+            self.pos = None
+            end = len(self.data)
+        else:
+            self.pos = end + 1
+        return self.data[pos:end].decode(self.charset, self.errors)
+
+
+class BytesEmailMessage(EmailMessage):
+    """ An EmailMessage of a body given as bytes in an ASCII compatible
+        charset.
+
+        read_reply() decodes the lines it reads only. read(), line_table(),
+        read_reply() with a table or a sampler, and text decode the whole
+        body first.
+
+        data - bytes, bytearray or memoryview of the body
+        charset - Charset of data
+        errors - Error handler of the decoding, as in bytes.decode(); with
+                 'strict', undecodable bytes below the lines read_reply()
+                 reads are not reported
+    """
+
+    def __init__(self, data, charset='utf-8', errors='strict', **kwargs):
+        self.charset = check_charset(charset)
+        self.errors = errors
+        data = bytes(data) if not isinstance(data, bytes) else data
+        if b'\r' in data:
+            data = data.replace(b'\r\n', b'\n')
+        self.data = data
+        EmailMessage.__init__(self, '', **kwargs)
+        # Decoded on first use
+        self._source = None
+        self._text = None
+
+    @property
+    def text(self):
+        """ The decoded text of the message, normalized once it has been read
+        """
+        self._decode()
+        return EmailMessage.text.fget(self)
+
+    @text.setter
+    def text(self, text):
+        EmailMessage.text.fset(self, text)
+
+    def _decode(self):
+        if self._source is None:
+            self._source = self.data.decode(self.charset, self.errors)
+
+    def read(self, table=None):
+        """ Decodes the whole body and reads it like EmailMessage.read().
+
+            Returns BytesEmailMessage instance
+        """
+        self._decode()
+        return EmailMessage.read(self, table)
+
+    def read_reply(self, table=None):
+        """ Finds the reply like EmailMessage.read_reply(), decoding only
+            the lines it reads unless given a table or a sampler.
+
+            table - Optional LineTable of the decoded text
+
+            Returns the reply string
+        """
+        if table is not None or self.sampler is not None:
+            # Tables and samples keep the decoded text
+            self._decode()
+        return EmailMessage.read_reply(self, table)
+
+    def line_table(self):
+        self._decode()
+        return EmailMessage.line_table(self)
+
+    def _prepare_reply(self):
+        if self._source is not None:
+            return EmailMessage._prepare_reply(self)
+        data = self.data
+        merge = self._multi_quote_header_bytes(data) if self.profile.multi_quote_header else None
+        return self._classify_reply(data, _DecodedLines(data, self.charset, self.errors), merge,
+                                    b'From:' in data, self._unquoted_bytes)
+
+    def _peek(self, data, start, end):
+        """ Decodes the first characters of data[start:end], start and end
+            being offsets of ASCII bytes or of the end of data.
+
+            Returns all the characters when there are at most _PEEK bytes,
+            else at least two of the first ones
+        """
+        if end - start <= _PEEK:
+            return data[start:end].decode(self.charset, self.errors)
+        return codecs.getincrementaldecoder(self.charset)(self.errors).decode(data[start:start + _PEEK])
+
+    def _multi_quote_header_bytes(self, data):
+        """ Finds the quote header EmailMessage._multi_quote_header_lines()
+            finds in the decoded text, counting characters where
+            _find_multi_quote_header() does.
+
+            data - the email body
+
+            Returns (first, last, start, end), start and end being offsets
+            in data, or None
+        """
+        wrote = data.rfind(b'wrote:')
+        if wrote < 0:
+            return None
+        # The last "On" followed by whitespace and at least one more
+        # character before the last "wrote:"
+        start = data.rfind(b'On', 0, wrote)
+        while start >= 0:
+            after = self._peek(data, start + 2, wrote)
+            if len(after) >= 2 and after[0].isspace():
+                break
+            start = data.rfind(b'On', 0, start + 1)
+        if start < 0:
+            return None
+        # The first "wrote:" at least four characters after the "On"
+        end = data.find(b'wrote:', start + 4)
+        while end - start - 2 <= _PEEK and len(self._peek(data, start + 2, end)) < 2:
+            end = data.find(b'wrote:', end + 1)
+        end += len('wrote:')
+        first = data.count(b'\n', 0, start)
+        return first, first + data.count(b'\n', start, end), start, end
+
+    def _unquoted_bytes(self, data, pos, merge):
+        """ EmailMessage._unquoted_line() on bytes.
+
+            A line is taken for blank only when it holds ASCII whitespace,
+            which may find an earlier line than the decoded text would and
+            only stops the read later.
+        """
+        match = UNQUOTED_LINE_REGEX.search(data, pos)
+        limit = match.start() if match else len(data)
+        if merge is not None:
+            start = data.rfind(b'\n', 0, merge[2]) + 1
+            end = data.find(b'\n', merge[3])
+            if start >= pos and data.find(b'From:', start, len(data) if end < 0 else end) >= 0:
+                limit = min(limit, start)
+        found = data.find(b'From:', pos, limit)
+        while found >= 0:
+            start = data.rfind(b'\n', 0, found) + 1
+            end = data.find(b'\n', found)
+            if end < 0:
+                end = len(data)
+            if self._inline_header_starts(data[start:end].decode(self.charset, self.errors)):
+                return start
+            found = data.find(b'From:', end, limit)
+        return limit if limit < len(data) else None
+
+
+def read_bytes(data, charset='utf-8', errors='strict', locales=None):
+    """ Splits an email given as bytes into fragments, decoding all of it.
+
+        data - bytes, bytearray or memoryview of the body
+        charset - Charset of data
+        errors - Error handler of the decoding
+        locales - Optional list of locale names
+
+        Returns a BytesEmailMessage instance
+    """
+    return BytesEmailMessage(data, charset, errors, locales=locales).read()
+
+
+def parse_reply_bytes(data, charset='utf-8', errors='strict', locales=None):
+    """ Provides the reply portion of an email given as bytes, decoding
+        only the lines read.
+
+        data - bytes, bytearray or memoryview of the body
+        charset - Charset of data
+        errors - Error handler of the decoding
+        locales - Optional list of locale names
+
+        Returns reply body message
+    """
+    return BytesEmailMessage(data, charset, errors, locales=locales).read_reply()
@@ -0,0 +1,61 @@
+"""
+    Cooperative cancellation of long parses.
+
+    A read of a huge body is one call that cannot be interrupted from the
+    outside. Passing a CancellationToken lets the scan check it every
+    EmailMessage.CHECK_INTERVAL lines and give up with ParseCancelled once
+    it has been cancelled or its deadline has passed, so a job runner can
+    abandon the work from another thread, or enforce a timeout, without
+    killing the process.
+
+    Example:
+
+        from email_reply_parser import EmailReplyParser
+        from email_reply_parser.cancellation import CancellationToken, ParseCancelled
+
+        token = CancellationToken(timeout=2.0)
+        try:
+            message = EmailReplyParser.read(body, cancel=token)
+        except ParseCancelled:
+            ...
+"""
+
+import threading
+from time import monotonic
+
+
+class ParseCancelled(Exception):
+    """ Raised by a read whose CancellationToken was cancelled.
+    """
+
+
+class CancellationToken(object):
+    """ Flag shared between a running parse and whoever may cancel it.
+
+        timeout - Optional number of seconds after which the token counts
+                  as cancelled
+
+        A token may be shared by several parses and cancelled from any
+        thread.
+    """
+
+    def __init__(self, timeout=None):
+        self._event = threading.Event()
+        self.deadline = None if timeout is None else monotonic() + timeout
+
+    def cancel(self):
+        """ Cancels every parse checking this token.
+        """
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set() or (self.deadline is not None and monotonic() >= self.deadline)
+
+    def check(self):
+        """ Raises ParseCancelled if the token is cancelled.
+        """
+        if self._event.is_set():
+            raise ParseCancelled('Parse cancelled')
+        if self.deadline is not None and monotonic() >= self.deadline:
+            raise ParseCancelled('Parse deadline exceeded')
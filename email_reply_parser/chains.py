@@ -0,0 +1,140 @@
+"""
+    Content-addressed storage of quoted history.
+
+    The quoted part of a reply holds the previous message, which quotes the
+    one before, and so on; storing every EmailMessage.chain repeats the
+    history of a thread over and over. A ChainStore splits the chain of a
+    parsed message into blocks, one per earlier message, attribution line
+    or header block: quoted fragments lose one level of ">" markers and
+    are parsed again, down to max_depth levels. Every block is interned
+    under the hash of its content, and a message references its history
+    as a tuple of block ids, so storage grows with unique content only.
+
+    Example:
+
+        from email_reply_parser import EmailReplyParser
+        from email_reply_parser.chains import ChainStore
+
+        store = ChainStore()
+        ids = store.add(EmailReplyParser.read(body))
+        store.chain(ids)
+"""
+
+import hashlib
+
+from email_reply_parser import EmailMessage
+
+
+class ChainStore(object):
+    """ Table of quoted blocks keyed by content hash.
+
+        blocks - Optional mapping to keep the blocks in, e.g. a dbm or
+                 shelve backed one; a dict by default
+        max_depth - Number of quote levels split into separate blocks,
+                    deeper history stays in one block
+        locales - Optional list of locale names used to parse quoted text
+    """
+
+    def __init__(self, blocks=None, max_depth=8, locales=None):
+        self.blocks = {} if blocks is None else blocks
+        self.max_depth = max_depth
+        self.locales = locales
+        # Number of references to each block added through this store
+        self.refs = {}
+
+    @staticmethod
+    def block_id(content):
+        """ Returns the id a block is stored under
+        """
+        return hashlib.blake2b(content.encode('utf-8'), digest_size=12).hexdigest()
+
+    def split(self, message):
+        """ Splits the chain of a message into blocks without storing them.
+
+            message - A read EmailMessage
+
+            Returns a list of block contents, closest to the reply first
+        """
+        blocks = []
+        for fragment in message.fragments:
+            if fragment.quoted:
+                self._split_quoted(fragment.content, 1, blocks)
+            elif fragment.hidden:
+                self._append(fragment.content, blocks)
+        return blocks
+
+    def add(self, message):
+        """ Interns the chain blocks of a message.
+
+            message - A read EmailMessage
+
+            Returns the tuple of block ids referencing its chain
+        """
+        ids = []
+        for content in self.split(message):
+            block_id = self.block_id(content)
+            if block_id not in self.blocks:
+                self.blocks[block_id] = content
+            self.refs[block_id] = self.refs.get(block_id, 0) + 1
+            ids.append(block_id)
+        return tuple(ids)
+
+    def get(self, block_id):
+        """ Returns the content of a block
+        """
+        return self.blocks[block_id]
+
+    def chain(self, ids):
+        """ Rebuilds a chain from block ids.
+
+            The blocks are joined by line breaks, without the ">" quote
+            markers of the original chain.
+
+            ids - Block ids returned by add()
+
+            Returns a string
+        """
+        return '\n'.join(self.blocks[block_id] for block_id in ids)
+
+    def stats(self):
+        """ Returns a dict with the number of unique blocks, the characters
+            they hold and the characters of all references to them
+        """
+        unique = sum(len(self.blocks[block_id]) for block_id in self.refs)
+        referenced = sum(len(self.blocks[block_id]) * count for block_id, count in self.refs.items())
+        return {'blocks': len(self.refs), 'unique_chars': unique, 'referenced_chars': referenced}
+
+    def __len__(self):
+        return len(self.blocks)
+
+    def __contains__(self, block_id):
+        return block_id in self.blocks
+
+    def _split_quoted(self, content, depth, blocks):
+        text = _dequote(content)
+        if depth >= self.max_depth:
+            self._append(text, blocks)
+            return
+        for fragment in EmailMessage(text, locales=self.locales).read().fragments:
+            if fragment.quoted:
+                self._split_quoted(fragment.content, depth + 1, blocks)
+            else:
+                self._append(fragment.content, blocks)
+
+    @staticmethod
+    def _append(content, blocks):
+        content = '\n'.join(line.rstrip() for line in content.strip().split('\n'))
+        if content:
+            blocks.append(content)
+
+
+def _dequote(text):
+    """ Removes one level of ">" quote markers.
+    """
+    lines = text.split('\n')
+    for i, line in enumerate(lines):
+        if line.startswith('> '):
+            lines[i] = line[2:]
+        elif line.startswith('>'):
+            lines[i] = line[1:]
+    return '\n'.join(lines)
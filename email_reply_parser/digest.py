@@ -0,0 +1,175 @@
+"""
+    Splitting of digests and forwarded bundles into separate messages.
+
+    Mailing-list digests and "forward as attachment" bundles hold many
+    independent messages in one body. Read as one email, everything below
+    the first header block is taken for quoted history. split_digest()
+    instead cuts the body at every header block (a run of header lines
+    with a From: line and at least one Date:, Sent:, To: or Subject: line)
+    in one pass over the lines, together with the "-----Original
+    Message-----", "Begin forwarded message:" or dash rule line right
+    above it. read_digest() then parses the body of every part on its own,
+    optionally in parallel with one of the backends of batch.parse_many().
+
+    Quoted header blocks ("> From: ...") do not split a digest.
+
+    Example:
+
+        from email_reply_parser.digest import read_digest
+
+        for part in read_digest(body, backend='processes'):
+            part.headers.get('Subject'), part.message.reply
+"""
+
+import functools
+import re
+
+from email_reply_parser import EmailReplyParser
+from email_reply_parser import batch as _batch
+
+# Header lines of a header block, "*From:*" Outlook style included
+HEADER_REGEX = re.compile(r'\*?(From|Sent|Date|To|Cc|Subject|Reply-To|Message):\*?(?:\s|$)', re.IGNORECASE)
+
+# Any other header line, once a header block has started
+OTHER_HEADER_REGEX = re.compile(r'([A-Za-z][A-Za-z0-9-]*):(?:\s|$)')
+
+# Lines announcing the header block right below them
+MARKER_REGEX = re.compile(
+    r'\s*(-{3,}\s*(Original Message|Forwarded message)\s*-{3,}|Begin forwarded message:|[-_=]{7,})\s*$',
+    re.IGNORECASE)
+
+# A header block needs one of these besides From
+_SECOND_FIELDS = frozenset(('Sent', 'Date', 'To', 'Subject'))
+
+# Field names as reported in DigestPart.headers
+FIELDS = dict((name.lower(), name) for name in ('From', 'Sent', 'Date', 'To', 'Cc', 'Subject', 'Reply-To', 'Message'))
+
+
+class DigestPart(object):
+    """ One message of a digest.
+
+        headers - Dict of the header block the part starts with, by field
+                  name ('From', 'Date', 'Subject', ...; other fields as
+                  written); empty for the text above the first header block
+        body - Text of the part below its header block
+        start, end - Offsets of the part, header block included, in the
+                     digest with CRLF line breaks replaced by LF
+        message - The parsed body, set by read_digest()
+    """
+
+    def __init__(self, headers, body, start, end):
+        self.headers = headers
+        self.body = body
+        self.start = start
+        self.end = end
+        self.message = None
+
+    def __repr__(self):
+        return '<DigestPart %d-%d %r>' % (self.start, self.end, self.headers.get('Subject'))
+
+
+def split_digest(text):
+    """ Splits a digest into its messages.
+
+        text - The digest body
+
+        Returns a list of DigestPart instances, without messages. Parts
+        with a blank body and no headers are left out.
+    """
+    text = text.replace('\r\n', '\n')
+    lines = text.split('\n')
+    offsets = []
+    offset = 0
+    for line in lines:
+        offsets.append(offset)
+        offset += len(line) + 1
+    offsets.append(len(text) + 1)
+
+    parts = []
+    # Header dict and first body line of the part being collected
+    headers, body_start, part_start = {}, 0, 0
+    i = 0
+    while i < len(lines):
+        if not HEADER_REGEX.match(lines[i]):
+            i += 1
+            continue
+        block, end = _header_block(lines, i)
+        if 'From' not in block or not _SECOND_FIELDS.intersection(block):
+            i = end
+            continue
+
+        cut = i
+        above = i - 1
+        if above >= 0 and not lines[above].strip() and above > body_start:
+            above -= 1
+        if above >= body_start and MARKER_REGEX.match(lines[above]):
+            cut = above
+        _append(parts, text, offsets, headers, body_start, part_start, cut)
+        while end < len(lines) and not lines[end].strip():
+            end += 1
+        headers, body_start, part_start = block, end, i
+        i = end
+    _append(parts, text, offsets, headers, body_start, part_start, len(lines))
+    return parts
+
+
+def read_digest(text, locales=None, profile=None, backend='serial', max_workers=None):
+    """ Splits a digest and parses every message in it.
+
+        text - The digest body
+        locales - Optional list of locale names
+        profile - Optional profiles.Profile
+        backend - One of batch.BACKENDS; every part is parsed on its own,
+                  so the process backends spread the parts over workers
+        max_workers - Number of workers of the parallel backends
+
+        Returns a list of DigestPart instances with their message set
+    """
+    parts = split_digest(text)
+    if backend == 'shared_memory' and profile is not None:
+        raise ValueError('The shared_memory backend only parses with the default profile')
+    if locales or profile is not None:
+        parse = functools.partial(EmailReplyParser.read, locales=locales, profile=profile)
+    else:
+        parse = EmailReplyParser.read
+    messages = _batch.parse_many([part.body for part in parts], backend=backend, max_workers=max_workers,
+                                 parse=parse)
+    for part, message in zip(parts, messages):
+        part.message = message
+    return parts
+
+
+def _header_block(lines, i):
+    """ Reads the header block starting at line i.
+
+        Returns (dict of headers, index of the line after the block)
+    """
+    block = {}
+    field = None
+    while i < len(lines):
+        line = lines[i]
+        match = HEADER_REGEX.match(line)
+        if match:
+            field = FIELDS[match.group(1).lower()]
+            block[field] = line[match.end():].strip(' \t*')
+        elif block and OTHER_HEADER_REGEX.match(line):
+            match = OTHER_HEADER_REGEX.match(line)
+            field = match.group(1)
+            block[field] = line[match.end():].strip()
+        elif field is not None and line[:1] in (' ', '\t') and line.strip():
+            # Folded header line
+            block[field] = (block[field] + ' ' + line.strip()).strip()
+        else:
+            break
+        i += 1
+    return block, i
+
+
+def _append(parts, text, offsets, headers, body_start, part_start, cut):
+    """ Adds the part whose body runs from line body_start to line cut.
+    """
+    start = offsets[part_start]
+    end = max(offsets[cut] - 1, offsets[body_start])
+    body = text[offsets[body_start]:end] if cut > body_start else ''
+    if headers or body.strip():
+        parts.append(DigestPart(headers, body, start, max(end, start)))
@@ -0,0 +1,143 @@
+"""
+    Dictionaries of known boilerplate footers.
+
+    Mail clients and companies append footers that no signature rule
+    recognizes: "Get Outlook for iOS", legal disclaimers, confidentiality
+    notices. A FooterDictionary compiles any number of such phrases into
+    one Aho-Corasick automaton, which finds every phrase occurring in a
+    line in a single pass over its characters, so the cost of a line does
+    not depend on the size of the dictionary.
+
+    When a dictionary is passed to the parser, every line of the scan is
+    matched against it. A line holding a phrase starts a signature the way
+    a "--" line does: the line and everything below it in its fragment are
+    marked as a signature, and the lines above it, even without a blank
+    line in between, are left to the reply. Quoted and header fragments
+    are left alone.
+
+    Phrases are matched within one line, ignoring case and runs of
+    whitespace, so a phrase should be a distinctive part of a footer
+    rather than the whole of a long notice.
+
+    Example:
+
+        from email_reply_parser import EmailReplyParser
+        from email_reply_parser.footers import COMMON, FooterDictionary
+
+        footers = FooterDictionary(COMMON + tuple(company_disclaimers))
+        EmailReplyParser.parse_reply(text, footers=footers)
+"""
+
+from collections import deque
+
+# Footers of common mail clients and disclaimers
+COMMON = (
+    'Get Outlook for iOS',
+    'Get Outlook for Android',
+    'Sent from Outlook',
+    'Sent from Mail for Windows',
+    'Sent from Yahoo Mail',
+    'Sent with ProtonMail',
+    'This email has been scanned for viruses',
+    'CONFIDENTIALITY NOTICE:',
+    'This email and any attachments are confidential',
+    'This message contains confidential information',
+    'If you have received this email in error',
+    'If you are not the intended recipient',
+)
+
+
+class FooterDictionary(object):
+    """ Aho-Corasick automaton over a set of footer phrases.
+
+        phrases - Iterable of phrases; blank ones are ignored
+        case_sensitive - Whether case matters, False by default
+
+        Nodes are numbered, the root being 0. goto[node] maps a character
+        to the next node, fail[node] is the node of the longest proper
+        suffix of the path to node that is also a path from the root, and
+        terminal[node] tells whether a phrase ends at node or at one of
+        its fail nodes.
+    """
+
+    def __init__(self, phrases, case_sensitive=False):
+        self.case_sensitive = case_sensitive
+        self.phrases = []
+        self.goto = [{}]
+        self.fail = [0]
+        self.terminal = [False]
+
+        for phrase in phrases:
+            phrase = self._normalize(phrase)
+            if phrase:
+                self.phrases.append(phrase)
+                self._insert(phrase)
+        self._link()
+
+    def __len__(self):
+        return len(self.phrases)
+
+    def _normalize(self, text):
+        text = ' '.join(text.split())
+        return text if self.case_sensitive else text.lower()
+
+    def _insert(self, phrase):
+        node = 0
+        for char in phrase:
+            found = self.goto[node].get(char)
+            if found is None:
+                found = len(self.goto)
+                self.goto.append({})
+                self.fail.append(0)
+                self.terminal.append(False)
+                self.goto[node][char] = found
+            node = found
+        self.terminal[node] = True
+
+    def _link(self):
+        """ Computes the fail links breadth first.
+        """
+        goto, fail, terminal = self.goto, self.fail, self.terminal
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in goto[node].items():
+                queue.append(child)
+                state = fail[node]
+                while state and char not in goto[state]:
+                    state = fail[state]
+                target = goto[state].get(char, 0)
+                fail[child] = target if target != child else 0
+                terminal[child] = terminal[child] or terminal[fail[child]]
+
+    def search(self, line):
+        """ Tells whether a line contains one of the phrases.
+
+            line - a row of the email message
+
+            Returns True or False
+        """
+        goto, fail, terminal = self.goto, self.fail, self.terminal
+        root = goto[0]
+        node = 0
+        for char in self._normalize(line):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0) if node else root.get(char, 0)
+            if terminal[node]:
+                return True
+        return False
+
+
+def dictionary(footers):
+    """ Returns the FooterDictionary for footers.
+
+        footers - A FooterDictionary, returned as is, or an iterable of
+                  phrases compiled on every call; compile once when
+                  parsing many messages
+
+        Returns a FooterDictionary
+    """
+    if isinstance(footers, FooterDictionary):
+        return footers
+    return FooterDictionary(footers)
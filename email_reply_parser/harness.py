@@ -0,0 +1,357 @@
+"""
+    Differential test harness for alternative parsing engines.
+
+    An engine is any callable that takes an email body and returns an
+    EmailMessage-like object exposing ``fragments``, ``reply`` and ``chain``.
+    The harness runs a reference engine and a candidate engine side by side
+    over a corpus, diffs their results, shrinks every failing input down to a
+    minimal reproduction and reports how much faster the candidate is.
+
+    The default reference is the frozen original parser in reference.py,
+    so running current_engine against it checks the parser as it is now
+    against the heuristics it started from.
+
+    Example:
+
+        from email_reply_parser import harness
+
+        corpus = list(harness.fixture_corpus('test/emails'))
+        corpus += list(harness.generated_corpus(500))
+        report = harness.run(my_engine, corpus)
+        print(report.summary())
+"""
+
+import os
+import random
+import sys
+import time
+
+from email_reply_parser import EmailReplyParser
+from email_reply_parser import reference as _reference
+
+
+def reference_engine(text):
+    """ The engine every candidate is compared against: the frozen
+        original parser.
+
+        text - A string email body
+
+        Returns a reference.EmailMessage instance
+    """
+    return _reference.read(text)
+
+
+def current_engine(text):
+    """ The parser as it is now.
+
+        text - A string email body
+
+        Returns an EmailMessage instance
+    """
+    return EmailReplyParser.read(text)
+
+
+def snapshot(message):
+    """ Reduces a parsed message to plain, comparable data.
+
+        message - An EmailMessage-like object
+
+        Returns a dict with fragments, reply and chain
+    """
+    return {
+        'fragments': [
+            (f.content, f.quoted, f.signature, f.headers, f.hidden)
+            for f in message.fragments
+        ],
+        'reply': message.reply,
+        'chain': message.chain,
+    }
+
+
+def outcome(engine, text):
+    """ Runs an engine and captures either its snapshot or the error raised.
+
+        engine - An engine callable
+        text - A string email body
+
+        Returns a snapshot dict
+    """
+    try:
+        return snapshot(engine(text))
+    except Exception as e:
+        return {'error': '%s: %s' % (type(e).__name__, e)}
+
+
+def diff(expected, actual):
+    """ Compares two snapshots.
+
+        expected - The reference snapshot
+        actual - The candidate snapshot
+
+        Returns a list of human readable differences, empty when equal
+    """
+    if 'error' in expected or 'error' in actual:
+        if expected.get('error') != actual.get('error'):
+            return ['error: %r != %r' % (expected.get('error'), actual.get('error'))]
+        return []
+
+    differences = []
+    for key in ('reply', 'chain'):
+        if expected[key] != actual[key]:
+            differences.append('%s: %r != %r' % (key, expected[key], actual[key]))
+
+    expected_fragments = expected['fragments']
+    actual_fragments = actual['fragments']
+    if len(expected_fragments) != len(actual_fragments):
+        differences.append('fragment count: %d != %d' % (len(expected_fragments), len(actual_fragments)))
+    for i, (e, a) in enumerate(zip(expected_fragments, actual_fragments)):
+        if e != a:
+            differences.append('fragment %d: %r != %r' % (i, e, a))
+    return differences
+
+
+def shrink(text, predicate):
+    """ Reduces a failing input to a minimal case.
+
+        Whole lines are removed first, then single characters, for as long
+        as the predicate keeps holding.
+
+        text - A string email body for which predicate(text) is True
+        predicate - Callable returning True while the input still fails
+
+        Returns the smallest failing text found
+    """
+    lines = text.split('\n')
+    lines = _ddmin(lines, lambda candidate: predicate('\n'.join(candidate)))
+    chars = _ddmin(list('\n'.join(lines)), lambda candidate: predicate(''.join(candidate)))
+    return ''.join(chars)
+
+
+def _ddmin(items, predicate):
+    """ Removes chunks of decreasing size from items while predicate holds.
+    """
+    chunk = max(len(items) // 2, 1)
+    while items:
+        removed = False
+        start = 0
+        while start < len(items):
+            candidate = items[:start] + items[start + chunk:]
+            if candidate != items and predicate(candidate):
+                items = candidate
+                removed = True
+            else:
+                start += chunk
+        if chunk == 1 and not removed:
+            break
+        if not removed:
+            chunk = max(chunk // 2, 1)
+    return items
+
+
+def fixture_corpus(directory):
+    """ Yields the email fixtures stored in a directory.
+
+        directory - Path to a directory of .txt email bodies
+
+        Yields (name, text) tuples sorted by name
+    """
+    for filename in sorted(os.listdir(directory)):
+        if filename.endswith('.txt'):
+            with open(os.path.join(directory, filename)) as f:
+                yield filename[:-4], f.read()
+
+
+# Building blocks mixed together by generated_corpus(). They cover every
+# heuristic of the parser: quote headers, quoted blocks, signatures, dash and
+# underscore separators, bullet lists and Outlook style header blocks.
+_BLOCKS = [
+    ['Thanks for the update, that works for me.'],
+    ['Sounds good.', '', 'See you tomorrow.'],
+    ['On Tue, Mar 1, 2011 at 6:02 PM, Someone <someone@example.com> wrote:'],
+    ['On Tue, Mar 1, 2011 at 6:02 PM, Someone', '<someone@example.com> wrote:'],
+    ['> Quoted text here', '> and some more', '>'],
+    ['>> Nested quote'],
+    ['--', 'Jane Doe'],
+    ['-Jane'],
+    ['__', 'Sent from my iPhone'],
+    ['Sent from my Windows Phone'],
+    ['Sent from my not so fancy phone but not a signature because it keeps going on and on'],
+    ['--------', 'A paragraph after a content separator that is long enough.',
+     'Another paragraph that is also quite long for the heuristic.',
+     'And a third paragraph that pushes the count of lines over.'],
+    ['________________________________'],
+    ['-----Original Message-----'],
+    ['- first bullet', '- second bullet', '- third bullet'],
+    ['From: Dan Watson [mailto:user@host.com]', 'Sent: Monday, November 26, 2012 10:48 AM',
+     'To: Watson, Dan', 'Subject: Re: New Issue'],
+    ['*From:* Someone <someone@example.com>', '*Sent:* Monday, November 26, 2012',
+     '*To:* Other', '*Subject:* Hello'],
+    ['From: a@example.com Sent: Monday, 1 May 2023 To: b@example.com Subject: Hi'],
+    ['Text before From: a@example.com Sent: today To: b@example.com'],
+    ['From: the body, not a header'],
+    ['Subject: not really a header either'],
+    [''],
+    ['   '],
+]
+
+
+def generated_corpus(count, seed=0, fixtures=None, max_blocks=12):
+    """ Yields randomly assembled email bodies.
+
+        count - Number of bodies to generate
+        seed - Seed for the random generator, so runs are reproducible
+        fixtures - Optional list of (name, text) tuples whose lines are
+                   spliced in alongside the built-in blocks
+        max_blocks - Upper bound on the number of blocks per body
+
+        Yields (name, text) tuples
+    """
+    rng = random.Random(seed)
+    blocks = list(_BLOCKS)
+    for _, text in fixtures or ():
+        lines = text.split('\n')
+        for start in range(0, len(lines), 4):
+            blocks.append(lines[start:start + 4])
+
+    for i in range(count):
+        lines = []
+        for _ in range(rng.randint(1, max_blocks)):
+            lines.extend(rng.choice(blocks))
+            if rng.random() < 0.3:
+                lines.append('')
+        text = '\n'.join(lines)
+        if rng.random() < 0.1:
+            text = text.replace('\n', '\r\n')
+        yield 'generated_%d' % i, text
+
+
+class Mismatch(object):
+    """ A corpus entry for which the candidate disagrees with the reference.
+    """
+
+    def __init__(self, name, text, minimal, differences):
+        self.name = name
+        self.text = text
+        self.minimal = minimal
+        self.differences = differences
+
+    def __repr__(self):
+        return '<Mismatch %s: %r>' % (self.name, self.minimal)
+
+
+class Report(object):
+    """ Result of a differential run.
+    """
+
+    def __init__(self, cases, mismatches, reference_time, candidate_time):
+        self.cases = cases
+        self.mismatches = mismatches
+        self.reference_time = reference_time
+        self.candidate_time = candidate_time
+
+    @property
+    def ok(self):
+        return not self.mismatches
+
+    @property
+    def speedup(self):
+        """ How many times faster the candidate ran than the reference.
+        """
+        if self.candidate_time <= 0:
+            return float('inf')
+        return self.reference_time / self.candidate_time
+
+    def summary(self):
+        """ Formats the report for humans.
+        """
+        out = [
+            '%d cases, %d mismatches' % (self.cases, len(self.mismatches)),
+            'reference %.4fs, candidate %.4fs, speedup %.2fx' % (
+                self.reference_time, self.candidate_time, self.speedup),
+        ]
+        for mismatch in self.mismatches:
+            out.append('')
+            out.append('%s: minimal input %r' % (mismatch.name, mismatch.minimal))
+            out.extend('    ' + d for d in mismatch.differences)
+        return '\n'.join(out)
+
+
+def run(candidate, corpus, reference=reference_engine, shrink_failures=True, repeat=1):
+    """ Runs both engines over a corpus and compares the results.
+
+        candidate - Engine under test
+        corpus - Iterable of (name, text) tuples
+        reference - Engine the candidate must agree with
+        shrink_failures - Whether to reduce failing inputs to minimal cases
+        repeat - Number of timed passes over the corpus per engine
+
+        Returns a Report instance
+    """
+    corpus = list(corpus)
+
+    reference_time = _time(reference, corpus, repeat)
+    candidate_time = _time(candidate, corpus, repeat)
+
+    mismatches = []
+    for name, text in corpus:
+        differences = diff(outcome(reference, text), outcome(candidate, text))
+        if not differences:
+            continue
+        minimal = text
+        if shrink_failures:
+            minimal = shrink(text, lambda t: bool(diff(outcome(reference, t), outcome(candidate, t))))
+            differences = diff(outcome(reference, minimal), outcome(candidate, minimal))
+        mismatches.append(Mismatch(name, text, minimal, differences))
+
+    return Report(len(corpus), mismatches, reference_time, candidate_time)
+
+
+def _time(engine, corpus, repeat):
+    """ Returns the total seconds spent running engine over corpus.
+    """
+    elapsed = 0.0
+    for _ in range(repeat):
+        for _, text in corpus:
+            t0 = time.perf_counter()
+            try:
+                engine(text)
+            except Exception:
+                pass
+            elapsed += time.perf_counter() - t0
+    return elapsed
+
+
+def _load_engine(path):
+    """ Imports an engine given as 'package.module:callable'.
+    """
+    module_name, _, attribute = path.partition(':')
+    module = __import__(module_name, fromlist=[attribute])
+    return getattr(module, attribute)
+
+
+def main(argv=None):
+    """ Command line entry point.
+
+        python -m email_reply_parser.harness package.module:engine [fixtures_dir] [generated_count]
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        sys.stderr.write(main.__doc__.strip() + '\n')
+        return 2
+
+    candidate = _load_engine(argv[0])
+    corpus = []
+    fixtures = []
+    if len(argv) > 1:
+        fixtures = list(fixture_corpus(argv[1]))
+        corpus.extend(fixtures)
+    count = int(argv[2]) if len(argv) > 2 else 1000
+    corpus.extend(generated_corpus(count, fixtures=fixtures))
+
+    report = run(candidate, corpus)
+    sys.stdout.write(report.summary() + '\n')
+    return 0 if report.ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,216 @@
+"""
+    HTML email input without a full DOM parse.
+
+    The HTML body is converted to text with a streaming stdlib
+    html.parser, which stops as soon as the reply boundary is reached:
+    a <blockquote>, an element with the gmail_quote, gmail_attr,
+    moz-cite-prefix or yahoo_quoted class, Outlook's divRplyFwdMsg or
+    appendonsend ids, or an <hr>. Only the reply is converted and then run
+    through EmailMessage, so signatures and header blocks are still
+    detected the usual way.
+
+    Example:
+
+        from email_reply_parser.html_reply import HtmlEmailMessage
+
+        message = HtmlEmailMessage(html).read()
+        message.reply
+"""
+
+import re
+from html.parser import HTMLParser
+
+from email_reply_parser import EmailMessage, Fragment
+
+BLOCK_TAGS = frozenset([
+    'address', 'article', 'aside', 'blockquote', 'dd', 'div', 'dl', 'dt', 'fieldset',
+    'figcaption', 'figure', 'footer', 'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+    'header', 'li', 'main', 'nav', 'ol', 'p', 'pre', 'section', 'table', 'tr', 'ul',
+])
+CELL_TAGS = frozenset(['td', 'th'])
+SKIP_TAGS = frozenset(['head', 'script', 'style', 'title'])
+
+BOUNDARY_TAGS = frozenset(['blockquote', 'hr'])
+BOUNDARY_CLASSES = frozenset(['gmail_quote', 'gmail_attr', 'moz-cite-prefix', 'yahoo_quoted'])
+BOUNDARY_IDS = frozenset(['divRplyFwdMsg', 'appendonsend'])
+
+_SPACE_REGEX = re.compile(r'[ \t\r\n\f]+')
+_BLANK_LINES_REGEX = re.compile(r'\n{3,}')
+
+
+class _StopConversion(Exception):
+    """ Raised from a handler to stop the parser at the reply boundary.
+    """
+
+
+class HtmlTextConverter(HTMLParser):
+    """ Converts HTML to text until the reply boundary.
+
+        stop_at_boundary - Whether to stop at the boundary; when False the
+                           quoted part is converted into a separate text
+    """
+
+    def __init__(self, stop_at_boundary=True):
+        HTMLParser.__init__(self, convert_charrefs=True)
+        self.stop_at_boundary = stop_at_boundary
+        self.boundary = False
+        self.reply_parts = []
+        self.chain_parts = []
+        self._out = self.reply_parts
+        self._skip = 0
+        self._pre = 0
+        self._line_start = True
+
+    def handle_starttag(self, tag, attrs):
+        if not self.boundary and self._is_boundary(tag, attrs):
+            self.boundary = True
+            if self.stop_at_boundary:
+                raise _StopConversion()
+            self._out = self.chain_parts
+            self._line_start = True
+
+        if tag in SKIP_TAGS:
+            self._skip += 1
+        elif tag == 'br':
+            self._write('\n')
+        elif tag == 'pre':
+            self._pre += 1
+            self._break()
+        elif tag in BLOCK_TAGS or tag == 'hr':
+            self._break()
+        elif tag in CELL_TAGS and not self._line_start:
+            self._write(' ')
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            self._skip = max(self._skip - 1, 0)
+        elif tag == 'pre':
+            self._pre = max(self._pre - 1, 0)
+            self._break()
+        elif tag in BLOCK_TAGS:
+            self._break()
+
+    def handle_data(self, data):
+        if self._skip or not data:
+            return
+        if not self._pre:
+            data = _SPACE_REGEX.sub(' ', data)
+            if self._line_start:
+                data = data.lstrip(' ')
+        data = data.replace('\u00a0', ' ')
+        if data:
+            self._write(data)
+
+    def _is_boundary(self, tag, attrs):
+        if tag in BOUNDARY_TAGS:
+            return True
+        for name, value in attrs:
+            if not value:
+                continue
+            if name == 'class' and not BOUNDARY_CLASSES.isdisjoint(value.split()):
+                return True
+            if name == 'id' and value in BOUNDARY_IDS:
+                return True
+        return False
+
+    def _break(self):
+        if not self._line_start:
+            self._write('\n')
+
+    def _write(self, data):
+        self._out.append(data)
+        self._line_start = data.endswith('\n')
+
+    @staticmethod
+    def _text(parts):
+        lines = ''.join(parts).split('\n')
+        return _BLANK_LINES_REGEX.sub('\n\n', '\n'.join(line.rstrip() for line in lines)).strip('\n')
+
+    @property
+    def reply_text(self):
+        return self._text(self.reply_parts)
+
+    @property
+    def chain_text(self):
+        return self._text(self.chain_parts)
+
+
+def html_to_text(html, stop_at_boundary=True):
+    """ Converts an HTML email body to text.
+
+        html - A string, or an iterable of string chunks which is consumed
+               lazily and left unconsumed past the reply boundary
+        stop_at_boundary - Whether to stop converting at the reply boundary
+
+        Returns (reply_text, chain_text, boundary_found); chain_text is
+        empty unless stop_at_boundary is False
+    """
+    converter = HtmlTextConverter(stop_at_boundary)
+    chunks = [html] if isinstance(html, str) else html
+    try:
+        for chunk in chunks:
+            converter.feed(chunk)
+        converter.close()
+    except _StopConversion:
+        pass
+    return converter.reply_text, converter.chain_text, converter.boundary
+
+
+class HtmlEmailMessage(EmailMessage):
+    """ An EmailMessage read from an HTML body.
+
+        Only the part above the reply boundary is converted and parsed as
+        text. With chain=True the quoted part is converted as well and
+        added as one quoted, hidden fragment at the end.
+    """
+
+    def __init__(self, html, chain=False, locales=None):
+        reply, quoted, self.boundary = html_to_text(html, stop_at_boundary=not chain)
+        EmailMessage.__init__(self, reply, locales=locales)
+        self._quoted = quoted
+
+    def read(self, table=None):
+        """ Reads the converted reply like EmailMessage.read(), then adds
+            the quoted part.
+
+            table - Optional LineTable of the converted reply
+
+            Returns HtmlEmailMessage instance
+        """
+        EmailMessage.read(self, table)
+        if self._quoted:
+            text = self.text
+            fragment = Fragment(True, self._quoted)
+            fragment.finish()
+            fragment.hidden = True
+            fragment.start = len(text) + 1
+            text = text + '\n' + self._quoted
+            fragment.end = len(text)
+            # Published like the normalized text, so the next read starts
+            # from the converted reply again
+            self._text = text
+            self.fragments.append(fragment)
+        return self
+
+
+def read_html(html, chain=False, locales=None):
+    """ Splits an HTML email into fragments.
+
+        html - An HTML string or iterable of string chunks
+        chain - Whether to convert the quoted part too
+        locales - Optional list of locale names
+
+        Returns an HtmlEmailMessage instance
+    """
+    return HtmlEmailMessage(html, chain=chain, locales=locales).read()
+
+
+def parse_reply_html(html, locales=None):
+    """ Provides the reply portion of an HTML email as text.
+
+        html - An HTML string or iterable of string chunks
+        locales - Optional list of locale names
+
+        Returns reply body message
+    """
+    return read_html(html, locales=locales).reply
@@ -0,0 +1,505 @@
+"""
+    End-to-end load testing from a local stand-in mail source.
+
+    bench.py times parse_many() over bodies already in memory. This module
+    measures the path a deployment runs: a corpus is replayed, at a fixed
+    rate or as fast as possible, as RFC 822 messages into a local stand-in
+    for the mail source, either a Maildir-like file-drop spool or an
+    in-process SMTP or LMTP receiver. Workers take the received messages
+    off a queue, decode their text/plain body and parse it with
+    EmailReplyParser.read(). Every run reports the sustained messages per
+    second, percentiles of the queue latency (from receipt to the start of
+    the parse) and of the total latency (from receipt to the end of the
+    parse), and the CPU time per message spent decoding and parsing.
+
+    The corpus is an mbox file or generated bodies (see bench.corpus()).
+    With the threads backend the workers share the GIL, so throughput only
+    scales with worker count on free-threaded builds; the processes
+    backend parses in a process pool of that many processes.
+
+        python -m email_reply_parser.loadtest --source smtp --workers 1,2,4 --rate 500
+
+    Example:
+
+        from email_reply_parser import loadtest
+
+        texts = loadtest.mbox_corpus('archive.mbox')
+        for report in loadtest.sweep(texts, (1, 2, 4), source='spool'):
+            print(report.as_dict())
+"""
+
+import argparse
+import email
+import email.message
+import email.policy
+import mailbox
+import os
+import queue
+import re
+import shutil
+import smtplib
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from email_reply_parser import EmailReplyParser
+from email_reply_parser import bench
+
+SOURCES = ('spool', 'smtp', 'lmtp')
+BACKENDS = ('threads', 'processes')
+
+# Reported latency percentiles
+PERCENTILES = (50, 90, 99)
+
+# Names Spool.deliver() gives messages: time of delivery, process id and
+# sequence number
+SPOOL_NAME_REGEX = re.compile(r'(\d+\.\d{6})-\d+-\d{8}\.eml\Z')
+
+
+def mbox_corpus(path):
+    """ Reads the bodies of the messages of an mbox file.
+
+        path - Path to the mbox file
+
+        Returns a list of string email bodies
+    """
+    box = mailbox.mbox(path, factory=lambda f: email.message_from_binary_file(f, policy=email.policy.default),
+                       create=False)
+    try:
+        return [message_body(message) for message in box]
+    finally:
+        box.close()
+
+
+def message_body(message):
+    """ Returns the text/plain body of a message, or '' when it has none.
+
+        message - An email.message.EmailMessage, or the raw bytes of one
+    """
+    if isinstance(message, bytes):
+        message = email.message_from_bytes(message, policy=email.policy.default)
+    part = message.get_body(('plain',))
+    if part is None:
+        return ''
+    return part.get_content().replace('\r\n', '\n')
+
+
+def to_message(text, index=0):
+    """ Wraps an email body in an RFC 822 message.
+
+        text - The email body
+        index - Number of the message in the corpus, used in its headers
+
+        Returns the message as bytes
+    """
+    message = email.message.EmailMessage()
+    message['From'] = 'sender%d@example.com' % index
+    message['To'] = 'load@example.com'
+    message['Subject'] = 'Load test %d' % index
+    message.set_content(text)
+    return message.as_bytes(policy=email.policy.SMTP)
+
+
+def percentile(values, p):
+    """ Nearest-rank percentile.
+
+        values - Sorted list of numbers
+        p - Percentile between 0 and 100
+
+        Returns the value, or 0.0 for no values
+    """
+    if not values:
+        return 0.0
+    rank = max(int(-(-p * len(values) // 100)), 1)
+    return values[min(rank, len(values)) - 1]
+
+
+class LoadReport(object):
+    """ Result of one run() call.
+
+        source, backend, workers - The settings of the run
+        rate - Offered messages per second, or None for as fast as possible
+        messages - Number of messages parsed
+        seconds - Time from the first receipt to the last parse finished
+        queue_latency - Sorted seconds from receipt to the start of the parse
+        total_latency - Sorted seconds from receipt to the end of the parse
+        cpu_seconds - Total CPU time spent decoding and parsing
+    """
+
+    def __init__(self, source, backend, workers, rate, messages, seconds, queue_latency, total_latency,
+                 cpu_seconds):
+        self.source = source
+        self.backend = backend
+        self.workers = workers
+        self.rate = rate
+        self.messages = messages
+        self.seconds = seconds
+        self.queue_latency = queue_latency
+        self.total_latency = total_latency
+        self.cpu_seconds = cpu_seconds
+
+    @property
+    def throughput(self):
+        """ Sustained messages per second """
+        return self.messages / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def cpu_per_message(self):
+        """ CPU seconds per message """
+        return self.cpu_seconds / self.messages if self.messages else 0.0
+
+    def as_dict(self):
+        result = {'source': self.source, 'backend': self.backend, 'workers': self.workers, 'rate': self.rate,
+                  'messages': self.messages, 'seconds': self.seconds, 'throughput': self.throughput,
+                  'cpu_per_message': self.cpu_per_message}
+        for p in PERCENTILES:
+            result['queue_p%d' % p] = percentile(self.queue_latency, p)
+            result['total_p%d' % p] = percentile(self.total_latency, p)
+        return result
+
+    def __repr__(self):
+        return '<LoadReport %s/%s workers=%d %.1f msg/s>' % (self.source, self.backend, self.workers,
+                                                            self.throughput)
+
+
+class Spool(object):
+    """ File-drop spool in the layout of a Maildir.
+
+        directory - Directory of the spool; tmp/ and new/ are created in it
+
+        A message is written to tmp/ and renamed into new/, so a reader
+        never sees a partial file. File names start with the time of
+        delivery (see SPOOL_NAME_REGEX). Messages dropped by other tools,
+        with any other name, are picked up too, dated by their
+        modification time.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.tmp = os.path.join(directory, 'tmp')
+        self.new = os.path.join(directory, 'new')
+        for path in (self.tmp, self.new):
+            if not os.path.isdir(path):
+                os.makedirs(path)
+        self._sequence = 0
+
+    def deliver(self, raw):
+        """ Drops the bytes of one message into the spool.
+        """
+        self._sequence += 1
+        name = '%017.6f-%d-%08d.eml' % (time.time(), os.getpid(), self._sequence)
+        path = os.path.join(self.tmp, name)
+        with open(path, 'wb') as f:
+            f.write(raw)
+        os.rename(path, os.path.join(self.new, name))
+
+
+class SpoolReceiver(object):
+    """ Polls the new/ directory of a Spool and queues what is dropped in it.
+
+        Files already in new/ when the receiver starts, such as those left
+        over from an earlier run, are left alone.
+
+        spool - The Spool
+        inbox - queue.Queue receiving (time received, raw bytes) tuples
+        poll_interval - Seconds between scans of an empty directory
+
+        received - Number of messages queued
+        delivered - Number of them named by Spool.deliver()
+    """
+
+    def __init__(self, spool, inbox, poll_interval=0.002):
+        self.spool = spool
+        self.inbox = inbox
+        self.poll_interval = poll_interval
+        self.received = 0
+        self.delivered = 0
+        self._existing = frozenset()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._poll, name='spool-receiver')
+        self._thread.daemon = True
+
+    def start(self):
+        self._existing = frozenset(os.listdir(self.spool.new))
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _poll(self):
+        while not self._stop.is_set():
+            names = sorted(name for name in os.listdir(self.spool.new) if name not in self._existing)
+            for name in names:
+                path = os.path.join(self.spool.new, name)
+                match = SPOOL_NAME_REGEX.match(name)
+                received = float(match.group(1)) if match else os.path.getmtime(path)
+                with open(path, 'rb') as f:
+                    raw = f.read()
+                os.unlink(path)
+                self.inbox.put((received, raw))
+                self.received += 1
+                if match:
+                    self.delivered += 1
+            if not names:
+                self._stop.wait(self.poll_interval)
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """ Minimal SMTP and LMTP session: enough of the protocols for smtplib.
+    """
+
+    def handle(self):
+        self._reply(b'220 localhost load test receiver')
+        data = None
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            if data is not None:
+                if line in (b'.\r\n', b'.\n'):
+                    self.server.receiver.deliver(b''.join(data))
+                    data = None
+                    self._reply(b'250 OK')
+                    continue
+                if line.startswith(b'.'):
+                    line = line[1:]
+                data.append(line)
+                continue
+
+            command = line[:4].upper()
+            if command in (b'HELO', b'EHLO', b'LHLO'):
+                self._reply(b'250 localhost')
+            elif command in (b'MAIL', b'RCPT', b'RSET', b'NOOP'):
+                self._reply(b'250 OK')
+            elif command == b'DATA':
+                data = []
+                self._reply(b'354 End data with <CR><LF>.<CR><LF>')
+            elif command == b'QUIT':
+                self._reply(b'221 Bye')
+                return
+            else:
+                self._reply(b'502 Command not implemented')
+
+    def _reply(self, line):
+        self.wfile.write(line + b'\r\n')
+        self.wfile.flush()
+
+
+class SMTPReceiver(object):
+    """ In-process SMTP (or LMTP) server queueing every message it accepts.
+
+        inbox - queue.Queue receiving (time received, raw bytes) tuples
+        host, port - Address to listen on; port 0 picks a free port, see
+                     address once started
+
+        Every message has one recipient, so the single reply to DATA is
+        valid for LMTP as well.
+    """
+
+    def __init__(self, inbox, host='127.0.0.1', port=0):
+        self.inbox = inbox
+        self.received = 0
+        self._lock = threading.Lock()
+        self.server = socketserver.ThreadingTCPServer((host, port), _SMTPHandler)
+        self.server.daemon_threads = True
+        self.server.receiver = self
+        self._thread = threading.Thread(target=self.server.serve_forever, name='smtp-receiver')
+        self._thread.daemon = True
+
+    @property
+    def address(self):
+        return self.server.server_address
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self._thread.join()
+
+    def deliver(self, raw):
+        self.inbox.put((time.time(), raw))
+        with self._lock:
+            self.received += 1
+
+
+def _timed_parse(raw):
+    """ Decodes and parses one message.
+
+        Returns (reply, CPU seconds used)
+    """
+    started = time.process_time()
+    reply = EmailReplyParser.read(message_body(raw)).reply
+    return reply, time.process_time() - started
+
+
+def _consume(inbox, results, pool):
+    """ Worker loop: parses messages off inbox until it gets None.
+    """
+    while True:
+        item = inbox.get()
+        if item is None:
+            return
+        received, raw = item
+        started = time.time()
+        if pool is None:
+            cpu = time.thread_time()
+            reply = EmailReplyParser.read(message_body(raw)).reply
+            cpu = time.thread_time() - cpu
+        else:
+            reply, cpu = pool.submit(_timed_parse, raw).result()
+        results.append((received, started, time.time(), cpu, reply))
+
+
+def run(texts, source='spool', workers=1, rate=None, backend='threads', spool_dir=None, timeout=60.0,
+        replies=None):
+    """ Replays a corpus through a stand-in mail source into the parser.
+
+        texts - List of string email bodies
+        source - One of SOURCES
+        workers - Number of parsing workers
+        rate - Messages per second offered to the source, or None to send
+               as fast as possible
+        backend - One of BACKENDS
+        spool_dir - Directory of the spool source, a temporary directory
+                    by default
+        timeout - Seconds to wait for the source to receive every message
+                  once they are all sent
+        replies - Optional list the parsed replies are appended to, in the
+                  order the parses finished
+
+        Returns a LoadReport
+    """
+    if source not in SOURCES:
+        raise ValueError('Unknown source %r, expected one of %s' % (source, ', '.join(SOURCES)))
+    if backend not in BACKENDS:
+        raise ValueError('Unknown backend %r, expected one of %s' % (backend, ', '.join(BACKENDS)))
+    if workers < 1:
+        raise ValueError('At least one worker is needed')
+
+    # Encoding the corpus is the job of the sender, not part of the run
+    messages = [to_message(text, i) for i, text in enumerate(texts)]
+    inbox = queue.Queue()
+    results = []
+    pool = ProcessPoolExecutor(workers) if backend == 'processes' else None
+    if pool is not None:
+        # Start the processes before the clock does
+        list(pool.map(_timed_parse, [to_message('')] * workers))
+    consumers = [threading.Thread(target=_consume, args=(inbox, results, pool), name='parse-worker-%d' % i)
+                 for i in range(workers)]
+    for consumer in consumers:
+        consumer.start()
+
+    temporary = None
+    if source == 'spool':
+        if spool_dir is None:
+            spool_dir = temporary = tempfile.mkdtemp(prefix='email-reply-spool-')
+        spool = Spool(spool_dir)
+        receiver = SpoolReceiver(spool, inbox)
+        send = spool.deliver
+        client = None
+    else:
+        receiver = SMTPReceiver(inbox)
+    receiver.start()
+    try:
+        if source != 'spool':
+            host, port = receiver.address
+            client = (smtplib.LMTP if source == 'lmtp' else smtplib.SMTP)(host, port)
+            send = lambda raw: client.sendmail('load@example.com', ['load@example.com'], raw)
+
+        started = time.perf_counter()
+        for i, raw in enumerate(messages):
+            if rate:
+                delay = started + i / float(rate) - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            send(raw)
+        if client is not None:
+            client.quit()
+
+        deadline = time.perf_counter() + timeout
+        # Messages dropped into the spool by hand do not stand in for those sent
+        while (receiver.delivered if source == 'spool' else receiver.received) < len(messages):
+            if time.perf_counter() > deadline:
+                raise RuntimeError('The %s source received %d of %d messages'
+                                   % (source, receiver.received, len(messages)))
+            time.sleep(0.001)
+    finally:
+        receiver.stop()
+        for _ in consumers:
+            inbox.put(None)
+        for consumer in consumers:
+            consumer.join()
+        if pool is not None:
+            pool.shutdown()
+        if temporary is not None:
+            shutil.rmtree(temporary, ignore_errors=True)
+
+    if replies is not None:
+        replies.extend(result[4] for result in results)
+    seconds = max(r[2] for r in results) - min(r[0] for r in results) if results else 0.0
+    return LoadReport(source, backend, workers, rate, len(results), seconds,
+                      sorted(max(r[1] - r[0], 0.0) for r in results),
+                      sorted(max(r[2] - r[0], 0.0) for r in results),
+                      sum(r[3] for r in results))
+
+
+def sweep(texts, worker_counts=(1, 2, 4), **options):
+    """ Runs the same load at several worker counts.
+
+        texts - List of string email bodies
+        worker_counts - Worker counts to measure
+        options - Other arguments of run()
+
+        Returns a list of LoadReport instances
+    """
+    return [run(texts, workers=workers, **options) for workers in worker_counts]
+
+
+def format_reports(reports):
+    """ Formats LoadReport instances as a table.
+    """
+    out = ['workers     msg/s   queue p50/p90/p99 ms    total p50/p90/p99 ms   cpu ms/msg']
+    for report in reports:
+        row = report.as_dict()
+        out.append('%7d %9.1f %22s %22s %12.3f' % (
+            report.workers, report.throughput,
+            '/'.join('%.1f' % (row['queue_p%d' % p] * 1000) for p in PERCENTILES),
+            '/'.join('%.1f' % (row['total_p%d' % p] * 1000) for p in PERCENTILES),
+            report.cpu_per_message * 1000))
+    return '\n'.join(out)
+
+
+def main(argv=None):
+    """ Command line entry point.
+    """
+    parser = argparse.ArgumentParser(prog='python -m email_reply_parser.loadtest',
+                                     description='Replays a corpus through a local mail source into the parser.')
+    parser.add_argument('--mbox', help='mbox file to replay, instead of a generated corpus')
+    parser.add_argument('--fixtures', help='directory of .txt bodies mixed into the generated corpus')
+    parser.add_argument('--count', type=int, default=2000, help='number of generated bodies')
+    parser.add_argument('--source', choices=SOURCES, default='spool')
+    parser.add_argument('--spool', help='spool directory, a temporary one by default')
+    parser.add_argument('--rate', type=float, help='messages per second, as fast as possible by default')
+    parser.add_argument('--workers', default='1,2,4', help='comma separated worker counts')
+    parser.add_argument('--backend', choices=BACKENDS, default='threads')
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    texts = mbox_corpus(args.mbox) if args.mbox else bench.corpus(args.fixtures, args.count)
+    worker_counts = [int(value) for value in args.workers.split(',') if value.strip()]
+    sys.stdout.write('%d messages from %s, %s backend, GIL %s, %s\n' % (
+        len(texts), args.source, args.backend, 'enabled' if bench.gil_enabled() else 'disabled',
+        'as fast as possible' if not args.rate else '%g msg/s offered' % args.rate))
+    reports = sweep(texts, worker_counts, source=args.source, rate=args.rate, backend=args.backend,
+                    spool_dir=args.spool)
+    sys.stdout.write(format_reports(reports) + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
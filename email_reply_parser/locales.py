@@ -0,0 +1,261 @@
+"""
+    Locale packs for quote headers and header blocks in other languages.
+
+    EmailMessage only knows English "On ... wrote:" quote headers and
+    From/Sent/To/Subject header blocks. A Locale adds the equivalents of one
+    language, and any number of locales are merged into a single
+    LocaleMatcher that classifies a line with a couple of dictionary lookups
+    and a walk over a reversed-suffix trie. Its cost per line does not
+    depend on the number of locales.
+
+    Quote headers are matched on a single line; the collapsing of quote
+    headers wrapped over several lines remains English only.
+
+    Example:
+
+        from email_reply_parser import EmailReplyParser
+
+        EmailReplyParser.parse_reply(text, locales=['de', 'fr'])
+"""
+
+import re
+
+QUOTE_HEADER = 1
+HEADER = 2
+
+FIELDS = ('From', 'Sent', 'To', 'Subject')
+
+# A date: a digit and later a year, as required by EmailMessage.SENT_EMAIL_REGEX.
+# Anchored with match() at the start of the value, so that a line full of
+# digits is scanned once instead of once per starting digit.
+_DATE_REGEX = re.compile(r'[^\d\n]*\d.*\d{4}')
+
+# Characters stripped around a header field name, as in "*Von:*" or "De :"
+_FIELD_STRIP = ' \t*\u00a0'
+_TRAILING_SPACE = ' \t\u00a0'
+
+
+class Locale(object):
+    """ Quote header and header block vocabulary of one language.
+
+        name - Short name the locale is registered under, e.g. 'de'
+        quote_headers - Iterable of (prefix, marker, suffix) tuples. A line
+                        is a quote header when it starts with prefix, ends
+                        with suffix (trailing spaces ignored) and contains
+                        marker in between. prefix and marker may be empty.
+        headers - Dict mapping localized header field names to one of
+                  'From', 'Sent', 'To' or 'Subject'
+    """
+
+    def __init__(self, name, quote_headers=(), headers=None):
+        self.name = name
+        self.quote_headers = tuple(quote_headers)
+        self.headers = dict(headers or {})
+        for field in self.headers.values():
+            if field not in FIELDS:
+                raise ValueError('Unknown header field %r, expected one of %s' % (field, ', '.join(FIELDS)))
+
+    def __repr__(self):
+        return '<Locale %s>' % self.name
+
+
+LOCALES = {}
+
+# LocaleMatcher instances by tuple of requested locales
+_matchers = {}
+
+
+def register(locale):
+    """ Makes a locale available by name.
+
+        locale - A Locale instance
+
+        Returns the locale
+    """
+    LOCALES[locale.name] = locale
+    _matchers.clear()
+    return locale
+
+
+register(Locale('de', quote_headers=[
+    ('Am ', ' schrieb ', ':'),
+    ('Am ', '', 'schrieb:'),
+], headers={
+    'Von': 'From', 'Gesendet': 'Sent', 'Datum': 'Sent', 'An': 'To', 'Betreff': 'Subject',
+}))
+
+register(Locale('fr', quote_headers=[
+    ('Le ', '', 'a écrit :'),
+    ('Le ', '', 'a écrit:'),
+], headers={
+    'De': 'From', 'Envoyé': 'Sent', 'Date': 'Sent', 'À': 'To', 'A': 'To', 'Objet': 'Subject',
+}))
+
+register(Locale('es', quote_headers=[
+    ('El ', '', 'escribió:'),
+], headers={
+    'De': 'From', 'Enviado': 'Sent', 'Fecha': 'Sent', 'Para': 'To', 'Asunto': 'Subject',
+}))
+
+register(Locale('pt', quote_headers=[
+    ('Em ', '', 'escreveu:'),
+], headers={
+    'De': 'From', 'Enviada': 'Sent', 'Enviado': 'Sent', 'Data': 'Sent', 'Para': 'To', 'Assunto': 'Subject',
+}))
+
+register(Locale('nl', quote_headers=[
+    ('Op ', ' schreef ', ':'),
+    ('Op ', '', 'schreef:'),
+], headers={
+    'Van': 'From', 'Verzonden': 'Sent', 'Datum': 'Sent', 'Aan': 'To', 'Onderwerp': 'Subject',
+}))
+
+register(Locale('it', quote_headers=[
+    ('Il ', '', 'ha scritto:'),
+], headers={
+    'Da': 'From', 'Inviato': 'Sent', 'Data': 'Sent', 'A': 'To', 'Oggetto': 'Subject',
+}))
+
+register(Locale('sv', quote_headers=[
+    ('Den ', ' skrev ', ':'),
+], headers={
+    'Från': 'From', 'Skickat': 'Sent', 'Datum': 'Sent', 'Till': 'To', 'Ämne': 'Subject',
+}))
+
+register(Locale('pl', quote_headers=[
+    ('W dniu ', ' napisał', ':'),
+], headers={
+    'Od': 'From', 'Wysłano': 'Sent', 'Data': 'Sent', 'Do': 'To', 'Temat': 'Subject',
+}))
+
+register(Locale('ja', quote_headers=[
+    ('', '', 'のメール:'),
+    ('', '', '書きました:'),
+], headers={
+    '差出人': 'From', '送信日時': 'Sent', '日付': 'Sent', '宛先': 'To', '件名': 'Subject',
+}))
+
+
+class LocaleMatcher(object):
+    """ All quote header and header patterns of several locales merged into
+        one prefix-dispatch matcher.
+
+        Quote header rules with a prefix are indexed by the first word of
+        the prefix, rules without one by their suffix in a reversed trie.
+        Header field names are looked up in a single dict.
+    """
+
+    def __init__(self, locales):
+        self.locales = tuple(locales)
+        self._by_word = {}
+        self._max_word = 0
+        self._suffix_trie = {}
+        self._fields = {}
+        self._max_field = 0
+
+        for locale in self.locales:
+            for prefix, marker, suffix in locale.quote_headers:
+                rule = (prefix, marker, suffix)
+                if prefix:
+                    word = prefix.split(' ', 1)[0]
+                    self._by_word.setdefault(word, []).append(rule)
+                    self._max_word = max(self._max_word, len(word))
+                else:
+                    node = self._suffix_trie
+                    for char in reversed(suffix):
+                        node = node.setdefault(char, {})
+                    node.setdefault(None, []).append(rule)
+            for name, field in locale.headers.items():
+                self._fields[name] = field
+                self._max_field = max(self._max_field, len(name))
+
+    def match(self, line):
+        """ Classifies a line.
+
+            line - a row of the email message
+
+            Returns QUOTE_HEADER, HEADER or 0
+        """
+        if self._is_quote_header(line):
+            return QUOTE_HEADER
+        if self._is_header(line):
+            return HEADER
+        return 0
+
+    def _is_quote_header(self, line):
+        end = len(line)
+        while end and line[end - 1] in _TRAILING_SPACE:
+            end -= 1
+
+        space = line.find(' ', 0, self._max_word + 1)
+        if space > 0:
+            for rule in self._by_word.get(line[:space], ()):
+                if self._matches(line, end, rule):
+                    return True
+
+        node = self._suffix_trie
+        position = end - 1
+        while position >= 0:
+            node = node.get(line[position])
+            if node is None:
+                break
+            for rule in node.get(None, ()):
+                if self._matches(line, end, rule):
+                    return True
+            position -= 1
+        return False
+
+    @staticmethod
+    def _matches(line, end, rule):
+        prefix, marker, suffix = rule
+        body_end = end - len(suffix)
+        if body_end < len(prefix) or not line.startswith(prefix) or not line.startswith(suffix, body_end):
+            return False
+        # The marker may share its surrounding spaces with prefix and suffix
+        return not marker or line.find(marker, max(len(prefix) - 1, 0), body_end + 1) >= 0
+
+    def _is_header(self, line):
+        bound = self._max_field + 4
+        colon = line.find(':', 0, bound)
+        if colon < 0:
+            colon = line.find('：', 0, bound)
+            if colon < 0:
+                return False
+        field = self._fields.get(line[:colon].strip(_FIELD_STRIP))
+        if field is None:
+            return False
+        if line.count('*') >= 2:
+            # Asterisk-wrapped headers (Outlook format)
+            return True
+        if field == 'From' or field == 'To':
+            return line.find('@', colon + 1) >= 0
+        if field == 'Sent':
+            return _DATE_REGEX.match(line, colon + 1) is not None
+        return True
+
+
+def matcher(locales):
+    """ Returns the LocaleMatcher for a list of locales.
+
+        Matchers are cached, so passing the same names for every message
+        costs nothing after the first one.
+
+        locales - Iterable of locale names, Locale instances, or an existing
+                  LocaleMatcher
+
+        Returns a LocaleMatcher
+    """
+    if isinstance(locales, LocaleMatcher):
+        return locales
+    key = tuple(locales)
+    found = _matchers.get(key)
+    if found is None:
+        resolved = []
+        for locale in key:
+            if not isinstance(locale, Locale):
+                if locale not in LOCALES:
+                    raise ValueError('Unknown locale %r, expected one of %s' % (locale, ', '.join(sorted(LOCALES))))
+                locale = LOCALES[locale]
+            resolved.append(locale)
+        found = _matchers[key] = LocaleMatcher(resolved)
+    return found
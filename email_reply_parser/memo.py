@@ -0,0 +1,204 @@
+"""
+    Memoization of quoted tails shared by many messages.
+
+    Notifications and automated replies often repeat the same long quoted
+    history below a short new reply, so a cache keyed by the whole body
+    never hits. EmailMessage scans lines bottom-up, and the state reached
+    after scanning the lines below a given line only depends on those
+    lines. A MemoizedParser therefore splits the normalized text at the
+    first boundary candidate (the first line starting with ">", or else
+    the first "From:" header line), fingerprints the tail from there on,
+    and reuses the fragments found in an identical tail seen before. Only
+    the lines above the boundary are scanned again.
+
+    A tail is not cached when the dash separator look-ahead ran on it,
+    because that look-ahead searches the whole text, prefix included.
+
+    Example:
+
+        from email_reply_parser.memo import MemoizedParser
+
+        parser = MemoizedParser(maxsize=4096)
+        for body in bodies:
+            parser.read(body).reply
+"""
+
+import copy
+import hashlib
+import threading
+from collections import OrderedDict
+
+from email_reply_parser import EmailMessage, _ScanState
+
+
+class TailCache(object):
+    """ Least recently used cache of scanned tails.
+
+        maxsize - Number of tails kept
+
+        hits, misses - Lookups that found or did not find a tail
+        uncacheable - Tails that could not be cached
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.uncacheable = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class _TailEntry(object):
+    """ Scan state reached after the lines of a tail, offsets relative to
+        the start of the tail. Never handed out, only copied.
+    """
+
+    __slots__ = ('fragments', 'fragment', 'found_visible', 'consumed', 'hidden_upto')
+
+    def __init__(self, state):
+        self.fragments = state.fragments
+        self.fragment = state.fragment
+        self.found_visible = state.found_visible
+        self.consumed = state.consumed
+        self.hidden_upto = state.hidden_upto
+
+    def restore(self, state, base):
+        """ Copies the tail into the scan state of a whole text.
+
+            state - the _ScanState of the whole text
+            base - offset of the tail in the whole text
+        """
+        for cached in self.fragments:
+            fragment = copy.copy(cached)
+            fragment.start += base
+            fragment.end += base
+            state.fragments.append(fragment)
+        if self.fragment is not None:
+            state.fragment = copy.copy(self.fragment)
+            state.fragment.lines = list(self.fragment.lines)
+        state.found_visible = self.found_visible
+        state.consumed = self.consumed
+        state.hidden_upto = self.hidden_upto
+
+
+class MemoizedEmailMessage(EmailMessage):
+    """ An EmailMessage whose read() looks up its quoted tail in a TailCache.
+
+        cache - The TailCache shared by the messages, which must all use
+                the same locales and profile
+        min_tail_lines - Shorter tails are scanned without the cache
+    """
+
+    def __init__(self, text, cache, locales=None, profile=None, min_tail_lines=8):
+        EmailMessage.__init__(self, text, locales=locales, profile=profile)
+        self.cache = cache
+        self.min_tail_lines = min_tail_lines
+
+    def read(self):
+        """ Creates new fragment for each line
+            and labels as a signature, quote, or hidden.
+
+            Returns EmailMessage instance
+        """
+        text, lines, offsets = self._normalize(self._source, self.profile)
+        state = _ScanState(text, lines, offsets)
+
+        split = self._tail_start(lines)
+        entry = None
+        if split is not None and len(lines) - split >= self.min_tail_lines:
+            base = offsets[split]
+            tail = text[base:]
+            key = hashlib.blake2b(tail.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+            entry = self.cache.get(key)
+            if entry is None:
+                tail_state = _ScanState(tail, lines[split:], [offset - base for offset in offsets[split:]])
+                for line in reversed(tail_state.lines):
+                    self._scan_line(tail_state, line)
+                if tail_state.separator_lines:
+                    self.cache.uncacheable += 1
+                else:
+                    entry = _TailEntry(tail_state)
+                    self.cache.put(key, entry)
+
+        if entry is None:
+            lines_to_scan = lines
+        else:
+            entry.restore(state, offsets[split])
+            lines_to_scan = lines[:split]
+
+        for line in reversed(lines_to_scan):
+            self._scan_line(state, line)
+
+        return self._publish(state)
+
+    def _tail_start(self, lines):
+        """ Finds the first boundary candidate.
+
+            Returns the index of the line the tail starts at, or None
+        """
+        header = None
+        for i, line in enumerate(lines):
+            if line.startswith('>'):
+                return i
+            if header is None and line.startswith(('From:', '*From:')):
+                header = i
+        return header
+
+
+class MemoizedParser(object):
+    """ Parses messages through a shared TailCache.
+
+        maxsize - Number of tails kept
+        locales - Optional list of locale names
+        profile - Optional profiles.Profile
+        min_tail_lines - Shorter tails are scanned without the cache
+    """
+
+    def __init__(self, maxsize=1024, locales=None, profile=None, min_tail_lines=8):
+        self.cache = TailCache(maxsize)
+        self.locales = locales
+        self.profile = profile
+        self.min_tail_lines = min_tail_lines
+
+    def read(self, text):
+        """ Splits an email into fragments like EmailReplyParser.read
+
+            Returns an EmailMessage instance
+        """
+        return MemoizedEmailMessage(text, self.cache, locales=self.locales, profile=self.profile,
+                                    min_tail_lines=self.min_tail_lines).read()
+
+    def parse_reply(self, text):
+        """ Returns the reply portion of an email
+        """
+        return self.read(text).reply
+
+    def parse_chain(self, text):
+        """ Returns the chain portion of an email
+        """
+        return self.read(text).chain
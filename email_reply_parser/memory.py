@@ -0,0 +1,145 @@
+"""
+    Opt-in report of the memory used by a parse.
+
+    Reading with memory=True traces the allocations of read() with
+    tracemalloc and attaches a MemoryReport to the message
+    (EmailMessage.memory): the peak traced during the parse, the bytes the
+    message still holds in its text and fragments, the bytes the list of
+    lines held while scanning, and how many times the body was copied.
+
+    read() drops the list of lines when it finishes, so EmailMessage.lines
+    is rebuilt from the text when asked for. The message keeps the body it
+    was given next to the normalized text only when normalization changed
+    it. Tracing allocations slows a read down several times; the results
+    are the same.
+
+    tracemalloc is global to the process, so measured reads hold a lock
+    from start() to finish() and run one at a time, even when they are
+    started from several threads. Unmeasured reads running in other
+    threads meanwhile are counted in the peak.
+
+    Example:
+
+        from email_reply_parser import EmailReplyParser
+
+        message = EmailReplyParser.read(body, memory=True)
+        print(message.memory)
+"""
+
+import sys
+import threading
+import tracemalloc
+
+# Held by the measured read in progress
+_lock = threading.Lock()
+
+
+class MemoryReport(object):
+    """ Memory used by one EmailMessage.read() call, in bytes.
+
+        peak_bytes - Peak traced above what was allocated before the parse,
+                     or an upper bound of it within a tracemalloc session
+                     of the caller (see start())
+        text_bytes - Held by the normalized text of the message, and by
+                     the text it was given when normalization changed it
+        fragments_bytes - Held by the fragments and their contents
+        lines_bytes - Held by the list of lines during the parse, released
+                      since
+        copies - Characters copied from the body, as a multiple of its
+                 length: the lines, the normalized text when it differs
+                 from the source, and the contents of the fragments
+    """
+
+    def __init__(self, peak_bytes, text_bytes, fragments_bytes, lines_bytes, copies):
+        self.peak_bytes = peak_bytes
+        self.text_bytes = text_bytes
+        self.fragments_bytes = fragments_bytes
+        self.lines_bytes = lines_bytes
+        self.copies = copies
+
+    @property
+    def retained_bytes(self):
+        """ Bytes still held by the message """
+        return self.text_bytes + self.fragments_bytes
+
+    def as_dict(self):
+        return {'peak_bytes': self.peak_bytes, 'retained_bytes': self.retained_bytes,
+                'text_bytes': self.text_bytes, 'fragments_bytes': self.fragments_bytes,
+                'lines_bytes': self.lines_bytes, 'copies': self.copies}
+
+    def __repr__(self):
+        return ('<MemoryReport peak=%d retained=%d text=%d fragments=%d lines=%d copies=%.2f>'
+                % (self.peak_bytes, self.retained_bytes, self.text_bytes, self.fragments_bytes,
+                   self.lines_bytes, self.copies))
+
+
+def start():
+    """ Starts tracing allocations for one parse, waiting for any other
+        measured parse to finish.
+
+        A tracemalloc session started by the caller is left as it is: its
+        peak is not reset, so the peak of the parse is only seen when it
+        rises above the peak of the session so far.
+
+        Returns a token for finish()
+    """
+    _lock.acquire()
+    try:
+        owned = not tracemalloc.is_tracing()
+        if owned:
+            tracemalloc.start()
+        return owned, tracemalloc.get_traced_memory()[0]
+    except BaseException:
+        _lock.release()
+        raise
+
+
+def finish(token):
+    """ Stops tracing allocations for one parse.
+
+        token - What start() returned
+
+        Returns the peak traced since start(), in bytes. Within a session
+        of the caller whose peak the parse did not exceed, this is the
+        peak of the session, an upper bound.
+    """
+    owned, base = token
+    try:
+        peak = tracemalloc.get_traced_memory()[1] - base
+        if owned:
+            tracemalloc.stop()
+    finally:
+        _lock.release()
+    return max(peak, 0)
+
+
+def report(message, state, peak_bytes):
+    """ Builds the MemoryReport of a read message.
+
+        message - The EmailMessage, after _publish()
+        state - The _ScanState of the read() call
+        peak_bytes - What finish() returned
+
+        Returns a MemoryReport
+    """
+    text_bytes = sys.getsizeof(message.text)
+    if message._source is not message.text:
+        text_bytes += sys.getsizeof(message._source)
+
+    fragments_bytes = sys.getsizeof(message.fragments)
+    for fragment in message.fragments:
+        fragments_bytes += sys.getsizeof(fragment) + sys.getsizeof(fragment.__dict__)
+        if fragment._content is not None:
+            fragments_bytes += sys.getsizeof(fragment._content)
+        if fragment.rules is not None:
+            fragments_bytes += sys.getsizeof(fragment.rules)
+
+    lines_bytes = sys.getsizeof(state.lines) + sum(sys.getsizeof(line) for line in state.lines)
+
+    copied = sum(len(line) for line in state.lines)
+    if state.text is not state.source:
+        copied += len(state.text)
+    copied += sum(len(fragment._content) for fragment in message.fragments if fragment._content is not None)
+    copies = float(copied) / len(state.source) if state.source else 0.0
+
+    return MemoryReport(peak_bytes, text_bytes, fragments_bytes, lines_bytes, copies)
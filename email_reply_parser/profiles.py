@@ -0,0 +1,91 @@
+"""
+    Parser profiles to switch off heuristics a deployment does not need.
+
+    Every stage is enabled by default. Disabling one changes results on
+    messages the stage would have applied to and saves its cost on all
+    others:
+
+        multi_quote_header - collapse "On ... wrote:" quote headers wrapped
+                             over several lines onto one line
+        outlook_separator - separate Outlook style replies from the
+                            underscore or dash line right below them
+        inline_headers - break "From: ... Sent: ... To:" runs onto
+                         their own lines
+        concatenated_headers - treat lines holding From:, Sent:, To: and
+                               Subject: in that order as headers
+        dash_lookahead - look at the lines after a long dash line to
+                         decide whether it separates content rather than
+                         starting a signature; when disabled it always
+                         starts a signature
+
+    Independently of profiles the parser skips stages that cannot apply
+    through cheap exact pre-checks, e.g. the multi-line quote header
+    search on text without "wrote:", the header rules on lines without a
+    colon, or the inline header split on lines without "From:".
+
+    Example:
+
+        from email_reply_parser import EmailReplyParser
+        from email_reply_parser.profiles import Profile
+
+        profile = Profile(outlook_separator=False, dash_lookahead=False)
+        EmailReplyParser.parse_reply(text, profile=profile)
+"""
+
+STAGES = ('multi_quote_header', 'outlook_separator', 'inline_headers', 'concatenated_headers', 'dash_lookahead')
+
+
+class Profile(object):
+    """ Set of enabled parser stages.
+
+        Profiles are immutable; use without() to derive a new one.
+    """
+
+    __slots__ = STAGES
+
+    def __init__(self, multi_quote_header=True, outlook_separator=True, inline_headers=True,
+                 concatenated_headers=True, dash_lookahead=True):
+        object.__setattr__(self, 'multi_quote_header', bool(multi_quote_header))
+        object.__setattr__(self, 'outlook_separator', bool(outlook_separator))
+        object.__setattr__(self, 'inline_headers', bool(inline_headers))
+        object.__setattr__(self, 'concatenated_headers', bool(concatenated_headers))
+        object.__setattr__(self, 'dash_lookahead', bool(dash_lookahead))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Profile is immutable, use without()')
+
+    def without(self, *stages):
+        """ Derives a profile with some stages disabled.
+
+            stages - Names of stages, see STAGES
+
+            Returns a Profile
+        """
+        for stage in stages:
+            if stage not in STAGES:
+                raise ValueError('Unknown stage %r, expected one of %s' % (stage, ', '.join(STAGES)))
+        return Profile(**dict((stage, getattr(self, stage) and stage not in stages) for stage in STAGES))
+
+    @property
+    def disabled(self):
+        """ Returns the names of the disabled stages
+        """
+        return tuple(stage for stage in STAGES if not getattr(self, stage))
+
+    def __eq__(self, other):
+        return isinstance(other, Profile) and self.disabled == other.disabled
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __reduce__(self):
+        return Profile, tuple(getattr(self, stage) for stage in STAGES)
+
+    def __hash__(self):
+        return hash(self.disabled)
+
+    def __repr__(self):
+        return '<Profile without %s>' % (', '.join(self.disabled) or 'nothing')
+
+
+DEFAULT = Profile()
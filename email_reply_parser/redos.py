@@ -0,0 +1,408 @@
+"""
+    Catastrophic-backtracking fuzzer and regex complexity guard.
+
+    Every regular expression defined on EmailMessage, or at module level in
+    one of MODULES, is mapped to the stage of the parser that applies it.
+    For each stage, adversarial inputs are generated from the literals of
+    the regex (repeated prefixes that never complete a match, runs of
+    separators, ...), and runtime is measured at growing input sizes. A
+    stage whose runtime grows faster than ``threshold`` (the exponent in
+    ``time ~ size ** exponent``) is reported as a failure.
+
+    Timing every stage takes a while and depends on the load of the
+    machine, so the test suite only runs check() when the
+    EMAIL_REPLY_PARSER_SLOW_TESTS environment variable is set. By default
+    it counts the work of full reads on the same adversarial inputs with
+    budgets.measure(), which is deterministic.
+
+    Example:
+
+        from email_reply_parser import redos
+
+        report = redos.check()
+        assert report.ok, report.summary()
+"""
+
+import gc
+import math
+import sys
+import time
+
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
+
+from email_reply_parser import EmailMessage, EmailReplyParser
+from email_reply_parser import locales as _locales
+
+# Exponent above which a stage is considered super-linear
+THRESHOLD = 1.5
+
+# A measurement is only trusted once the smallest input takes this long
+MIN_TIME = 0.002
+
+# The smallest measured input never grows beyond this many characters
+MAX_CHARS = 1 << 16
+
+# The widest measurement is skipped when predicted to take longer than this
+MAX_TIME = 1.0
+
+
+# Modules whose module-level regexes are guarded too, as 'module.NAME'
+MODULES = {'locales': _locales}
+
+
+def _regex(name):
+    """ Returns the regex of a stage name, an attribute of EmailMessage or
+        'module.NAME' for a module of MODULES.
+    """
+    module, _, attribute = name.rpartition('.')
+    return getattr(MODULES[module] if module else EmailMessage, attribute)
+
+
+def _match(name):
+    regex = _regex(name)
+    return lambda text: regex.match(text)
+
+
+def _search(name):
+    regex = _regex(name)
+    return lambda text: regex.search(text)
+
+
+# How the parser applies each regex defined on EmailMessage. Regexes that
+# would backtrack on their own are applied through linear helpers, and it is
+# those helpers that are measured.
+STAGES = {
+    'SIG_REGEX': _match('SIG_REGEX'),
+    'QUOTE_HDR_REGEX': _match('QUOTE_HDR_REGEX'),
+    'QUOTED_REGEX': _match('QUOTED_REGEX'),
+    'HEADER_REGEX': _match('HEADER_REGEX'),
+    'FROM_EMAIL_REGEX': _match('FROM_EMAIL_REGEX'),
+    'TO_EMAIL_REGEX': _match('TO_EMAIL_REGEX'),
+    'SENT_EMAIL_REGEX': _match('SENT_EMAIL_REGEX'),
+    'SUBJECT_EMAIL_REGEX': _match('SUBJECT_EMAIL_REGEX'),
+    'ASTERISK_HEADER_REGEX': _match('ASTERISK_HEADER_REGEX'),
+    'CONCATENATED_HEADERS_REGEX': EmailMessage._has_concatenated_headers,
+    'MULTI_QUOTE_HDR_REGEX': EmailMessage._normalize,
+    'MULTI_QUOTE_HDR_REGEX_MULTILINE': EmailMessage._normalize,
+    'OUTLOOK_SEPARATOR_REGEX': EmailMessage._normalize,
+    'OUTLOOK_BOUNDARY_REGEX': _match('OUTLOOK_BOUNDARY_REGEX'),
+    'INLINE_HEADERS_REGEX': EmailMessage._normalize,
+    'INLINE_HEADER_MARKER_REGEX': _search('INLINE_HEADER_MARKER_REGEX'),
+    'UNQUOTED_LINE_REGEX': _search('UNQUOTED_LINE_REGEX'),
+    'locales._DATE_REGEX': _match('locales._DATE_REGEX'),
+}
+
+# Repeated units that exercise the line-level heuristics of a full read:
+# dash look-ahead, header fragments hiding earlier fragments, bullet
+# counting and quote header collapsing.
+READ_UNITS = [
+    'x\n\n--------\n',
+    '\n--------\n',
+    'From: a@b\nx\n',
+    '- a\n',
+    '- a\n\n',
+    'On a\n',
+    'On ',
+    '> a\n',
+    '*From:* a\n',
+    'From:a@ Sent: ',
+    'Sent from my a ',
+]
+
+
+def regexes():
+    """ Returns the names of all compiled regexes defined on EmailMessage.
+    """
+    pattern_type = type(EmailMessage.SIG_REGEX)
+    return sorted(name for name in dir(EmailMessage)
+                  if isinstance(getattr(EmailMessage, name), pattern_type))
+
+
+def module_regexes():
+    """ Returns the names of the module-level regexes of MODULES, as
+        'module.NAME'.
+    """
+    pattern_type = type(EmailMessage.SIG_REGEX)
+    return sorted('%s.%s' % (module, name) for module, value in MODULES.items()
+                  for name in dir(value) if isinstance(getattr(value, name), pattern_type))
+
+
+def unguarded():
+    """ Returns the names of regexes on EmailMessage or in MODULES without
+        a stage.
+    """
+    return [name for name in regexes() + module_regexes() if name not in STAGES]
+
+
+def literals(regex):
+    """ Extracts the literal tokens of a compiled regex.
+
+        Runs of literal characters become one token, character classes
+        contribute one representative character.
+
+        regex - A compiled regular expression
+
+        Returns a list of strings
+    """
+    tokens = []
+
+    def walk(items):
+        run = []
+        for op, av in items:
+            char = _representative(op, av)
+            if char is not None:
+                run.append(char)
+                continue
+            if run:
+                tokens.append(''.join(run))
+                run = []
+            if op is sre_parse.SUBPATTERN:
+                walk(av[-1])
+            elif op is sre_parse.BRANCH:
+                for branch in av[1]:
+                    walk(branch)
+            elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+                walk(av[2])
+            elif op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+                walk(av[1])
+        if run:
+            tokens.append(''.join(run))
+
+    walk(sre_parse.parse(regex.pattern, regex.flags))
+    return tokens
+
+
+def _representative(op, av):
+    """ Returns a character matched by a single-character opcode, or None.
+    """
+    if op is sre_parse.LITERAL:
+        return chr(av)
+    if op is sre_parse.ANY:
+        return 'x'
+    if op is sre_parse.IN:
+        for member_op, member_av in av:
+            if member_op is sre_parse.LITERAL:
+                return chr(member_av)
+            if member_op is sre_parse.RANGE:
+                return chr(member_av[0])
+            if member_op is sre_parse.CATEGORY:
+                return {
+                    sre_parse.CATEGORY_DIGIT: '1',
+                    sre_parse.CATEGORY_SPACE: ' ',
+                    sre_parse.CATEGORY_WORD: 'a',
+                }.get(member_av, 'x')
+    return None
+
+
+def generators(tokens):
+    """ Builds adversarial input generators from literal tokens.
+
+        Each generator repeats part of a would-be match without ever
+        completing it, which is what drives a backtracking engine into
+        re-scanning the input.
+
+        tokens - A list of literal strings
+
+        Returns a list of (name, callable(n) -> str) tuples
+    """
+    if not tokens:
+        return [('filler', lambda n: 'a' * n)]
+
+    incomplete = tokens[:-1] or tokens
+    gens = [
+        ('first*n', lambda n: tokens[0] * n),
+        ('prefix*n', lambda n: ''.join(incomplete) * n),
+        ('prefix+space*n', lambda n: (' '.join(incomplete) + ' ') * n),
+        ('first+prefix*n', lambda n: tokens[0] + ''.join(incomplete[1:] or incomplete) * n),
+        ('first+digits*n', lambda n: tokens[0] + '1 ' * n),
+        ('first+filler*n', lambda n: tokens[0] + 'a' * n),
+    ]
+    for token in set(tokens):
+        gens.append(('%r*n' % token, lambda n, token=token: token * n))
+        gens.append(('%r+newline*n' % token, lambda n, token=token: (token + '\n') * n))
+    return gens
+
+
+class StageResult(object):
+    """ Scaling measurement of one stage on one adversarial input.
+    """
+
+    def __init__(self, stage, generator, sizes, times, exponent):
+        self.stage = stage
+        self.generator = generator
+        self.sizes = sizes
+        self.times = times
+        self.exponent = exponent
+
+    def __repr__(self):
+        return '<StageResult %s %s exponent=%.2f>' % (self.stage, self.generator, self.exponent)
+
+
+class Report(object):
+    """ Outcome of a complexity check.
+    """
+
+    def __init__(self, results, threshold):
+        self.results = results
+        self.threshold = threshold
+
+    @property
+    def failures(self):
+        return [r for r in self.results if r.exponent > self.threshold]
+
+    @property
+    def ok(self):
+        return not self.failures
+
+    def summary(self):
+        """ Formats the report for humans, worst stages first.
+        """
+        worst = {}
+        for r in self.results:
+            if r.stage not in worst or r.exponent > worst[r.stage].exponent:
+                worst[r.stage] = r
+        out = []
+        for r in sorted(worst.values(), key=lambda r: -r.exponent):
+            flag = 'FAIL' if r.exponent > self.threshold else 'ok'
+            out.append('%-4s %-32s exponent %5.2f on %s (%d chars, %.4fs)' % (
+                flag, r.stage, r.exponent, r.generator, r.sizes[-1], r.times[-1]))
+        return '\n'.join(out)
+
+
+def _best_time(stage, text, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        stage(text)
+        elapsed = time.perf_counter() - t0
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def growth(stage, make, repeat=3, min_time=MIN_TIME, max_chars=MAX_CHARS, max_time=MAX_TIME):
+    """ Measures how the runtime of a stage scales with input size.
+
+        The repetition count is doubled until the stage takes at least
+        min_time, then the stage is timed at 1x and 4x that size, and at
+        16x when that is predicted to finish within max_time. The wider the
+        span, the less timer noise affects the exponent.
+
+        stage - Callable taking the adversarial text
+        make - Callable returning the adversarial text for a repetition count
+        repeat - Timing runs per size, the fastest one is kept
+        min_time - Seconds the smallest measured input must take
+        max_chars - Upper bound on the smallest measured input length
+        max_time - Upper bound on the predicted time of the 16x run
+
+        Returns (sizes, times, exponent)
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        n = 16
+        while True:
+            text = make(n)
+            elapsed = _best_time(stage, text, repeat)
+            if elapsed >= min_time or len(text) * 2 > max_chars:
+                break
+            n *= 2
+
+        sizes = [len(text)]
+        times = [elapsed]
+        for factor in (4, 16):
+            if factor == 16 and times[-1] * 4 ** max(_exponent(sizes, times), 1) > max_time:
+                break
+            text = make(n * factor)
+            sizes.append(len(text))
+            times.append(_best_time(stage, text, repeat))
+    finally:
+        if enabled:
+            gc.enable()
+
+    if times[-1] < min_time:
+        # Too fast to measure reliably even at the largest size
+        return sizes, times, 0.0
+    return sizes, times, _exponent(sizes, times)
+
+
+def _exponent(sizes, times):
+    """ Returns the exponent of time ~ size ** exponent between the first
+        and the last measurement.
+    """
+    if times[0] <= 0 or sizes[0] == sizes[-1]:
+        return 0.0
+    return math.log(times[-1] / times[0]) / math.log(float(sizes[-1]) / sizes[0])
+
+
+def _confirmed_growth(stage, make, threshold, **kwargs):
+    """ Runs growth() and, when the stage looks super-linear, measures again
+        on larger inputs so timer noise on small inputs cannot fail a check.
+    """
+    sizes, times, exponent = growth(stage, make, **kwargs)
+    if exponent > threshold:
+        kwargs['min_time'] = kwargs.get('min_time', MIN_TIME) * 4
+        retry = growth(stage, make, **kwargs)
+        if retry[2] < exponent:
+            sizes, times, exponent = retry
+    return sizes, times, exponent
+
+
+def read_generators(tokens=None):
+    """ Builds the adversarial inputs of a full read: the READ_UNITS and
+        the generators of the literals of every stage.
+
+        tokens - Optional list of literal tokens, defaults to those of all
+                 stages
+
+        Returns a list of (name, callable(n) -> str) tuples
+    """
+    if tokens is None:
+        tokens = [token for name in sorted(STAGES) for token in literals(_regex(name))]
+    gens = [('%r*n' % unit, lambda n, unit=unit: unit * n) for unit in READ_UNITS]
+    return gens + generators(sorted(set(tokens)))
+
+
+def check(stages=None, threshold=THRESHOLD, include_read=True, **kwargs):
+    """ Runs every stage against its adversarial inputs.
+
+        stages - Optional list of regex names to check, defaults to all
+        threshold - Highest acceptable scaling exponent
+        include_read - Whether to also stress a full EmailReplyParser.read
+        kwargs - Passed on to growth()
+
+        Returns a Report instance
+    """
+    results = []
+    all_tokens = []
+    for name in stages or sorted(STAGES):
+        tokens = literals(_regex(name))
+        all_tokens.extend(tokens)
+        for generator, make in generators(tokens):
+            sizes, times, exponent = _confirmed_growth(STAGES[name], make, threshold, **kwargs)
+            results.append(StageResult(name, generator, sizes, times, exponent))
+
+    if include_read:
+        for generator, make in read_generators(all_tokens):
+            sizes, times, exponent = _confirmed_growth(EmailReplyParser.read, make, threshold, **kwargs)
+            results.append(StageResult('read', generator, sizes, times, exponent))
+
+    return Report(results, threshold)
+
+
+def main(argv=None):
+    """ Command line entry point.
+
+        python -m email_reply_parser.redos [REGEX_NAME ...]
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    report = check(stages=argv or None)
+    sys.stdout.write(report.summary() + '\n')
+    return 0 if report.ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
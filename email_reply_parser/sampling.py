@@ -0,0 +1,220 @@
+"""
+    Low-overhead sampling of parse timings for production traffic.
+
+    Profiling every parse (cProfile, or reading with trace=True) costs
+    more than the parse itself. A Sampler passed to EmailReplyParser.read()
+    or parse_reply() instead times one read in every N with a clock call
+    between its stages: normalizing the text, scanning its lines, and
+    publishing the fragments or the reply. Reads that are not sampled
+    only bump a counter.
+
+    The sampler sums the stage timings and keeps a bounded reservoir of
+    the slowest distinct sampled inputs. Inputs are kept as a SHA-256 digest only,
+    or truncated to a number of characters as well, so they can be written
+    out as fixtures with export_fixtures() to reproduce slow parses in
+    test/emails/ (every fixture there needs a row in the budgets of
+    test/test_budgets.py). Truncated inputs are only written out when their
+    full text can be looked up.
+
+    Example:
+
+        from email_reply_parser import EmailReplyParser
+        from email_reply_parser.sampling import Sampler
+
+        sampler = Sampler(every=1000, size=20, store='truncate')
+        for body in bodies:
+            EmailReplyParser.parse_reply(body, sampler=sampler)
+        print(sampler.format_report())
+        sampler.export_fixtures('test/emails')
+"""
+
+import hashlib
+import heapq
+import itertools
+import os
+import threading
+
+from email_reply_parser import tracing as _tracing
+
+# Timed stages of a read
+NORMALIZE = _tracing.NORMALIZE
+SCAN = 'scan'
+PUBLISH = 'publish'
+STAGES = (NORMALIZE, SCAN, PUBLISH)
+
+# How sampled inputs are kept
+STORES = ('hash', 'truncate')
+
+
+class Sample(object):
+    """ Timings of one sampled read.
+
+        seconds - Time of the three stages together
+        stages - Dict mapping stage names to seconds
+        digest - SHA-256 hex digest of the UTF-8 input
+        chars - Length of the input
+        text - The input cut to at most max_chars characters, on a line
+               boundary when there is one, or None when only the digest is
+               kept
+        truncated - Whether text is shorter than the input
+    """
+
+    def __init__(self, seconds, stages, digest, chars, text, truncated):
+        self.seconds = seconds
+        self.stages = stages
+        self.digest = digest
+        self.chars = chars
+        self.text = text
+        self.truncated = truncated
+
+    @property
+    def name(self):
+        """ Fixture name of the input """
+        return 'sampled_%s' % self.digest[:12]
+
+    def as_dict(self):
+        return {'seconds': self.seconds, 'stages': dict(self.stages), 'digest': self.digest, 'chars': self.chars,
+                'truncated': self.truncated}
+
+    def __repr__(self):
+        return '<Sample %s %.6fs %d chars>' % (self.digest[:12], self.seconds, self.chars)
+
+
+class Sampler(object):
+    """ Times one read in every N and keeps the slowest sampled inputs.
+
+        every - Sample one read in this many; 1 samples all of them
+        size - Number of slowest inputs kept
+        store - 'hash' to keep the digest of inputs only, 'truncate' to
+                keep their first max_chars characters as well
+        max_chars - Characters kept per input with store='truncate'
+
+        A sampler may be shared by reads in several threads.
+
+        sampled - Number of reads sampled
+        seen - Number of reads that asked whether to be sampled
+        seconds - Dict mapping stage names to their total over the samples
+    """
+
+    def __init__(self, every=100, size=20, store='hash', max_chars=65536):
+        if every < 1:
+            raise ValueError('every must be at least 1')
+        if store not in STORES:
+            raise ValueError('Unknown store %r, expected one of %s' % (store, ', '.join(STORES)))
+        self.every = every
+        self.size = size
+        self.store = store
+        self.max_chars = max_chars
+        self.sampled = 0
+        self.seen = 0
+        self.seconds = dict((stage, 0.0) for stage in STAGES)
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        # Min-heap of (seconds, sequence, Sample), fastest kept sample first
+        self._slowest = []
+
+    def tick(self):
+        """ Counts a read and tells whether to sample it.
+        """
+        seen = next(self._counter)
+        self.seen = seen + 1
+        return seen % self.every == 0
+
+    def record(self, source, normalize, scan, publish):
+        """ Adds the stage timings of a sampled read.
+
+            source - The text that was read
+            normalize, scan, publish - Seconds spent in each stage
+        """
+        seconds = normalize + scan + publish
+        with self._lock:
+            self.sampled += 1
+            totals = self.seconds
+            totals[NORMALIZE] += normalize
+            totals[SCAN] += scan
+            totals[PUBLISH] += publish
+            sequence = self.sampled
+            slowest = self._slowest
+            if len(slowest) >= self.size and (not slowest or seconds <= slowest[0][0]):
+                return
+        # Hash and copy outside the lock, and only for inputs that are kept
+        sample = Sample(seconds, {NORMALIZE: normalize, SCAN: scan, PUBLISH: publish},
+                        hashlib.sha256(source.encode('utf-8', 'surrogatepass')).hexdigest(), len(source),
+                        *self._kept(source))
+        with self._lock:
+            # A repeated input is kept once, with its slowest timings
+            for i, (kept_seconds, _, kept) in enumerate(slowest):
+                if kept.digest == sample.digest:
+                    if kept_seconds >= seconds:
+                        return
+                    slowest[i] = slowest[-1]
+                    slowest.pop()
+                    heapq.heapify(slowest)
+                    break
+            if len(slowest) < self.size:
+                heapq.heappush(slowest, (seconds, sequence, sample))
+            elif seconds > slowest[0][0]:
+                heapq.heapreplace(slowest, (seconds, sequence, sample))
+
+    def _kept(self, source):
+        """ Returns (text, truncated) of an input as stored.
+        """
+        if self.store == 'hash':
+            return None, False
+        if len(source) <= self.max_chars:
+            return source, False
+        text = source[:self.max_chars]
+        cut = text.rfind('\n')
+        return (text[:cut] if cut > 0 else text), True
+
+    def slowest(self):
+        """ Returns the kept samples, slowest first
+        """
+        with self._lock:
+            return [sample for _, _, sample in sorted(self._slowest, key=lambda item: (-item[0], item[1]))]
+
+    def rows(self):
+        """ Returns (stage, total seconds, mean seconds per sample) tuples
+        """
+        with self._lock:
+            return [(stage, self.seconds[stage], self.seconds[stage] / self.sampled if self.sampled else 0.0)
+                    for stage in STAGES]
+
+    def format_report(self):
+        """ Formats the stage timings and the slowest inputs as plain text.
+        """
+        lines = ['%-10s %12s %12s' % ('stage', 'seconds', 'mean')]
+        for stage, total, mean in self.rows():
+            lines.append('%-10s %12.6f %12.6f' % (stage, total, mean))
+        lines.append('%d of %d reads sampled' % (self.sampled, self.seen))
+        for sample in self.slowest():
+            lines.append('%s %12.6f %10d chars %s' % (
+                sample.digest[:12], sample.seconds, sample.chars,
+                ' '.join('%s=%.6f' % (stage, sample.stages[stage]) for stage in STAGES)))
+        return '\n'.join(lines)
+
+    def export_fixtures(self, directory, lookup=None):
+        """ Writes the slowest inputs as .txt fixtures.
+
+            directory - Directory to write to, such as test/emails
+            lookup - Optional function returning the full text of an input
+                     from its digest, or None, for inputs kept as a digest
+                     only or truncated; inputs without their full text are
+                     skipped, as a truncated one would not reproduce the
+                     parse
+
+            Returns the paths written, slowest input first
+        """
+        paths = []
+        for sample in self.slowest():
+            text = lookup(sample.digest) if lookup is not None else None
+            if text is None and not sample.truncated:
+                text = sample.text
+            if text is None:
+                continue
+            path = os.path.join(directory, sample.name + '.txt')
+            # Written as read, line endings included
+            with open(path, 'w', encoding='utf-8', newline='') as f:
+                f.write(text)
+            paths.append(path)
+        return paths
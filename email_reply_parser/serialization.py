@@ -0,0 +1,353 @@
+"""
+    Compact serialization of parse results.
+
+    A parsed message is stored as fragment flags packed into bits plus the
+    span of every fragment's content in the normalized text, encoded as
+    varints. The text itself is optional: without it, the original email
+    body has to be handed back to loads(), which normalizes it again
+    instead of re-parsing it.
+
+    Binary layout (version 1):
+
+        b'ERP' version:u8 options:u8 text_length:varint count:varint
+        [utf8_length:varint utf8_text]   if options & OPTION_TEXT
+        count * (flags:u8 gap:varint length:varint)
+
+    gap is the distance from the end of the previous content span to the
+    start of this one. Spans are only decoded when the fragments of the
+    loaded message are first accessed, and an embedded text when it is
+    first sliced: an ASCII text one fragment content at a time, any other
+    text as a whole.
+
+    Example:
+
+        from email_reply_parser import EmailReplyParser, serialization
+
+        data = serialization.dumps(EmailReplyParser.read(body))
+        message = serialization.loads(data, text=body)
+        message.reply
+"""
+
+from email_reply_parser import EmailMessage
+from email_reply_parser import profiles
+
+MAGIC = b'ERP'
+VERSION = 1
+
+OPTION_TEXT = 1
+
+QUOTED = 1
+SIGNATURE = 2
+HEADERS = 4
+HIDDEN = 8
+OPAQUE = 16
+
+
+def pack_flags(fragment):
+    """ Packs the boolean labels of a fragment into an int.
+    """
+    return (QUOTED if fragment.quoted else 0) \
+        | (SIGNATURE if fragment.signature else 0) \
+        | (HEADERS if fragment.headers else 0) \
+        | (HIDDEN if fragment.hidden else 0) \
+        | (OPAQUE if fragment.opaque else 0)
+
+
+def content_spans(message):
+    """ Computes where the content of each fragment lies in message.text.
+
+        message - A read EmailMessage
+
+        Returns a list of (flags, start, end) tuples
+    """
+    spans = []
+    text = message.text
+    for f in message.fragments:
+        raw = text[f.start:f.end]
+        start = f.start + len(raw) - len(raw.lstrip())
+        spans.append((pack_flags(f), start, start + len(f.content)))
+    return spans
+
+
+def dumps(message, include_text=False):
+    """ Serializes a parsed message.
+
+        message - A read EmailMessage
+        include_text - Whether to embed the normalized text
+
+        Returns bytes
+    """
+    out = bytearray(MAGIC)
+    out.append(VERSION)
+    out.append(OPTION_TEXT if include_text else 0)
+    _write_varint(out, len(message.text))
+
+    spans = content_spans(message)
+    _write_varint(out, len(spans))
+
+    if include_text:
+        encoded = message.text.encode('utf-8')
+        _write_varint(out, len(encoded))
+        out += encoded
+
+    previous = 0
+    for flags, start, end in spans:
+        out.append(flags)
+        _write_varint(out, start - previous)
+        _write_varint(out, end - start)
+        previous = end
+    return bytes(out)
+
+
+def loads(data, text=None, normalized=False, profile=None):
+    """ Loads a serialized message as a read-only view.
+
+        data - Bytes produced by dumps()
+        text - The email body, required when the text was not embedded
+        normalized - Whether text is already the normalized EmailMessage.text
+                     rather than the original body
+        profile - The profiles.Profile the message was parsed with
+
+        Returns a ParsedMessage instance
+    """
+    if data[:3] != MAGIC:
+        raise ValueError('Not a serialized email message')
+    if data[3] != VERSION:
+        raise ValueError('Unsupported serialization version %d' % data[3])
+    options = data[4]
+
+    text_length, pos = _read_varint(data, 5)
+    count, pos = _read_varint(data, pos)
+
+    if options & OPTION_TEXT:
+        size, pos = _read_varint(data, pos)
+        # Checked against text_length once decoded
+        text = _EmbeddedText(data, pos, size, text_length)
+        pos += size
+    elif text is None:
+        raise ValueError('The text was not serialized and must be passed to loads()')
+    elif not normalized:
+        text = EmailMessage._normalize(text.replace('\r\n', '\n'), profile or profiles.DEFAULT)[0]
+
+    if not isinstance(text, _EmbeddedText) and len(text) != text_length:
+        raise ValueError('The text does not match the serialized message')
+    return ParsedMessage(text, _SpanDecoder(data, pos, count))
+
+
+def to_dict(message, include_text=False):
+    """ Serializes a parsed message to JSON-compatible data.
+
+        Spans are flattened into one list of start, end pairs.
+
+        message - A read EmailMessage
+        include_text - Whether to embed the normalized text
+
+        Returns a dict
+    """
+    spans = content_spans(message)
+    data = {
+        'v': VERSION,
+        'length': len(message.text),
+        'flags': [flags for flags, _, _ in spans],
+        'spans': [offset for _, start, end in spans for offset in (start, end)],
+    }
+    if include_text:
+        data['text'] = message.text
+    return data
+
+
+def from_dict(data, text=None, normalized=False, profile=None):
+    """ Loads the output of to_dict() as a read-only view.
+
+        data - A dict produced by to_dict()
+        text - The email body, required when the text was not embedded
+        normalized - Whether text is already the normalized EmailMessage.text
+        profile - The profiles.Profile the message was parsed with
+
+        Returns a ParsedMessage instance
+    """
+    if 'text' in data:
+        text = data['text']
+    elif text is None:
+        raise ValueError('The text was not serialized and must be passed to from_dict()')
+    elif not normalized:
+        text = EmailMessage._normalize(text.replace('\r\n', '\n'), profile or profiles.DEFAULT)[0]
+    if len(text) != data['length']:
+        raise ValueError('The text does not match the serialized message')
+
+    offsets = data['spans']
+    spans = [(flags, offsets[2 * i], offsets[2 * i + 1]) for i, flags in enumerate(data['flags'])]
+    return ParsedMessage(text, lambda: spans)
+
+
+class FragmentView(tuple):
+    """ Read-only fragment backed by a span of the message text.
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, text, flags, start, end):
+        return tuple.__new__(cls, (text, flags, start, end))
+
+    @property
+    def flags(self):
+        return self[1]
+
+    @property
+    def start(self):
+        return self[2]
+
+    @property
+    def end(self):
+        return self[3]
+
+    @property
+    def content(self):
+        return self[0][self[2]:self[3]]
+
+    @property
+    def quoted(self):
+        return bool(self[1] & QUOTED)
+
+    @property
+    def signature(self):
+        return bool(self[1] & SIGNATURE)
+
+    @property
+    def headers(self):
+        return bool(self[1] & HEADERS)
+
+    @property
+    def hidden(self):
+        return bool(self[1] & HIDDEN)
+
+    @property
+    def opaque(self):
+        return bool(self[1] & OPAQUE)
+
+    def __repr__(self):
+        return '<FragmentView %d-%d flags=%d>' % (self[2], self[3], self[1])
+
+
+class ParsedMessage(object):
+    """ Read-only EmailMessage-like view over deserialized results.
+    """
+
+    __slots__ = ('_text', '_spans', '_fragments')
+
+    reply = EmailMessage.reply
+    chain = EmailMessage.chain
+
+    def __init__(self, text, spans):
+        """ text - The normalized text, or the _EmbeddedText of loads()
+            spans - Callable returning a list of (flags, start, end) tuples
+        """
+        object.__setattr__(self, '_text', text)
+        object.__setattr__(self, '_spans', spans)
+        object.__setattr__(self, '_fragments', None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('%s is read-only' % type(self).__name__)
+
+    @property
+    def text(self):
+        text = self._text
+        return text.decode() if isinstance(text, _EmbeddedText) else text
+
+    @property
+    def fragments(self):
+        if self._fragments is None:
+            text = self._text
+            object.__setattr__(self, '_fragments', tuple(
+                FragmentView(text, flags, start, end) for flags, start, end in self._spans()))
+        return self._fragments
+
+
+class _EmbeddedText(object):
+    """ The UTF-8 text embedded by dumps(), decoded on demand.
+
+        While the text has as many bytes as characters it is ASCII, and
+        slices are decoded on their own. Otherwise the first slice decodes
+        the whole text.
+    """
+
+    __slots__ = ('data', 'pos', 'size', 'length', 'text')
+
+    def __init__(self, data, pos, size, length):
+        """ data - Bytes produced by dumps()
+            pos - Offset of the encoded text in data
+            size - Length of the encoded text
+            length - Length of the text in characters
+        """
+        self.data = data
+        self.pos = pos
+        self.size = size
+        self.length = length
+        self.text = None
+
+    def __getitem__(self, key):
+        if self.text is None and self.size == self.length:
+            start, stop, _ = key.indices(self.length)
+            return self.data[self.pos + start:self.pos + max(start, stop)].decode('ascii')
+        return self.decode()[key]
+
+    def decode(self):
+        """ Returns the whole text
+        """
+        if self.text is None:
+            text = self.data[self.pos:self.pos + self.size].decode('utf-8')
+            if len(text) != self.length:
+                raise ValueError('The text does not match the serialized message')
+            self.text = text
+        return self.text
+
+
+class _SpanDecoder(object):
+    """ Decodes the binary span table on demand.
+    """
+
+    __slots__ = ('data', 'pos', 'count')
+
+    def __init__(self, data, pos, count):
+        self.data = data
+        self.pos = pos
+        self.count = count
+
+    def __call__(self):
+        data = self.data
+        pos = self.pos
+        spans = []
+        previous = 0
+        for _ in range(self.count):
+            flags = data[pos]
+            gap, pos = _read_varint(data, pos + 1)
+            length, pos = _read_varint(data, pos)
+            start = previous + gap
+            previous = start + length
+            spans.append((flags, start, previous))
+        return spans
+
+
+def _write_varint(out, value):
+    """ Appends an unsigned LEB128 varint to a bytearray.
+    """
+    while value >= 0x80:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, pos):
+    """ Reads an unsigned LEB128 varint.
+
+        Returns (value, position after the varint)
+    """
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
@@ -0,0 +1,147 @@
+"""
+    Opt-in trace of the heuristics that decide every fragment.
+
+    Reading with trace=True records, for each fragment, the ids of the
+    rules that fired on its lines or decided its labels (Fragment.rules),
+    and for the whole message how often each rule was evaluated, how often
+    it fired and the time spent in it (EmailMessage.trace). Traces of many
+    messages are summed with aggregate() to see which rules are worth
+    optimizing or disabling.
+
+    Tracing evaluates the line rules one by one with a timer around each,
+    so it is slower than a normal read; the results are the same.
+
+    Example:
+
+        from email_reply_parser import EmailReplyParser, tracing
+
+        messages = [EmailReplyParser.read(body, trace=True) for body in bodies]
+        print(tracing.format_report(tracing.aggregate(messages)))
+"""
+
+from time import perf_counter as clock
+
+# Line rules, evaluated on every line
+QUOTE_HEADER = 'quote_header'
+QUOTED = 'quoted'
+ASTERISK_HEADER = 'asterisk_header'
+CONCATENATED_HEADERS = 'concatenated_headers'
+FROM_HEADER = 'from_header'
+TO_HEADER = 'to_header'
+SENT_HEADER = 'sent_header'
+SUBJECT_HEADER = 'subject_header'
+LOCALE = 'locale'
+
+# Signature rules, evaluated on the line above a blank line
+SIGNATURE_CHECK = 'signature_check'
+SENT_FROM_MY = 'sent_from_my'
+DASH_SIGNATURE = 'dash_signature'
+DASH_LOOKAHEAD = 'dash_lookahead'
+UNDERSCORE_SIGNATURE = 'underscore_signature'
+BULLET_COUNTER = 'bullet_counter'
+FOOTER = 'footer'
+
+# Fragment rules, applied when a fragment is finished
+HEADERS_HIDE_PREVIOUS = 'headers_hide_previous'
+HIDDEN_BY_HEADERS = 'hidden_by_headers'
+HIDDEN_BEFORE_VISIBLE = 'hidden_before_visible'
+
+# Stages of read()
+NORMALIZE = 'normalize'
+
+RULES = (
+    QUOTE_HEADER, QUOTED, ASTERISK_HEADER, CONCATENATED_HEADERS, FROM_HEADER, TO_HEADER,
+    SENT_HEADER, SUBJECT_HEADER, LOCALE, SIGNATURE_CHECK, SENT_FROM_MY, DASH_SIGNATURE,
+    DASH_LOOKAHEAD, UNDERSCORE_SIGNATURE, BULLET_COUNTER, FOOTER, HEADERS_HIDE_PREVIOUS,
+    HIDDEN_BY_HEADERS, HIDDEN_BEFORE_VISIBLE, NORMALIZE,
+)
+
+
+class Trace(object):
+    """ Rule statistics of one or more reads.
+
+        calls - Dict mapping rule ids to the number of evaluations
+        hits - Dict mapping rule ids to the number of times they fired
+        seconds - Dict mapping rule ids to the cumulative time spent
+        decided - Dict mapping rule ids to the number of fragments they
+                  appear on
+        messages - Number of messages traced
+    """
+
+    def __init__(self):
+        self.calls = {}
+        self.hits = {}
+        self.seconds = {}
+        self.decided = {}
+        self.messages = 0
+
+    def time(self, rule, seconds, hit):
+        """ Records one evaluation of a rule.
+        """
+        self.calls[rule] = self.calls.get(rule, 0) + 1
+        self.seconds[rule] = self.seconds.get(rule, 0.0) + seconds
+        if hit:
+            self.hits[rule] = self.hits.get(rule, 0) + 1
+
+    def fire(self, fragment, rule):
+        """ Records that a rule contributed to the labels of a fragment.
+        """
+        if fragment.rules is None:
+            fragment.rules = [rule]
+        elif rule not in fragment.rules:
+            fragment.rules.append(rule)
+        else:
+            return
+        self.decided[rule] = self.decided.get(rule, 0) + 1
+
+    def merge(self, other):
+        """ Adds the statistics of another trace to this one.
+
+            Returns self
+        """
+        for mine, theirs in ((self.calls, other.calls), (self.hits, other.hits),
+                             (self.seconds, other.seconds), (self.decided, other.decided)):
+            for rule, value in theirs.items():
+                mine[rule] = mine.get(rule, 0) + value
+        self.messages += other.messages
+        return self
+
+    def rows(self):
+        """ Returns (rule, calls, hits, fragments, seconds) tuples, slowest
+            rule first
+        """
+        rules = set(self.calls) | set(self.decided)
+        rows = [(rule, self.calls.get(rule, 0), self.hits.get(rule, 0), self.decided.get(rule, 0),
+                 self.seconds.get(rule, 0.0)) for rule in rules]
+        rows.sort(key=lambda row: (-row[4], row[0]))
+        return rows
+
+
+def aggregate(messages):
+    """ Sums the traces of messages read with trace=True.
+
+        messages - Iterable of EmailMessage instances or Trace instances
+
+        Returns a Trace
+    """
+    total = Trace()
+    for message in messages:
+        trace = message if isinstance(message, Trace) else message.trace
+        if trace is None:
+            raise ValueError('Message was not read with trace=True')
+        total.merge(trace)
+    return total
+
+
+def format_report(trace):
+    """ Formats a trace as a plain text table.
+
+        trace - A Trace instance
+
+        Returns a string
+    """
+    lines = ['%-22s %10s %10s %10s %12s' % ('rule', 'calls', 'hits', 'fragments', 'seconds')]
+    for rule, calls, hits, fragments, seconds in trace.rows():
+        lines.append('%-22s %10d %10d %10d %12.6f' % (rule, calls, hits, fragments, seconds))
+    lines.append('%d messages' % trace.messages)
+    return '\n'.join(lines)
@@ -0,0 +1,262 @@
+"""
+    Long-lived stdin/stdout worker for pipelines.
+
+        zcat mail.jsonl.gz | python -m email_reply_parser --workers 4 | jq .reply
+
+    Input is either newline-delimited JSON, every line being a JSON string
+    holding the email body or an object with the body under "text" (other
+    keys are copied to the output), or length-prefixed frames: a 4-byte
+    big-endian length followed by that many bytes of UTF-8 body.
+
+    Output is one JSON object per input record, in input order, as JSON
+    lines or as length-prefixed frames. Records that cannot be read, or
+    whose parse takes longer than --timeout seconds, give an object with
+    an "error" key instead of stopping the stream.
+
+    Records are read and written in batches with bulk I/O. With --workers
+    the batches are decoded, parsed and encoded in a process pool, and the
+    parent process only moves bytes.
+"""
+
+import argparse
+import json
+import os
+import struct
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from email_reply_parser import EmailReplyParser
+from email_reply_parser import locales as _locales
+from email_reply_parser.cancellation import CancellationToken, ParseCancelled
+from email_reply_parser.profiles import DEFAULT, STAGES
+
+FORMATS = ('jsonl', 'frames')
+FIELDS = ('reply', 'chain', 'fragments')
+FLUSH = ('record', 'batch', 'end')
+
+_FRAME_HEADER = struct.Struct('>I')
+
+
+def run(stdin, stdout, input_format='jsonl', output_format='jsonl', fields=('reply', 'chain'), workers=0,
+        batch_size=256, flush='batch', locales=None, profile=None, timeout=None):
+    """ Parses a stream of records into a stream of results.
+
+        stdin - Binary file object to read records from
+        stdout - Binary file object to write results to
+        input_format, output_format - 'jsonl' or 'frames'
+        fields - Result fields, any of 'reply', 'chain' and 'fragments'
+        workers - Number of worker processes, 0 to parse in this process
+        batch_size - Number of records per batch
+        flush - 'record' to flush after every record (batches of one),
+                'batch' after every batch, 'end' only at the end
+        locales - Optional list of locale names
+        profile - Optional profiles.Profile
+        timeout - Optional number of seconds after which the parse of one
+                  record is abandoned
+
+        Returns the number of records written
+    """
+    for name, value, allowed in (('input format', input_format, FORMATS), ('output format', output_format, FORMATS),
+                                 ('flush mode', flush, FLUSH)):
+        if value not in allowed:
+            raise ValueError('Unknown %s %r, expected one of %s' % (name, value, ', '.join(allowed)))
+    for field in fields:
+        if field not in FIELDS:
+            raise ValueError('Unknown field %r, expected one of %s' % (field, ', '.join(FIELDS)))
+    if locales:
+        _locales.matcher(locales)
+    if flush == 'record':
+        batch_size = 1
+
+    options = (input_format, output_format, tuple(fields), locales, profile, timeout)
+    batches = read_batches(stdin, input_format, batch_size)
+    count = 0
+    if workers:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        outputs = _ordered(executor, batches, options, 2 * workers)
+    else:
+        executor = None
+        outputs = (convert_batch(batch, options) for batch in batches)
+    try:
+        for records, data in outputs:
+            stdout.write(data)
+            count += records
+            if flush != 'end':
+                stdout.flush()
+    finally:
+        if executor is not None:
+            # Closing the generator cancels the batches not started yet
+            outputs.close()
+            executor.shutdown()
+    stdout.flush()
+    return count
+
+
+def read_batches(stream, input_format, batch_size):
+    """ Splits a binary stream into batches of raw records.
+
+        Yields lists of bytes, without line breaks or frame headers
+    """
+    batch = []
+    if input_format == 'jsonl':
+        for line in stream:
+            line = line.strip()
+            if line:
+                batch.append(line)
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+    else:
+        while True:
+            header = stream.read(_FRAME_HEADER.size)
+            if not header:
+                break
+            if len(header) < _FRAME_HEADER.size:
+                raise ValueError('Truncated frame header')
+            size, = _FRAME_HEADER.unpack(header)
+            body = stream.read(size)
+            if len(body) < size:
+                raise ValueError('Truncated frame, expected %d bytes, got %d' % (size, len(body)))
+            batch.append(body)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def convert_batch(batch, options):
+    """ Parses a batch of raw records.
+
+        batch - List of raw records as produced by read_batches()
+        options - (input_format, output_format, fields, locales, profile, timeout)
+
+        Returns (number of records, encoded results)
+    """
+    input_format, output_format, fields, locales, profile, timeout = options
+    out = []
+    for raw in batch:
+        data = _encode(_result(raw, input_format, fields, locales, profile, timeout))
+        if output_format == 'jsonl':
+            out.append(data)
+            out.append(b'\n')
+        else:
+            out.append(_FRAME_HEADER.pack(len(data)))
+            out.append(data)
+    return len(batch), b''.join(out)
+
+
+def _encode(result):
+    """ Encodes one result as UTF-8 JSON. A result holding text that UTF-8
+        cannot encode, such as a lone surrogate, is replaced by an error
+        object keeping the keys that can be encoded.
+    """
+    try:
+        return json.dumps(result, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    except UnicodeEncodeError as e:
+        error = {}
+        for key, value in result.items():
+            try:
+                json.dumps(value, ensure_ascii=False).encode('utf-8')
+            except UnicodeEncodeError:
+                continue
+            error[key] = value
+        error['error'] = str(e)
+        return json.dumps(error, separators=(',', ':')).encode('utf-8')
+
+
+def _result(raw, input_format, fields, locales, profile, timeout=None):
+    """ Parses one raw record into a JSON-compatible dict.
+    """
+    try:
+        if input_format == 'frames':
+            result = {}
+            text = raw.decode('utf-8')
+        else:
+            record = json.loads(raw)
+            if isinstance(record, dict):
+                result = dict(record)
+                text = result.pop('text', None)
+            else:
+                result = {}
+                text = record
+            if not isinstance(text, str):
+                result['error'] = 'Record has no "text" string'
+                return result
+    except ValueError as e:
+        return {'error': str(e)}
+
+    cancel = CancellationToken(timeout) if timeout is not None else None
+    try:
+        message = EmailReplyParser.read(text, locales=locales, profile=profile, cancel=cancel)
+    except ParseCancelled as e:
+        result['error'] = str(e)
+        return result
+    for field in fields:
+        if field == 'fragments':
+            result['fragments'] = [
+                {'content': f.content, 'quoted': f.quoted, 'signature': f.signature,
+                 'headers': f.headers, 'hidden': f.hidden}
+                for f in message.fragments]
+        else:
+            result[field] = getattr(message, field)
+    return result
+
+
+def _ordered(executor, batches, options, window):
+    """ Converts batches in an executor, yielding results in input order with
+        at most window batches in flight.
+    """
+    pending = deque()
+    try:
+        for batch in batches:
+            pending.append(executor.submit(convert_batch, batch, options))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def main(argv=None):
+    """ Command line entry point.
+    """
+    parser = argparse.ArgumentParser(prog='python -m email_reply_parser',
+                                     description='Parse email bodies from stdin and write the results to stdout.')
+    parser.add_argument('--input', choices=FORMATS, default='jsonl', help='input format (default: jsonl)')
+    parser.add_argument('--output', choices=FORMATS, default='jsonl', help='output format (default: jsonl)')
+    parser.add_argument('--fields', default='reply,chain',
+                        help='comma separated result fields among %s (default: reply,chain)' % ', '.join(FIELDS))
+    parser.add_argument('--workers', type=int, default=0, help='number of worker processes (default: 0)')
+    parser.add_argument('--batch-size', type=int, default=256, help='records per batch (default: 256)')
+    parser.add_argument('--flush', choices=FLUSH, default='batch', help='when to flush stdout (default: batch)')
+    parser.add_argument('--locales', default='', help='comma separated locale names')
+    parser.add_argument('--timeout', type=float, default=None,
+                        help='seconds after which the parse of a record is abandoned')
+    parser.add_argument('--disable', default='',
+                        help='comma separated parser stages to disable among %s' % ', '.join(STAGES))
+    args = parser.parse_args(argv)
+
+    try:
+        profile = DEFAULT.without(*_split(args.disable))
+        run(sys.stdin.buffer, sys.stdout.buffer, input_format=args.input, output_format=args.output,
+            fields=_split(args.fields), workers=args.workers, batch_size=max(args.batch_size, 1),
+            flush=args.flush, locales=_split(args.locales) or None, profile=profile, timeout=args.timeout)
+    except ValueError as e:
+        sys.stderr.write('error: %s\n' % e)
+        return 1
+    except BrokenPipeError:
+        # The reading end of the pipeline went away, e.g. "| head". Output
+        # still buffered goes to devnull, so that flushing it at exit does
+        # not fail again.
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        return 0
+    return 0
+
+
+def _split(value):
+    return [item.strip() for item in value.split(',') if item.strip()]
@@ -0,0 +1,176 @@
+import os
+import pickle
+import sys
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from email_reply_parser import EmailMessage, EmailReplyParser
+from email_reply_parser import bench, harness
+from email_reply_parser.arena import TextArena, attach, available, read_text
+from email_reply_parser.batch import Scheduler, _parse_arena_batch, parse_many, run_scheduled
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'emails')
+
+
+class ParseManyTest(unittest.TestCase):
+    def setUp(self):
+        self.texts = [text for _, text in harness.fixture_corpus(FIXTURES)]
+
+    def test_threads_match_serial(self):
+        serial = parse_many(self.texts, parse=EmailReplyParser.parse_reply)
+        threaded = parse_many(self.texts, backend='threads', max_workers=4,
+                              parse=EmailReplyParser.parse_reply)
+        self.assertEqual(serial, threaded)
+
+    def test_results_in_input_order(self):
+        messages = parse_many(self.texts, backend='threads', max_workers=3)
+        for text, message in zip(self.texts, messages):
+            self.assertEqual(EmailReplyParser.read(text).reply, message.reply)
+
+    def test_processes_match_serial(self):
+        texts = self.texts + [self.texts[0] * 200]
+        serial = parse_many(texts, parse=EmailReplyParser.parse_reply)
+        scheduler = Scheduler(2, initial_budget=2000)
+        processed = parse_many(texts, backend='processes', max_workers=2,
+                               parse=EmailReplyParser.parse_reply, scheduler=scheduler)
+        self.assertEqual(serial, processed)
+        self.assertEqual(len(texts), sum(scheduler.batches))
+        self.assertIsNotNone(scheduler.throughput)
+
+    def test_shared_memory_match_serial(self):
+        serial = parse_many(self.texts)
+        shared = parse_many(self.texts, backend='shared_memory', max_workers=2,
+                            scheduler=Scheduler(2, initial_budget=2000))
+        self.assertEqual([harness.snapshot(m) for m in serial], [harness.snapshot(m) for m in shared])
+
+    def test_shared_memory_without_shared_memory(self):
+        serial = parse_many(self.texts)
+        with mock.patch('email_reply_parser.arena._shared_memory', return_value=None):
+            self.assertFalse(available())
+            shared = parse_many(self.texts, backend='shared_memory', max_workers=2,
+                                scheduler=Scheduler(2, initial_budget=2000))
+        self.assertEqual([harness.snapshot(m) for m in serial], [harness.snapshot(m) for m in shared])
+
+    def test_unknown_backend(self):
+        self.assertRaises(ValueError, parse_many, self.texts, backend='gpu')
+
+    def test_thread_scaling_rows(self):
+        rows = bench.thread_scaling(self.texts[:5], thread_counts=(1, 2), repeat=1)
+        self.assertEqual([1, 2], [row[0] for row in rows])
+        self.assertEqual(1.0, rows[0][2])
+
+
+class SchedulerTest(unittest.TestCase):
+    def test_largest_first_and_huge_alone(self):
+        texts = ['x' * 100] * 50 + ['y\n' * 50000] + ['z' * 10] * 50
+        scheduler = Scheduler(2, initial_budget=1000, min_budget=100)
+        scheduler.start(texts)
+        indices, cost = scheduler.next_batch()
+        self.assertEqual([50], indices)
+        self.assertEqual(Scheduler.cost(texts[50]), cost)
+
+        seen = [50]
+        batch = scheduler.next_batch()
+        while batch is not None:
+            self.assertTrue(len(batch[0]) == 1 or batch[1] <= 1000)
+            seen.extend(batch[0])
+            batch = scheduler.next_batch()
+        self.assertEqual(list(range(len(texts))), sorted(seen))
+
+    def test_budget_follows_throughput(self):
+        scheduler = Scheduler(1, target_seconds=0.1, smoothing=1.0)
+        scheduler.start(['x' * 1000] * 10000)
+        self.assertEqual(scheduler.initial_budget, scheduler.budget)
+        scheduler.observe(100000, 0.5)
+        self.assertEqual(20000, scheduler.budget)
+        scheduler.observe(100000, 0.05)
+        self.assertEqual(200000, scheduler.budget)
+
+    def test_budget_shrinks_at_the_end(self):
+        scheduler = Scheduler(4, min_budget=1)
+        scheduler.start(['x' * 99] * 80)
+        self.assertEqual(1000, scheduler.budget)
+
+    def test_results_in_input_order(self):
+        texts = [str(i) * (i % 7 + 1) for i in range(200)]
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            results = run_scheduled(executor, texts, len, Scheduler(3, initial_budget=50))
+        self.assertEqual([len(text) for text in texts], results)
+
+
+class TextArenaTest(unittest.TestCase):
+    def test_round_trip(self):
+        texts = ['Grüße', '', 'x' * 100000, '日本語\r\n']
+        with TextArena(texts) as arena:
+            self.assertEqual(4, len(arena))
+            self.assertEqual(texts, [arena.text(i) for i in range(4)])
+            if arena.name is not None:
+                self.assertEqual(texts[3], read_text(attach(arena.name), 3))
+            self.assertRaises(IndexError, arena.text, 4)
+
+        with TextArena([]) as arena:
+            self.assertRaises(IndexError, arena.text, 0)
+
+    @unittest.skipUnless(available(), 'multiprocessing.shared_memory needs Python 3.8')
+    def test_compact_transport(self):
+        texts = [text for _, text in harness.fixture_corpus(FIXTURES)]
+        with TextArena(texts) as arena:
+            indices = list(range(len(texts)))
+            task = pickle.dumps((EmailReplyParser.read, arena.name, indices))
+            _, results = _parse_arena_batch(EmailReplyParser.read, arena.name, indices)
+        body_bytes = sum(len(text.encode('utf-8')) for text in texts)
+        self.assertTrue(len(task) + len(pickle.dumps(results)) * 5 < body_bytes)
+
+
+class SharedInstanceTest(unittest.TestCase):
+    def test_concurrent_reads_of_one_instance(self):
+        with open(os.path.join(FIXTURES, 'email_1_2.txt')) as f:
+            message = EmailMessage(f.read())
+        expected = [(f.content, f.hidden) for f in EmailMessage(message.text).read().fragments]
+
+        results = []
+
+        def read():
+            results.append([(f.content, f.hidden) for f in message.read().fragments])
+
+        threads = [threading.Thread(target=read) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual([expected] * 8, results)
+
+    def test_repeated_read_is_stable(self):
+        with open(os.path.join(FIXTURES, 'email_2_2.txt')) as f:
+            message = EmailMessage(f.read())
+        first = [f.content for f in message.read().fragments]
+        second = [f.content for f in message.read().fragments]
+        self.assertEqual(first, second)
+
+    def test_repeated_reads_agree(self):
+        # Normalizing twice separates eight more Outlook boundaries
+        body = '\n'.join('reply %d\n________' % i for i in range(12))
+        message = EmailMessage(body)
+        first = [(f.content, f.start, f.end) for f in message.read().fragments]
+        text = message.text
+        self.assertNotEqual(text, EmailMessage._normalize(text)[0])
+        self.assertEqual(first, [(f.content, f.start, f.end) for f in message.read().fragments])
+        self.assertEqual(text, message.text)
+        self.assertEqual(message.reply, message.read_reply())
+
+    def test_reassigned_text_is_read(self):
+        message = EmailMessage('old body')
+        message.text = 'new body\n\nOn Mon, Jan 1, 2024 at 9:00 AM, Bob\n<bob@example.com> wrote:\n> hi'
+        self.assertEqual('new body', message.read().reply)
+        message.text = 'newer body'
+        self.assertEqual('newer body', message.read().reply)
+        message.text = 'reply only'
+        self.assertEqual('reply only', message.read_reply())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from email_reply_parser import EmailMessage
+from email_reply_parser import budgets
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'emails')
+
+# Counts of every fixture when the budgets were last reviewed, in the order
+# of budgets.FIELDS: lines, regex calls, regex characters, instructions and
+# peak bytes. Raise them deliberately when a change needs more work.
+BUDGETS = {
+    'correct_sig': (5, 6, 54, 1412, 2808),
+    'dashes': (23, 45, 1780, 5316, 7203),
+    'dashes2': (15, 24, 3835, 4767, 8793),
+    'digest': (65, 145, 3411, 23491, 14983),
+    'email_1_1': (14, 20, 568, 3687, 4152),
+    'email_1_2': (52, 85, 2553, 10988, 13613),
+    'email_1_3': (56, 75, 2346, 11303, 14812),
+    'email_1_4': (9, 16, 383, 2542, 2954),
+    'email_1_5': (16, 28, 823, 3189, 4012),
+    'email_1_6': (14, 25, 1120, 3541, 4442),
+    'email_1_7': (12, 18, 567, 2996, 3323),
+    'email_1_8': (38, 49, 1159, 7870, 8174),
+    'email_2_1': (26, 49, 1417, 7907, 6416),
+    'email_2_2': (12, 30, 1002, 4284, 4469),
+    'email_2_3': (21, 42, 1713, 4831, 6160),
+    'email_BlackBerry': (4, 5, 67, 1211, 2413),
+    'email_all_lowercase_headers': (14, 37, 1232, 3967, 4395),
+    'email_body': (5, 23, 4822, 2335, 11032),
+    'email_body_unusual': (7, 15, 175, 1856, 2525),
+    'email_bullets': (23, 38, 730, 5169, 4902),
+    'email_case_insensitive_headers': (11, 28, 1207, 3202, 4125),
+    'email_french_outlook': (13, 25, 523, 2908, 3213),
+    'email_german': (13, 19, 444, 2971, 3442),
+    'email_gmail': (14, 22, 694, 3339, 6527),
+    'email_headers_no_delimiter': (16, 34, 863, 5131, 4896),
+    'email_iPhone': (4, 5, 59, 1211, 2401),
+    'email_japanese': (7, 11, 231, 1623, 2784),
+    'email_multi_word_sent_from_my_mobile_device': (4, 5, 101, 1211, 3758),
+    'email_one_is_not_on': (11, 19, 565, 2893, 3490),
+    'email_partial_quote_header': (14, 24, 865, 3456, 5241),
+    'email_sent_from_my_not_signature': (4, 5, 131, 1211, 2509),
+    'email_sig_delimiter_in_middle_of_line': (8, 11, 143, 1716, 2466),
+    'email_whole_is_first': (5, 11, 121, 1472, 2513),
+    'email_with_from_in_body': (11, 29, 1366, 3290, 4173),
+    'email_with_sent_in_body': (11, 26, 783, 3107, 3955),
+    'email_with_subject_in_body': (11, 26, 739, 3107, 3815),
+    'email_with_to_in_body': (11, 26, 801, 3107, 3973),
+    'greedy_on': (17, 31, 1158, 4114, 6073),
+    'multistars': (8, 8, 648, 1624, 3934),
+    'pathological': (21, 36, 5966, 4824, 13043),
+    'separator-border': (21, 23, 1561, 5283, 11125),
+    'unsplit_conversation': (48, 89, 6475, 9956, 14723),
+}
+
+# Allowed growth over the reference counts. Instructions and memory depend
+# on the Python version, lines and regex calls only on the code.
+HEADROOM = {'lines': 1.0, 'regex_calls': 1.1, 'regex_chars': 1.1, 'instructions': 1.5, 'peak_bytes': 2.0}
+SLACK = {'lines': 0, 'regex_calls': 2, 'regex_chars': 64, 'instructions': 500, 'peak_bytes': 4096}
+
+# Largest accepted exponent of count ~ size ** exponent
+LINEAR = 1.1
+
+
+class _QuadraticMessage(EmailMessage):
+    """ Searches the whole text on every line, like a careless look-ahead.
+    """
+
+    def _scan_line(self, state, line):
+        self.QUOTED_REGEX.search(state.text, len(state.text) // 2)
+        return EmailMessage._scan_line(self, state, line)
+
+
+class BudgetsTest(unittest.TestCase):
+    def test_fixture_budgets(self):
+        names = sorted(name[:-4] for name in os.listdir(FIXTURES) if name.endswith('.txt'))
+        self.assertEqual(sorted(BUDGETS), names, 'every fixture needs a budget')
+        for name in names:
+            counts = budgets.measure(self.get_email(name))
+            self.assertTrue(counts.instructions > 0 and counts.peak_bytes > 0, name)
+            for field, reference in zip(budgets.FIELDS, BUDGETS[name]):
+                budget = reference * HEADROOM[field] + SLACK[field]
+                self.assertTrue(getattr(counts, field) <= budget,
+                                '%s: %s %d over budget %d' % (name, field, getattr(counts, field), budget))
+
+    def test_threads_scale_linearly(self):
+        counts = [budgets.measure(budgets.thread(size)) for size in (1, 10, 100)]
+        self.assertTrue(counts[1].chars > 9 * counts[0].chars)
+        self.assertTrue(counts[2].chars > 9 * counts[1].chars)
+        for field in budgets.FIELDS:
+            self.assertTrue(budgets.exponent(counts, field) < LINEAR, (field, counts))
+
+    def test_quadratic_regression_fails(self):
+        counts = [budgets.measure(budgets.thread(size), instructions=False, memory=False,
+                                  message_class=_QuadraticMessage) for size in (1, 10, 100)]
+        self.assertTrue(budgets.exponent(counts, 'regex_chars') > 1.5)
+        self.assertEqual(counts[2].lines, counts[2].regex_calls - budgets.measure(
+            budgets.thread(100), instructions=False, memory=False).regex_calls)
+
+    def test_counts_are_deterministic(self):
+        text = self.get_email('email_1_2')
+        first = budgets.measure(text, locales=['de', 'fr'])
+        second = budgets.measure(text, locales=['de', 'fr'])
+        self.assertTrue(first.instructions > 0)
+        for field in ('lines', 'regex_calls', 'regex_chars', 'instructions'):
+            self.assertEqual(getattr(first, field), getattr(second, field))
+        self.assertIsNone(budgets.measure(text, instructions=False).instructions)
+
+    def get_email(self, name):
+        with open(os.path.join(FIXTURES, '%s.txt' % name), encoding='utf-8') as f:
+            return f.read()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from email_reply_parser import EmailMessage, EmailReplyParser, harness
+from email_reply_parser.bytes_reply import BytesEmailMessage, check_charset, parse_reply_bytes, read_bytes
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'emails')
+
+
+class BytesReplyTest(unittest.TestCase):
+    def test_fixtures_match_text(self):
+        for name, text in harness.fixture_corpus(FIXTURES):
+            data = text.encode('utf-8')
+            self.assertEqual(EmailReplyParser.parse_reply(text), parse_reply_bytes(data), name)
+            expected = EmailReplyParser.read(text)
+            message = read_bytes(data)
+            self.assertEqual([f.content for f in expected.fragments], [f.content for f in message.fragments], name)
+
+    def test_declared_charset(self):
+        texts = [
+            'Merci, à bientôt\n\nOn\xa0Mon, Zoë\nwrote:\n> Vous êtes libre ?',
+            'Oné Mon wrote:\nDéjà vu\n\nOn Tue, Bob wrote:\n> quoted',
+            'Hi\xa0\n\xa0\n> quoted\n\xa0\n> more',
+            'Сейчас\n\nFrom: Петр <p@example.com> Sent: today To: me\n\nстарый текст',
+        ]
+        for charset in ('utf-8', 'cp1252', 'latin-1', 'koi8_r'):
+            for text in texts:
+                try:
+                    data = text.encode(charset)
+                except UnicodeEncodeError:
+                    continue
+                expected = EmailMessage(text)
+                message = BytesEmailMessage(data, charset)
+                self.assertEqual(expected.read_reply(), message.read_reply(), (charset, text))
+                self.assertEqual(expected.reply_spans, message.reply_spans)
+                self.assertEqual(expected.text, message.text)
+
+    def test_decodes_only_lines_read(self):
+        data = b'Thanks\n\nFrom: Bob <bob@example.com>\nSubject: Hi\n\n\xff\xfe old text'
+        self.assertEqual('Thanks', parse_reply_bytes(data))
+        with self.assertRaises(UnicodeDecodeError):
+            read_bytes(data)
+        self.assertEqual('Thanks', parse_reply_bytes(b'Thanks\n\n> quoted\n>\n> \xff\xfe quoted'))
+        data = b'Thanks\n\n> quoted\n\n\xff answer'
+        self.assertEqual(EmailReplyParser.parse_reply(data.decode('utf-8', 'replace')),
+                         parse_reply_bytes(data, errors='replace'))
+
+    def test_buffers_and_line_endings(self):
+        data = 'Hi Zoë\r\n\r\nOn Mon, Bob wrote:\r\n> hi'.encode('utf-8')
+        for body in (data, bytearray(data), memoryview(data)):
+            self.assertEqual('Hi Zoë', parse_reply_bytes(body))
+
+    def test_table_and_full_read(self):
+        data = 'Grüße\n\nOn Mon, Bob wrote:\n> hi'.encode('cp1252')
+        message = BytesEmailMessage(data, 'cp1252')
+        self.assertEqual('Grüße', message.read_reply(message.line_table()))
+        self.assertEqual('Grüße', message.read().reply)
+
+    def test_charsets(self):
+        self.assertEqual('utf-8', check_charset('UTF8'))
+        self.assertEqual('cp1252', check_charset('windows-1252'))
+        for charset in ('utf-16', 'shift_jis', 'iso2022_jp', 'utf-8-sig', 'rot13', 'no-such-charset'):
+            with self.assertRaises(ValueError):
+                BytesEmailMessage(b'Hi', charset)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import os
+import sys
+import threading
+import tracemalloc
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from email_reply_parser import EmailMessage, EmailReplyParser
+from email_reply_parser.cancellation import CancellationToken, ParseCancelled
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'emails')
+
+
+class CancellationTest(unittest.TestCase):
+    def setUp(self):
+        with open(os.path.join(FIXTURES, 'email_1_2.txt')) as f:
+            self.text = f.read()
+        self.big = self.text * 400
+
+    def test_unchanged_results(self):
+        calls = []
+        message = EmailReplyParser.read(self.big, cancel=CancellationToken(), progress=lambda *args: calls.append(args))
+        expected = EmailReplyParser.read(self.big)
+        self.assertEqual([f.content for f in expected.fragments], [f.content for f in message.fragments])
+        self.assertEqual(expected.reply, EmailReplyParser.parse_reply(self.big, cancel=CancellationToken()))
+
+    def test_progress(self):
+        calls = []
+        EmailReplyParser.read(self.big, progress=lambda done, total: calls.append((done, total)))
+        total = len(EmailReplyParser.read(self.big).lines)
+        interval = EmailMessage.CHECK_INTERVAL
+        self.assertEqual(-(-total // interval), len(calls))
+        self.assertEqual([min((i + 1) * interval, total) for i in range(len(calls))], [done for done, _ in calls])
+        self.assertEqual(set([total]), set(t for _, t in calls))
+
+    def test_cancelled_token(self):
+        token = CancellationToken()
+        token.cancel()
+        self.assertTrue(token.cancelled)
+        self.assertRaises(ParseCancelled, EmailReplyParser.read, self.text, cancel=token)
+        self.assertRaises(ParseCancelled, EmailReplyParser.parse_reply, self.text, cancel=token)
+
+    def test_deadline(self):
+        self.assertRaises(ParseCancelled, EmailReplyParser.read, self.text, cancel=CancellationToken(timeout=0))
+        self.assertFalse(CancellationToken(timeout=60).cancelled)
+
+    def test_cancel_from_progress(self):
+        token = CancellationToken()
+        calls = []
+
+        def progress(done, total):
+            calls.append(done)
+            token.cancel()
+
+        self.assertRaises(ParseCancelled, EmailReplyParser.read, self.big, cancel=token, progress=progress)
+        self.assertEqual([EmailMessage.CHECK_INTERVAL], calls)
+
+    def test_cancel_from_thread(self):
+        token = CancellationToken()
+        outcome = []
+        scanning = threading.Event()
+        cancelled = threading.Event()
+
+        def progress(done, total):
+            # Hold the parse until the other thread has cancelled it
+            scanning.set()
+            cancelled.wait(10)
+
+        def parse():
+            try:
+                EmailReplyParser.read(self.big * 2, cancel=token, progress=progress)
+                outcome.append('finished')
+            except ParseCancelled:
+                outcome.append('cancelled')
+
+        thread = threading.Thread(target=parse)
+        thread.start()
+        self.assertTrue(scanning.wait(10))
+        token.cancel()
+        cancelled.set()
+        thread.join(10)
+        self.assertEqual(['cancelled'], outcome)
+
+    def test_memory_tracing_stops(self):
+        self.assertRaises(ParseCancelled, EmailReplyParser.read, self.text, memory=True,
+                          cancel=CancellationToken(timeout=0))
+        self.assertFalse(tracemalloc.is_tracing())
+
+
+if __name__ == '__main__':
+    unittest.main()
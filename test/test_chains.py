@@ -0,0 +1,70 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from email_reply_parser import EmailReplyParser
+from email_reply_parser.chains import ChainStore
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'emails')
+
+
+def quote(text):
+    return '\n'.join('> ' + line if line else '>' for line in text.split('\n'))
+
+
+def thread(length):
+    """ Bodies of a thread in which every reply quotes the previous one """
+    bodies = []
+    for i in range(length):
+        body = 'Reply number %d, long enough to be a real reply.\n\nCheers,\nPerson %d' % (i, i % 2)
+        if bodies:
+            body += '\n\nOn Mon, Jan %d, 2023 at 10:00 AM Person %d <p%d@example.com> wrote:\n%s' % (
+                i, (i - 1) % 2, (i - 1) % 2, quote(bodies[-1]))
+        bodies.append(body)
+    return bodies
+
+
+class ChainStoreTest(unittest.TestCase):
+    def test_thread_is_deduplicated(self):
+        store = ChainStore(max_depth=64)
+        messages = [EmailReplyParser.read(body) for body in thread(20)]
+        ids = [store.add(message) for message in messages]
+
+        stats = store.stats()
+        self.assertEqual(len(store), stats['blocks'])
+        # One block per earlier reply and one per attribution line
+        self.assertEqual(2 * 19, stats['blocks'])
+        self.assertTrue(stats['unique_chars'] * 5 < sum(len(m.chain) for m in messages))
+        self.assertEqual(stats['referenced_chars'], sum(len(store.chain(i)) - len(i) + 1 for i in ids if i))
+
+        last = store.chain(ids[-1])
+        self.assertTrue(last.startswith('On Mon, Jan 19, 2023'))
+        self.assertIn('Reply number 0, long enough', last)
+        self.assertNotIn('\n>', last)
+        self.assertEqual(ids[-2][1:], ids[-1][3:])
+
+    def test_max_depth(self):
+        store = ChainStore(max_depth=2)
+        ids = store.add(EmailReplyParser.read(thread(6)[-1]))
+        self.assertEqual(3, len(ids))
+        self.assertIn('Reply number 0', store.get(ids[-1]))
+
+    def test_outlook_history(self):
+        with open(os.path.join(FIXTURES, 'email_headers_no_delimiter.txt')) as f:
+            message = EmailReplyParser.read(f.read())
+        store = ChainStore()
+        ids = store.add(message)
+        self.assertEqual(ids, store.add(message))
+        self.assertEqual(2, store.refs[ids[0]])
+        self.assertTrue(store.get(ids[0]).startswith('From: Dan Watson'))
+        self.assertTrue(all(block_id in store for block_id in ids))
+
+    def test_no_chain(self):
+        store = ChainStore(blocks={})
+        self.assertEqual((), store.add(EmailReplyParser.read('Just a reply')))
+        self.assertEqual('', store.chain(()))
+
+
+if __name__ == '__main__':
+    unittest.main()
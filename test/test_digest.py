@@ -0,0 +1,58 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from email_reply_parser import EmailReplyParser
+from email_reply_parser.digest import read_digest, split_digest
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'emails')
+
+
+class DigestTest(unittest.TestCase):
+    def test_split(self):
+        text = self.get_email('digest')
+        parts = split_digest(text)
+        self.assertEqual([None, 'Release plan', 'Re: Release plan', 'Build failures on the nightly branch',
+                          'Nightly build failed'], [part.headers.get('Subject') for part in parts])
+        self.assertEqual({}, parts[0].headers)
+        self.assertEqual('2', parts[2].headers['Message'])
+        self.assertEqual('<1@example.org>', parts[1].headers['Message-ID'])
+        self.assertEqual('Monday, June 3, 2024 3:00 AM', parts[4].headers['Sent'])
+        self.assertTrue(parts[1].body.startswith('Hi all,'))
+        for part in parts:
+            self.assertTrue(text[part.start:part.end].endswith(part.body))
+        self.assertTrue(text[parts[3].start:parts[3].end].startswith('Message: 3\nDate: Mon'))
+        self.assertNotIn('Original Message', parts[3].body)
+
+    def test_read(self):
+        parts = read_digest(self.get_email('digest'))
+        self.assertEqual(['The release is planned for next Friday.', 'Friday works for me.',
+                          'The nightly build fails on Windows since yesterday.', 'Build 1234 failed.'],
+                         [part.message.reply.split('\n')[-1] for part in parts[1:]])
+        self.assertIn('> Hi all,', parts[2].message.chain)
+        # Read as one email, everything below the first header block is hidden
+        self.assertNotIn('Friday works for me.', EmailReplyParser.parse_reply(self.get_email('digest')))
+
+    def test_parallel(self):
+        text = self.get_email('digest')
+        expected = [part.message.reply for part in read_digest(text)]
+        for backend in ('threads', 'processes'):
+            parts = read_digest(text, locales=['de'], backend=backend, max_workers=2)
+            self.assertEqual(expected, [part.message.reply for part in parts])
+
+    def test_quoted_headers_and_plain_bodies(self):
+        self.assertEqual(1, len(split_digest('Hi\n\n> From: a@b.c\n> To: d@e.f\n> Subject: x\n\nBye')))
+        self.assertEqual(1, len(split_digest('From: a@b.c\nnot a header block')))
+        self.assertEqual([], split_digest('\n\n'))
+
+        parts = split_digest('FYI\r\n\r\nBegin forwarded message:\r\n\r\nFrom: a@b.c\r\nDate: today\r\n\r\nOld news')
+        self.assertEqual(['FYI\n', 'Old news'], [part.body for part in parts])
+
+    def get_email(self, name):
+        with open(os.path.join(FIXTURES, '%s.txt' % name)) as f:
+            return f.read()
+
+
+if __name__ == '__main__':
+    unittest.main()
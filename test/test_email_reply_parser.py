@@ -6,7 +6,7 @@ import re
 import time
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
-from email_reply_parser import EmailReplyParser
+from email_reply_parser import EmailMessage, EmailReplyParser
 
 
 class EmailMessageTest(unittest.TestCase):
@@ -1206,6 +1206,65 @@ Please note our privacy policy, which you can view here."""
         self.assertNotIn("From: SENDER_NAME SENDER_EMAIL", reply)
         self.assertNotIn("Sent from Outlook for iOS", reply)
 
+    def test_giant_lines_are_opaque(self):
+        """ Test that very long lines are classified by a bounded window and flagged opaque """
+        blob = 'QUJD' * 500000
+        message = EmailReplyParser.read('Logs below:\n\n%s\n\nThanks\n\nOn Mon, Bob wrote:\n> hi' % blob)
+        self.assertEqual('Logs below:\n\n%s\n\nThanks' % blob, message.reply)
+        self.assertEqual([True, False], [f.opaque for f in message.fragments])
+
+        header = 'From: bob@example.com ' + 'x' * 5000
+        message = EmailReplyParser.read('Reply\n\n%s\nSubject: Hi\n\nOld' % header)
+        self.assertEqual('Reply', message.reply)
+        self.assertTrue(message.fragments[1].headers and message.fragments[1].opaque)
+
+        message = self.get_email('email_1_2')
+        self.assertFalse(any(f.opaque for f in message.fragments))
+
+    def test_read_reply_keeps_only_reply_spans(self):
+        """ Test that the reply-only read matches read().reply without keeping fragments """
+        for name in ('email_1_2', 'email_2_1', 'email_headers_no_delimiter', 'correct_sig', 'greedy_on'):
+            expected = self.get_email(name)
+            message = EmailMessage(expected.text)
+            self.assertEqual(expected.reply, message.read_reply())
+            self.assertEqual([], message.fragments)
+            self.assertEqual(expected.reply, '\n'.join(message.text[start:end] for start, end in message.reply_spans))
+
+        message = EmailMessage('\n  Hi there  \n\nOn Mon, Bob wrote:\n> hi')
+        self.assertEqual('Hi there', message.read_reply())
+        self.assertEqual([(3, 11)], message.reply_spans)
+
+    def test_read_reply_stops_at_first_hidden_or_quoted_line(self):
+        """ Test that the reply-only read does not scan below the reply """
+        scanned = []
+
+        class CountingMessage(EmailMessage):
+            def _scan_line(self, state, line, features=None):
+                scanned.append(line)
+                return EmailMessage._scan_line(self, state, line)
+
+        text = 'Thanks\n\nFrom: Bob <bob@example.com>\nSubject: Hi\n\n' + 'Old text\n' * 1000
+        message = CountingMessage(text)
+        self.assertEqual('Thanks', message.read_reply())
+        self.assertEqual(3, len(scanned))
+        self.assertEqual(EmailReplyParser.read(text).text, message.text)
+
+        del scanned[:]
+        text = 'Thanks\n\nOn Mon, Bob wrote:\n' + '> old text\n>\n' * 1000
+        self.assertEqual('Thanks', CountingMessage(text).read_reply())
+        self.assertTrue(len(scanned) < 10, len(scanned))
+
+        # Unquoted text below the quote can still change the reply
+        text = 'Thanks\n\n> old text\n\nInline answer'
+        self.assertEqual(EmailReplyParser.read(text).reply, CountingMessage(text).read_reply())
+
+    def test_read_reply_looks_ahead_below_stop(self):
+        """ Test that a dash line above the stop still sees the lines below it """
+        for text in ('Reply\n\n' + '-' * 30 + '\nFrom: Bob <bob@example.com>\nSent: today\nOld',
+                     'Reply\n' + '-' * 30 + '\n> ' + 'quoted text that is long enough\n> ' * 4,
+                     'Reply\n' + '-' * 30 + '\nMore text that is long enough here\n' * 4):
+            self.assertEqual(EmailReplyParser.read(text).reply, EmailMessage(text).read_reply())
+
     def get_email(self, name):
         """ Return EmailMessage instance
         """
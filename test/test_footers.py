@@ -0,0 +1,93 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from email_reply_parser import EmailReplyParser, tracing
+from email_reply_parser.footers import COMMON, FooterDictionary
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'emails')
+
+
+class FooterDictionaryTest(unittest.TestCase):
+    def test_search(self):
+        footers = FooterDictionary(['he', 'she', 'his', 'hers', '  '])
+        self.assertEqual(4, len(footers))
+        self.assertTrue(footers.search('ushers'))
+        self.assertTrue(footers.search('aHIS'))
+        self.assertFalse(footers.search('hxs h e'))
+        self.assertFalse(FooterDictionary([]).search('anything'))
+
+    def test_matches_naive_search(self):
+        rnd = random.Random(7)
+        phrases = [''.join(rnd.choice('abc ') for _ in range(rnd.randint(1, 5))) for _ in range(200)]
+        footers = FooterDictionary(phrases, case_sensitive=True)
+        normalized = [' '.join(phrase.split()) for phrase in phrases if phrase.strip()]
+        for _ in range(2000):
+            line = ''.join(rnd.choice('abc  ') for _ in range(rnd.randint(0, 25)))
+            expected = any(phrase in ' '.join(line.split()) for phrase in normalized)
+            self.assertEqual(expected, footers.search(line), line)
+
+    def test_whitespace_and_case(self):
+        footers = FooterDictionary(['Get  Outlook for iOS'])
+        self.assertTrue(footers.search('get outlook\tfor   IOS <https://aka.ms/o0ukef>'))
+        self.assertFalse(FooterDictionary(['Outlook'], case_sensitive=True).search('outlook'))
+
+
+class FooterParsingTest(unittest.TestCase):
+    def test_footer_is_signature(self):
+        text = 'Sounds good.\n\nGet Outlook for iOS<https://aka.ms/o0ukef>\n\nOn Mon, Bob wrote:\n> hi'
+        message = EmailReplyParser.read(text, footers=FooterDictionary(COMMON), trace=True)
+        self.assertEqual('Sounds good.', message.reply)
+        self.assertTrue(message.fragments[1].signature)
+        self.assertIn(tracing.FOOTER, message.fragments[1].rules)
+        self.assertEqual('Sounds good.\n\nGet Outlook for iOS<https://aka.ms/o0ukef>', EmailReplyParser.parse_reply(text))
+
+    def test_footer_hides_paragraphs_below(self):
+        text = ('Thanks\n\nJane\n\nCONFIDENTIALITY NOTICE: This e-mail is\nfor the recipient only.\n\n'
+                'Please delete it otherwise.')
+        self.assertEqual('Thanks\n\nJane', EmailReplyParser.parse_reply(text, footers=COMMON))
+        self.assertIn('Please delete it', EmailReplyParser.parse_chain(text, footers=COMMON))
+
+    def test_footer_without_blank_line_above(self):
+        text = 'Hi Bob,\n\nSounds good, see you at noon.\nThanks,\nJane\nGet Outlook for iOS'
+        self.assertEqual('Hi Bob,\n\nSounds good, see you at noon.\nThanks,\nJane',
+                         EmailReplyParser.parse_reply(text, footers=COMMON))
+        message = EmailReplyParser.read(text, footers=COMMON)
+        self.assertEqual(['Get Outlook for iOS'], [f.content for f in message.fragments if f.signature])
+
+        text = 'Sounds good.\nGet Outlook for iOS\n\nOn Mon, Bob wrote:\n> hi'
+        self.assertEqual('Sounds good.', EmailReplyParser.parse_reply(text, footers=COMMON))
+
+    def test_footer_mid_paragraph(self):
+        text = 'Thanks\nCONFIDENTIALITY NOTICE: this is\nfor the recipient only.\n\nOn Mon, Bob wrote:\n> hi'
+        self.assertEqual('Thanks', EmailReplyParser.parse_reply(text, footers=COMMON))
+        self.assertIn('for the recipient only.', EmailReplyParser.parse_chain(text, footers=COMMON))
+
+    def test_footer_at_the_top(self):
+        text = 'Get Outlook for iOS\nOn Mon, Bob wrote:\n> hi'
+        message = EmailReplyParser.read(text, footers=COMMON)
+        self.assertEqual('', message.reply)
+        self.assertTrue(message.fragments[0].signature)
+        self.assertEqual('', EmailReplyParser.parse_reply('Get Outlook for iOS', footers=COMMON))
+
+    def test_quoted_footers_are_left_alone(self):
+        text = 'Reply\n\nOn Mon, Bob wrote:\n> Question\n>\n> Get Outlook for iOS\n>\n> More'
+        message = EmailReplyParser.read(text, footers=FooterDictionary(COMMON))
+        self.assertEqual([f.content for f in EmailReplyParser.read(text).fragments],
+                         [f.content for f in message.fragments])
+
+    def test_fixtures_without_footers_are_unchanged(self):
+        footers = FooterDictionary(COMMON)
+        for name in sorted(os.listdir(FIXTURES)):
+            if name.endswith('.txt'):
+                with open(os.path.join(FIXTURES, name)) as f:
+                    text = f.read()
+                if not any(footers.search(line) for line in text.split('\n')):
+                    self.assertEqual(EmailReplyParser.parse_reply(text),
+                                     EmailReplyParser.parse_reply(text, footers=footers), name)
+
+
+if __name__ == '__main__':
+    unittest.main()
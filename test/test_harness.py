@@ -0,0 +1,69 @@
+import os
+import re
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from email_reply_parser import EmailMessage, EmailReplyParser
+from email_reply_parser import harness, reference
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'emails')
+
+
+class HarnessTest(unittest.TestCase):
+    def test_current_parser_agrees_with_frozen_reference(self):
+        fixtures = list(harness.fixture_corpus(FIXTURES))
+        corpus = fixtures + list(harness.generated_corpus(500, fixtures=fixtures))
+        report = harness.run(harness.current_engine, corpus)
+
+        self.assertTrue(report.ok, report.summary())
+        self.assertEqual(len(corpus), report.cases)
+        self.assertTrue(report.speedup > 0)
+
+    def test_reference_is_frozen(self):
+        self.assertIsInstance(harness.reference_engine('Hi'), reference.EmailMessage)
+
+        # A change in the current heuristics shows up as a mismatch
+        text = 'Hi there\n\nSome long reply text here.\n\n--\nJane Doe\nAcme Corp'
+        with mock.patch.object(EmailMessage, 'SIG_REGEX', re.compile(r'__')):
+            report = harness.run(harness.current_engine, [('sig', text)], shrink_failures=False)
+        self.assertFalse(report.ok)
+
+    def test_detects_and_shrinks_mismatch(self):
+        def candidate(text):
+            message = EmailReplyParser.read(text)
+            for f in message.fragments:
+                f.signature = False
+            return message
+
+        corpus = [('sig', 'Hi there\n\nSome long reply text here.\n\n--\nJane Doe\nAcme Corp')]
+        report = harness.run(candidate, corpus)
+
+        self.assertFalse(report.ok)
+        mismatch = report.mismatches[0]
+        self.assertTrue(len(mismatch.minimal) < len(mismatch.text))
+        self.assertTrue(any('fragment' in d for d in mismatch.differences))
+        self.assertIn('minimal input', report.summary())
+
+    def test_engine_errors_are_mismatches(self):
+        def candidate(text):
+            raise ValueError('boom')
+
+        report = harness.run(candidate, [('a', 'Hello')], shrink_failures=False)
+        self.assertEqual(1, len(report.mismatches))
+        self.assertIn('ValueError', report.mismatches[0].differences[0])
+
+    def test_shrink_keeps_predicate(self):
+        text = 'one\ntwo\nthree needle four\nfive'
+        minimal = harness.shrink(text, lambda t: 'needle' in t)
+        self.assertEqual('needle', minimal)
+
+    def test_generated_corpus_is_reproducible(self):
+        first = list(harness.generated_corpus(20, seed=3))
+        second = list(harness.generated_corpus(20, seed=3))
+        self.assertEqual(first, second)
+
+
+if __name__ == '__main__':
+    unittest.main()
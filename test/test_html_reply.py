@@ -0,0 +1,76 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from email_reply_parser.html_reply import html_to_text, parse_reply_html, read_html
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'emails')
+
+
+class HtmlReplyTest(unittest.TestCase):
+    def test_gmail(self):
+        message = read_html(self.get_html('email_gmail'))
+        self.assertTrue(message.boundary)
+        self.assertEqual('Sounds good,\n\nsee you & Bob tomorrow at noon.', message.reply)
+        self.assertEqual('--\nJane Doe', message.fragments[-1].content)
+        self.assertTrue(message.fragments[-1].signature)
+        self.assertNotIn('Lunch', message.text)
+
+    def test_outlook(self):
+        reply = parse_reply_html(self.get_html('email_outlook'))
+        self.assertEqual('Hi Bob,\n\nThe numbers are attached:\nQ1 120\nQ2 140\n\nThanks,\nJane', reply)
+
+    def test_apple_mail(self):
+        message = read_html(self.get_html('email_apple'))
+        self.assertEqual('Works for me.', message.reply)
+        self.assertTrue(message.fragments[-1].hidden)
+
+    def test_chain(self):
+        message = read_html(self.get_html('email_outlook'), chain=True)
+        self.assertEqual(parse_reply_html(self.get_html('email_outlook')), message.reply)
+        last = message.fragments[-1]
+        self.assertTrue(last.quoted and last.hidden)
+        self.assertTrue(last.content.startswith('From: Bob'))
+        self.assertTrue(last.content.endswith('Can you send me the numbers?'))
+        self.assertEqual(last.content, message.text[last.start:last.end])
+        self.assertIn('Can you send me the numbers?', message.chain)
+
+        text = message.text
+        summary = [(f.content, f.start, f.end) for f in message.fragments]
+        self.assertEqual(summary, [(f.content, f.start, f.end) for f in message.read().fragments])
+        self.assertEqual(text, message.text)
+        self.assertEqual(summary, [(f.content, f.start, f.end) for f in message.read(message.line_table()).fragments])
+
+    def test_stops_at_boundary(self):
+        consumed = []
+
+        def chunks():
+            for chunk in ['<div>Yes, ', 'please.</div><block', 'quote>old</blockquote>', '<div>never read</div>']:
+                consumed.append(chunk)
+                yield chunk
+
+        reply, chain, boundary = html_to_text(chunks())
+        self.assertEqual('Yes, please.', reply)
+        self.assertEqual('', chain)
+        self.assertTrue(boundary)
+        self.assertEqual(3, len(consumed))
+
+    def test_without_boundary(self):
+        html = '<p>Great,<br>thanks!</p><p>On Mon, Bob wrote:</p><p>&gt; old</p><script>var a = 1;</script>'
+        message = read_html(html)
+        self.assertFalse(message.boundary)
+        self.assertEqual('Great,\nthanks!', message.reply)
+        self.assertNotIn('var a', message.text)
+
+    def test_preformatted(self):
+        reply, _, _ = html_to_text('<pre>a  b\n  c</pre><p>d   e</p>')
+        self.assertEqual('a  b\n  c\nd e', reply)
+
+    def get_html(self, name):
+        with open(os.path.join(FIXTURES, '%s.html' % name)) as f:
+            return f.read()
+
+
+if __name__ == '__main__':
+    unittest.main()
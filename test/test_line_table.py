@@ -0,0 +1,73 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from email_reply_parser import EmailMessage, EmailReplyParser, LineTable
+from email_reply_parser.cancellation import CancellationToken
+from email_reply_parser.footers import COMMON, FooterDictionary
+from email_reply_parser.profiles import Profile
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'emails')
+
+
+def fixtures():
+    for name in sorted(os.listdir(FIXTURES)):
+        if name.endswith('.txt'):
+            with open(os.path.join(FIXTURES, name)) as f:
+                yield name, f.read()
+
+
+def summary(message):
+    return [(f.content, f.quoted, f.signature, f.headers, f.hidden, f.start, f.end) for f in message.fragments]
+
+
+class LineTableTest(unittest.TestCase):
+    def test_reads_match_direct_reads(self):
+        footers = FooterDictionary(COMMON)
+        lean = Profile(dash_lookahead=False)
+        for name, text in fixtures():
+            table = EmailMessage(text).line_table()
+            self.assertEqual(len(table.lines), len(table.features), name)
+            self.assertEqual(summary(EmailReplyParser.read(text)), summary(table.read()), name)
+            self.assertEqual(summary(EmailReplyParser.read(text, profile=lean)), summary(table.read(profile=lean)),
+                             name)
+            self.assertEqual(summary(EmailReplyParser.read(text, footers=footers)),
+                             summary(table.read(footers=footers)), name)
+            self.assertEqual(EmailReplyParser.parse_reply(text), table.read(reply_only=True), name)
+
+    def test_locales(self):
+        text = 'Merci\n\nLe 1 janv. 2024 à 10:00, Bob <bob@example.com> a écrit :\n> Salut'
+        table = EmailMessage(text, locales=['fr']).line_table()
+        self.assertEqual('Merci', table.read(reply_only=True))
+        self.assertEqual('Merci', EmailMessage(text, locales=['fr']).read_reply(table))
+        with self.assertRaises(ValueError):
+            EmailMessage(text).read(table)
+
+    def test_incompatible_table(self):
+        text = 'Hi\n\nFrom: Bob\nSent: today\n\nold'
+        table = EmailMessage(text).line_table()
+        with self.assertRaises(ValueError):
+            table.read(profile=Profile(inline_headers=False))
+        with self.assertRaises(ValueError):
+            EmailMessage('Other text').read(table)
+
+    def test_lines_are_classified_once(self):
+        with open(os.path.join(FIXTURES, 'email_1_2.txt')) as f:
+            text = f.read()
+        expected = summary(EmailReplyParser.read(text))
+        table = EmailMessage(text).line_table()
+        with mock.patch.object(EmailMessage, '_classify', side_effect=AssertionError('classified again')):
+            self.assertEqual(expected, summary(table.read()))
+            self.assertEqual(expected, summary(table.read(profile=Profile(dash_lookahead=False))))
+            message = EmailMessage(text, cancel=CancellationToken())
+            self.assertEqual(expected, summary(message.read(table)))
+
+    def test_pack(self):
+        for bits in range(8):
+            self.assertEqual(bits, LineTable.pack(*LineTable.FEATURES[bits]))
+
+
+if __name__ == '__main__':
+    unittest.main()
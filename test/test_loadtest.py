@@ -0,0 +1,110 @@
+import mailbox
+import os
+import queue
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from email_reply_parser import EmailReplyParser, harness, loadtest
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'emails')
+
+
+class LoadTestTest(unittest.TestCase):
+    def setUp(self):
+        self.texts = [text for _, text in harness.fixture_corpus(FIXTURES)][:20]
+        self.expected = sorted(EmailReplyParser.parse_reply(loadtest.message_body(loadtest.to_message(text)))
+                               for text in self.texts)
+
+    def check(self, report, replies):
+        self.assertEqual(len(self.texts), report.messages)
+        self.assertEqual(self.expected, sorted(replies))
+        self.assertGreater(report.throughput, 0)
+        self.assertGreater(report.cpu_per_message, 0)
+        self.assertEqual(len(self.texts), len(report.queue_latency))
+        for queued, total in zip(report.queue_latency, report.total_latency):
+            self.assertLessEqual(queued, total)
+        row = report.as_dict()
+        self.assertLessEqual(row['total_p50'], row['total_p99'])
+
+    def test_sources(self):
+        for source in loadtest.SOURCES:
+            replies = []
+            report = loadtest.run(self.texts, source=source, workers=2, replies=replies)
+            self.assertEqual((source, 'threads', 2), (report.source, report.backend, report.workers))
+            self.check(report, replies)
+
+    def test_processes(self):
+        replies = []
+        self.check(loadtest.run(self.texts, source='smtp', backend='processes', workers=2, replies=replies),
+                   replies)
+
+    def test_rate(self):
+        started = time.perf_counter()
+        report = loadtest.run(self.texts[:10], rate=100)
+        self.assertGreaterEqual(time.perf_counter() - started, 0.09)
+        self.assertLess(report.throughput, 150)
+
+    def test_spool_ignores_files_from_earlier_runs(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        spool = loadtest.Spool(directory)
+        spool.deliver(loadtest.to_message('Left over'))
+        leftovers = sorted(os.listdir(spool.new))
+        replies = []
+        report = loadtest.run(self.texts[:2], spool_dir=directory, replies=replies)
+        self.assertEqual(2, report.messages)
+        self.assertNotIn('Left over', replies)
+        self.assertEqual(leftovers, os.listdir(spool.new))
+
+    def test_spool_picks_up_dropped_files(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        spool = loadtest.Spool(directory)
+        inbox = queue.Queue()
+        receiver = loadtest.SpoolReceiver(spool, inbox)
+        receiver.start()
+        self.addCleanup(receiver.stop)
+        before = time.time() - 1
+        for name in ('dropped.eml', '12-34-56.eml'):
+            with open(os.path.join(spool.new, name), 'wb') as f:
+                f.write(loadtest.to_message('Dropped by hand'))
+        spool.deliver(loadtest.to_message('Delivered'))
+        received = [inbox.get(timeout=10) for _ in range(3)]
+        self.assertEqual((3, 1), (receiver.received, receiver.delivered))
+        self.assertTrue(all(when > before for when, _ in received), received)
+        self.assertEqual([], os.listdir(spool.new))
+    def test_mbox_corpus(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'archive.mbox')
+        box = mailbox.mbox(path)
+        for text in self.texts[:3]:
+            box.add(loadtest.to_message(text))
+        box.close()
+        self.assertEqual([text.rstrip('\n') for text in self.texts[:3]],
+                         [text.rstrip('\n') for text in loadtest.mbox_corpus(path)])
+
+    def test_sweep_and_format(self):
+        reports = loadtest.sweep(self.texts[:5], (1, 3))
+        self.assertEqual([1, 3], [report.workers for report in reports])
+        self.assertEqual(3, len(loadtest.format_reports(reports).split('\n')))
+
+    def test_invalid_settings(self):
+        for options in ({'source': 'imap'}, {'backend': 'fibers'}, {'workers': 0}):
+            with self.assertRaises(ValueError):
+                loadtest.run(self.texts, **options)
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(50, loadtest.percentile(values, 50))
+        self.assertEqual(99, loadtest.percentile(values, 99))
+        self.assertEqual(1, loadtest.percentile(values, 0))
+        self.assertEqual(0.0, loadtest.percentile([], 90))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from email_reply_parser import EmailReplyParser
+from email_reply_parser import locales
+from email_reply_parser.locales import HEADER, QUOTE_HEADER, Locale, LocaleMatcher
+
+
+class LocaleParsingTest(unittest.TestCase):
+    def test_german_quote_header(self):
+        text = self.get_text('email_german')
+        self.assertIn('schrieb', EmailReplyParser.parse_reply(text))
+
+        reply = EmailReplyParser.parse_reply(text, locales=['de'])
+        self.assertEqual('Hallo Max,\n\ndas passt mir gut, bis morgen.\n\nViele Grüße\nAnna', reply)
+        self.assertIn('Am Mo., 2. Jan. 2023', EmailReplyParser.parse_chain(text, locales=['de']))
+
+    def test_french_outlook_headers(self):
+        text = self.get_text('email_french_outlook')
+        self.assertIn('Es-tu disponible', EmailReplyParser.parse_reply(text))
+
+        message = EmailReplyParser.read(text, locales=['fr'])
+        self.assertEqual("Bonjour,\n\nOui, c'est bon pour moi.", message.reply)
+        self.assertTrue(any(f.headers for f in message.fragments))
+
+    def test_japanese_quote_header(self):
+        text = self.get_text('email_japanese')
+        reply = EmailReplyParser.parse_reply(text, locales=['ja'])
+        self.assertEqual('了解しました。よろしくお願いします。', reply)
+
+    def test_all_locales_together(self):
+        everything = sorted(locales.LOCALES)
+        for name, expected in [('email_german', 'Anna'), ('email_french_outlook', 'pour moi.')]:
+            reply = EmailReplyParser.parse_reply(self.get_text(name), locales=everything)
+            self.assertTrue(reply.endswith(expected), reply)
+
+    def test_english_unchanged_with_locales(self):
+        text = self.get_text('email_1_2')
+        self.assertEqual(
+            EmailReplyParser.parse_reply(text),
+            EmailReplyParser.parse_reply(text, locales=sorted(locales.LOCALES)))
+
+    def get_text(self, name):
+        with open(os.path.join(os.path.dirname(__file__), 'emails', '%s.txt' % name)) as f:
+            return f.read()
+
+
+class LocaleMatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.matcher = locales.matcher(sorted(locales.LOCALES))
+
+    def test_quote_headers(self):
+        for line in [
+            'Am 02.01.2023 um 10:00 schrieb Max <max@example.com>:',
+            'Le lun. 2 janv. 2023 à 10:00, Jean <jean@example.fr> a écrit :',
+            'El lun, 2 ene 2023 a las 10:00, Juan (<juan@example.es>) escribió:',
+            'Em seg., 2 de jan. de 2023 às 10:00, João <joao@example.pt> escreveu:  ',
+            'Op ma 2 jan. 2023 om 10:00 schreef Jan <jan@example.nl>:',
+            'Il giorno lun 2 gen 2023 alle ore 10:00 Mario <mario@example.it> ha scritto:',
+            'W dniu 2.01.2023 o 10:00 Jan <jan@example.pl> napisał:',
+        ]:
+            self.assertEqual(QUOTE_HEADER, self.matcher.match(line), line)
+
+    def test_headers(self):
+        for line in [
+            'Von: Max <max@example.com>',
+            '*Gesendet:* Montag, 2. Januar 2023',
+            'Datum: 2. Januar 2023 10:00',
+            'Data: 2 de janeiro de 2023',
+            'De : Jean <jean@example.fr>',
+            'Asunto: Hola',
+            '件名: 会議',
+        ]:
+            self.assertEqual(HEADER, self.matcher.match(line), line)
+
+    def test_body_text(self):
+        for line in [
+            'Am Montag habe ich Zeit.',
+            'Von hier aus sehe ich nichts',
+            'Von: niemandem',
+            'Gesendet: gestern',
+            'Data: 3 Tabellen fehlen noch',
+            'Datum: 3 Punkte',
+            'Le chat est sur la table :',
+            '',
+        ]:
+            self.assertEqual(0, self.matcher.match(line), line)
+
+    def test_sent_field_needs_a_year(self):
+        text = 'Hallo,\n\nbitte die Zahlen pruefen.\nData: 3 Tabellen fehlen noch\nDanke'
+        for names in (['pt'], ['it'], ['pl'], ['de'], ['nl'], ['sv']):
+            self.assertEqual(text, EmailReplyParser.parse_reply(text, locales=names), names)
+            body = text.replace('Data:', 'Datum:')
+            self.assertEqual(body, EmailReplyParser.parse_reply(body, locales=names), names)
+
+    def test_digit_runs_are_scanned_once(self):
+        # A search for a digit followed by a year from every digit took
+        # seconds on this line, the anchored match takes a millisecond
+        text = 'Hallo\n' + 'Datum: ' + '1 ' * 10000
+        started = time.perf_counter()
+        self.assertEqual(text.rstrip(), EmailReplyParser.parse_reply(text, locales=['de']))
+        self.assertLess(time.perf_counter() - started, 0.5)
+
+    def test_matchers_are_cached(self):
+        self.assertIs(locales.matcher(['de', 'fr']), locales.matcher(['de', 'fr']))
+        self.assertIs(self.matcher, locales.matcher(self.matcher))
+
+    def test_custom_locale(self):
+        klingon = Locale('tlh', quote_headers=[('ghItlh ', '', "ja'pu':")], headers={'vo\'': 'From'})
+        matcher = LocaleMatcher([klingon])
+        self.assertEqual(QUOTE_HEADER, matcher.match("ghItlh wa'leS Qapla' ja'pu':"))
+        self.assertEqual(HEADER, matcher.match("vo': worf@example.com"))
+        self.assertRaises(ValueError, Locale, 'xx', headers={'Foo': 'Cc'})
+
+    def test_unknown_locale(self):
+        self.assertRaises(ValueError, EmailReplyParser.read, 'Hi', locales=['xx'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from email_reply_parser import EmailReplyParser
+from email_reply_parser import harness
+from email_reply_parser.memo import MemoizedParser, TailCache
+from email_reply_parser.profiles import Profile
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'emails')
+
+
+def details(message):
+    return (harness.snapshot(message), message.text, message.found_visible,
+            [(f.start, f.end, f.opaque) for f in message.fragments])
+
+
+class MemoizedParserTest(unittest.TestCase):
+    def setUp(self):
+        self.fixtures = list(harness.fixture_corpus(FIXTURES))
+
+    def test_same_results(self):
+        generated = [text for _, text in harness.generated_corpus(300, seed=5, fixtures=self.fixtures)]
+        generated += [text for _, text in self.fixtures]
+        rnd = random.Random(5)
+        parser = MemoizedParser(min_tail_lines=1)
+        for text in generated:
+            other = rnd.choice(generated)
+            for body in (text, other[:rnd.randrange(len(other) + 1)] + '\n' + text, 'Thanks!\n\n' + text):
+                self.assertEqual(details(EmailReplyParser.read(body)), details(parser.read(body)), body)
+        self.assertTrue(parser.cache.hits > 100)
+
+    def test_shared_tail(self):
+        tail = '\n'.join('> ' + line for line in dict(self.fixtures)['email_1_2'].split('\n'))
+        parser = MemoizedParser()
+        replies = [parser.parse_reply('Update %d\n\nOn Mon, Bot wrote:\n%s' % (i, tail)) for i in range(5)]
+        self.assertEqual(['Update %d' % i for i in range(5)], replies)
+        self.assertEqual((4, 1), (parser.cache.hits, parser.cache.misses))
+
+    def test_dash_lookahead_not_cached(self):
+        with open(os.path.join(FIXTURES, 'dashes2.txt')) as f:
+            text = f.read()
+        parser = MemoizedParser(min_tail_lines=1)
+        for prefix in ('', 'Hello\n\n', 'Hello\n\n'):
+            body = prefix + '> quoted\n\n' + text
+            self.assertEqual(details(EmailReplyParser.read(body)), details(parser.read(body)))
+        self.assertEqual(0, parser.cache.hits)
+        self.assertEqual(3, parser.cache.uncacheable)
+
+    def test_profile_and_locales(self):
+        with open(os.path.join(FIXTURES, 'email_german.txt')) as f:
+            text = f.read()
+        parser = MemoizedParser(locales=['de'], profile=Profile(dash_lookahead=False), min_tail_lines=1)
+        for _ in range(2):
+            self.assertEqual(EmailReplyParser.parse_reply(text, locales=['de']), parser.parse_reply(text))
+        self.assertIn('Am Mo.', parser.parse_chain(text))
+
+    def test_eviction(self):
+        cache = TailCache(maxsize=2)
+        for key in 'abc':
+            cache.put(key, key)
+        self.assertEqual(2, len(cache))
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual('c', cache.get('c'))
+        cache.clear()
+        self.assertEqual(0, len(cache))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import functools
+import os
+import sys
+import tracemalloc
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from email_reply_parser import EmailReplyParser
+from email_reply_parser.batch import parse_many
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'emails')
+
+
+class MemoryTest(unittest.TestCase):
+    def test_report(self):
+        body = self.get_email('email_1_2') * 20
+        message = EmailReplyParser.read(body, memory=True)
+        report = message.memory
+        self.assertTrue(report.peak_bytes > report.lines_bytes > 0)
+        self.assertTrue(report.text_bytes >= sys.getsizeof(message.text))
+        self.assertTrue(report.fragments_bytes > 0)
+        self.assertEqual(report.text_bytes + report.fragments_bytes, report.retained_bytes)
+        self.assertTrue(2 <= report.copies < 4, report.copies)
+        self.assertEqual(set(['peak_bytes', 'retained_bytes', 'text_bytes', 'fragments_bytes', 'lines_bytes',
+                              'copies']), set(report.as_dict()))
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_not_measured_by_default(self):
+        message = EmailReplyParser.read(self.get_email('email_1_1'))
+        self.assertIsNone(message.memory)
+        self.assertEqual(message.reply, EmailReplyParser.read(self.get_email('email_1_1'), memory=True).reply)
+
+    def test_outer_tracing_is_kept(self):
+        tracemalloc.start()
+        try:
+            block = bytearray(1 << 20)
+            del block
+            peak = tracemalloc.get_traced_memory()[1]
+            self.assertGreater(peak, 1 << 20)
+            message = EmailReplyParser.read(self.get_email('email_1_1'), memory=True)
+            self.assertTrue(tracemalloc.is_tracing())
+            self.assertGreaterEqual(tracemalloc.get_traced_memory()[1], peak)
+            self.assertGreater(message.memory.peak_bytes, 0)
+
+            body = self.get_email('email_1_2') * 200
+            expected = EmailReplyParser.read(body, memory=True).memory.peak_bytes
+            self.assertGreater(expected, 1 << 20)
+        finally:
+            tracemalloc.stop()
+        self.assertAlmostEqual(1.0, expected / EmailReplyParser.read(body, memory=True).memory.peak_bytes, delta=0.2)
+
+    def test_lines_are_released(self):
+        message = EmailReplyParser.read(self.get_email('email_1_2'))
+        self.assertNotIn('lines', vars(message))
+        self.assertEqual(message.text.split('\n')[::-1], message.lines)
+        self.assertTrue(all(f.lines is None for f in message.fragments))
+
+    def test_unchanged_body_is_not_copied(self):
+        body = 'Hi,\n\nthanks!\n\n> quoted\n'
+        message = EmailReplyParser.read(body, memory=True)
+        self.assertIs(body, message.text)
+        self.assertEqual(sys.getsizeof(message.text), message.memory.text_bytes)
+
+    def test_normalized_body_is_kept(self):
+        body = 'Hi\n\nOn Mon, Jan 1, 2024 at 9:00 AM, Bob\n<bob@example.com> wrote:\n> hi'
+        message = EmailReplyParser.read(body, memory=True)
+        self.assertNotEqual(body, message.text)
+        self.assertIs(body, message._source)
+        self.assertEqual(sys.getsizeof(message.text) + sys.getsizeof(body), message.memory.text_bytes)
+
+    def test_threads(self):
+        body = self.get_email('email_1_2') * 50
+        single = EmailReplyParser.read(body, memory=True).memory.peak_bytes
+        parse = functools.partial(EmailReplyParser.read, memory=True)
+        messages = parse_many([body] * 8, backend='threads', max_workers=8, parse=parse)
+        for message in messages:
+            self.assertGreater(message.memory.peak_bytes, single / 2)
+            self.assertLess(message.memory.peak_bytes, single * 2)
+
+    def get_email(self, name):
+        with open(os.path.join(FIXTURES, '%s.txt' % name)) as f:
+            return f.read()
+
+
+if __name__ == '__main__':
+    unittest.main()
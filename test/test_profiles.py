@@ -0,0 +1,80 @@
+import os
+import pickle
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from email_reply_parser import EmailReplyParser
+from email_reply_parser import harness, serialization
+from email_reply_parser.profiles import DEFAULT, STAGES, Profile
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'emails')
+
+# Cheap pre-check that must fail for a stage to be skippable
+PRECHECKS = {
+    'multi_quote_header': lambda text: 'wrote:' not in text,
+    'outlook_separator': lambda text: '-------' not in text and '_______' not in text,
+    'inline_headers': lambda text: 'From:' not in text,
+    'concatenated_headers': lambda text: 'Subject:' not in text,
+    'dash_lookahead': lambda text: '--------' not in text,
+}
+
+
+class ProfileTest(unittest.TestCase):
+    def setUp(self):
+        self.fixtures = dict(harness.fixture_corpus(FIXTURES))
+
+    def test_disabled_stages(self):
+        for stage, names in [
+            ('multi_quote_header', ['email_1_6', 'email_1_7', 'email_gmail']),
+            ('outlook_separator', ['email_2_2', 'separator-border']),
+            ('inline_headers', ['email_body']),
+            ('concatenated_headers', ['dashes2', 'unsplit_conversation']),
+            ('dash_lookahead', ['dashes2', 'separator-border']),
+        ]:
+            profile = DEFAULT.without(stage)
+            changed = sorted(name for name, text in self.fixtures.items()
+                             if self.snapshot(text) != self.snapshot(text, profile))
+            self.assertEqual(names, changed, stage)
+
+    def test_dash_lookahead_disabled(self):
+        text = self.fixtures['separator-border']
+        reply = EmailReplyParser.parse_reply(text, profile=Profile(dash_lookahead=False))
+        self.assertIn('Thanks, NAME', reply)
+        self.assertNotIn('#WorkplaceCulture', reply)
+
+    def test_unchanged_when_precheck_fails(self):
+        corpus = list(self.fixtures.items())
+        corpus += list(harness.generated_corpus(400, seed=11, fixtures=corpus))
+        for stage in STAGES:
+            texts = [(name, text) for name, text in corpus if PRECHECKS[stage](text)]
+            self.assertTrue(texts, stage)
+            profile = DEFAULT.without(stage)
+            report = harness.run(lambda text: EmailReplyParser.read(text, profile=profile), texts,
+                                 reference=EmailReplyParser.read, shrink_failures=False)
+            self.assertTrue(report.ok, report.summary())
+
+    def test_serialization(self):
+        profile = Profile(multi_quote_header=False)
+        text = self.fixtures['email_1_6']
+        message = EmailReplyParser.read(text, profile=profile)
+        view = serialization.loads(serialization.dumps(message), text=text, profile=profile)
+        self.assertEqual(message.reply, view.reply)
+        self.assertRaises(ValueError, serialization.loads, serialization.dumps(message), text=text)
+
+    def test_profile(self):
+        self.assertEqual((), DEFAULT.disabled)
+        profile = DEFAULT.without('dash_lookahead', 'inline_headers')
+        self.assertEqual(('inline_headers', 'dash_lookahead'), profile.disabled)
+        self.assertEqual(profile, pickle.loads(pickle.dumps(profile)))
+        self.assertEqual(profile, Profile(inline_headers=False, dash_lookahead=False))
+        self.assertNotEqual(profile, DEFAULT)
+        self.assertRaises(AttributeError, setattr, profile, 'dash_lookahead', True)
+        self.assertRaises(ValueError, DEFAULT.without, 'signatures')
+
+    def snapshot(self, text, profile=None):
+        return harness.snapshot(EmailReplyParser.read(text, profile=profile))
+
+
+if __name__ == '__main__':
+    unittest.main()
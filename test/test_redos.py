@@ -0,0 +1,90 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from email_reply_parser import EmailMessage
+from email_reply_parser import budgets
+from email_reply_parser import harness
+from email_reply_parser import redos
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'emails')
+
+# Timed checks run only when this environment variable is set
+SLOW = os.environ.get('EMAIL_REPLY_PARSER_SLOW_TESTS')
+
+# Largest accepted exponent of count ~ size ** exponent
+LINEAR = 1.1
+
+
+class RegexComplexityTest(unittest.TestCase):
+    def test_every_regex_is_guarded(self):
+        self.assertEqual([], redos.unguarded())
+        self.assertIn('locales._DATE_REGEX', redos.module_regexes())
+
+    @unittest.skipUnless(SLOW, 'timed, set EMAIL_REPLY_PARSER_SLOW_TESTS=1 to run')
+    def test_stages_scale_linearly(self):
+        report = redos.check()
+        self.assertTrue(report.ok, report.summary())
+
+    def test_read_work_scales_linearly(self):
+        # Characters handed to the regexes are not compared: a search
+        # started at a position is counted up to the end of the line even
+        # when it stops at the next match, which the timed check covers.
+        for generator, make in redos.read_generators():
+            counts = [budgets.measure(make(size), memory=False) for size in (16, 64, 256)]
+            for field in ('lines', 'regex_calls', 'instructions'):
+                self.assertLess(budgets.exponent(counts, field), LINEAR, (generator, field, counts))
+
+    def test_detects_backtracking_regex(self):
+        stage = lambda text: EmailMessage.INLINE_HEADERS_REGEX.sub(r'\n\1', text)
+        sizes, times, exponent = redos.growth(stage, lambda n: 'From:a@ ' * n, repeat=1)
+        self.assertTrue(exponent > redos.THRESHOLD, (sizes, times, exponent))
+
+    def test_literals(self):
+        self.assertEqual(['On', 'x', 'wrote:'], redos.literals(EmailMessage.QUOTE_HDR_REGEX))
+
+
+class LinearHelpersTest(unittest.TestCase):
+    """ The linear helpers must agree with the regexes they replace.
+    """
+
+    def corpus(self):
+        fixtures = list(harness.fixture_corpus(FIXTURES))
+        for _, text in fixtures + list(harness.generated_corpus(300, fixtures=fixtures)):
+            yield text.replace('\r\n', '\n')
+        yield 'wrote:On \nOn x wrote:'
+        yield 'From: a@b Sent: x To: y From: c@d Subject: z To: w'
+        yield 'From: a@b Sent: x To: y\nOn a\nb wrote:\n' + 'x\n-------\n' * 10
+
+    def test_multi_quote_header(self):
+        for text in self.corpus():
+            match = EmailMessage.MULTI_QUOTE_HDR_REGEX_MULTILINE.search(text)
+            expected = match.span(1) if match else None
+            self.assertEqual(expected, EmailMessage._find_multi_quote_header(text), text)
+
+    def test_normalize(self):
+        for text in self.corpus():
+            match = EmailMessage.MULTI_QUOTE_HDR_REGEX_MULTILINE.search(text)
+            expected = text
+            if match:
+                expected = EmailMessage.MULTI_QUOTE_HDR_REGEX.sub(match.groups()[0].replace('\n', ''), expected)
+            expected = EmailMessage.OUTLOOK_SEPARATOR_REGEX.sub('\\1\n', expected, 8)
+            expected = EmailMessage.INLINE_HEADERS_REGEX.sub(r'\n\1', expected)
+
+            normalized, lines, offsets = EmailMessage._normalize(text)
+            self.assertEqual(expected, normalized)
+            self.assertEqual(expected.split('\n'), lines)
+            for line, offset in zip(lines, offsets):
+                self.assertEqual(line, normalized[offset:offset + len(line)])
+
+    def test_concatenated_headers(self):
+        for text in self.corpus():
+            for line in text.split('\n'):
+                self.assertEqual(
+                    EmailMessage.CONCATENATED_HEADERS_REGEX.search(line) is not None,
+                    EmailMessage._has_concatenated_headers(line), line)
+
+
+if __name__ == '__main__':
+    unittest.main()
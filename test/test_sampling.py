@@ -0,0 +1,111 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from email_reply_parser import EmailMessage, EmailReplyParser, harness
+from email_reply_parser.sampling import STAGES, Sampler
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'emails')
+
+
+class SamplerTest(unittest.TestCase):
+    def setUp(self):
+        self.texts = [text for _, text in harness.fixture_corpus(FIXTURES)]
+
+    def test_one_in_n(self):
+        sampler = Sampler(every=10, size=3)
+        for text in self.texts[:25]:
+            self.assertEqual(EmailReplyParser.read(text).reply, EmailReplyParser.read(text, sampler=sampler).reply)
+        self.assertEqual(25, sampler.seen)
+        self.assertEqual(3, sampler.sampled)
+        self.assertEqual(3, len(sampler.slowest()))
+        for stage, total, mean in sampler.rows():
+            self.assertIn(stage, STAGES)
+            self.assertGreaterEqual(total, 0.0)
+        self.assertGreater(sum(sampler.seconds.values()), 0.0)
+
+    def test_parse_reply(self):
+        sampler = Sampler(every=1)
+        for text in self.texts:
+            self.assertEqual(EmailReplyParser.parse_reply(text), EmailReplyParser.parse_reply(text, sampler=sampler))
+        self.assertEqual(len(self.texts), sampler.sampled)
+
+    def test_keeps_slowest(self):
+        sampler = Sampler(every=1, size=2)
+        for seconds in (0.3, 0.1, 0.5, 0.2, 0.4):
+            sampler.record('body %s' % seconds, seconds, 0.0, 0.0)
+        slowest = sampler.slowest()
+        self.assertEqual([0.5, 0.4], [sample.seconds for sample in slowest])
+        self.assertIsNone(slowest[0].text)
+        self.assertEqual(len('body 0.5'), slowest[0].chars)
+        self.assertAlmostEqual(1.5, sampler.seconds['normalize'])
+        self.assertIn('5 of 0 reads sampled', sampler.format_report())
+
+    def test_repeated_input_kept_once(self):
+        sampler = Sampler(every=1, size=3)
+        for seconds in (0.1, 0.3, 0.2):
+            sampler.record('same body', seconds, 0.0, 0.0)
+        sampler.record('other body', 0.05, 0.0, 0.0)
+        self.assertEqual([0.3, 0.05], [sample.seconds for sample in sampler.slowest()])
+
+    def test_truncate_and_export(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        sampler = Sampler(every=1, size=5, store='truncate', max_chars=20)
+        long_text = 'first line\nsecond line\nthird line'
+        sampler.record(long_text, 0.2, 0.0, 0.0)
+        sampler.record('short', 0.1, 0.0, 0.0)
+        slow, fast = sampler.slowest()
+        self.assertEqual(('first line', True), (slow.text, slow.truncated))
+        self.assertEqual(('short', False), (fast.text, fast.truncated))
+
+        paths = sampler.export_fixtures(directory)
+        self.assertEqual([fast.name + '.txt'], [os.path.basename(path) for path in paths])
+        self.assertFalse(os.path.exists(os.path.join(directory, slow.name + '.txt')))
+
+        full = {slow.digest: long_text}
+        paths = sampler.export_fixtures(directory, lookup=full.get)
+        self.assertEqual([slow.name + '.txt', fast.name + '.txt'], [os.path.basename(path) for path in paths])
+        with open(paths[0], encoding='utf-8') as f:
+            self.assertEqual(long_text, f.read())
+
+    def test_export_keeps_text_as_read(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        sampler = Sampler(every=1, store='truncate')
+        text = 'Grüße\r\n\r\n> 引用'
+        sampler.record(text, 0.1, 0.0, 0.0)
+        paths = sampler.export_fixtures(directory)
+        with open(paths[0], 'rb') as f:
+            self.assertEqual(text.encode('utf-8'), f.read())
+
+    def test_hashed_inputs_need_lookup(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        sampler = Sampler(every=1)
+        EmailReplyParser.read('Hello', sampler=sampler)
+        self.assertEqual([], sampler.export_fixtures(directory))
+        paths = sampler.export_fixtures(directory, lookup=lambda digest: 'Hello')
+        self.assertEqual(1, len(paths))
+
+    def test_threads(self):
+        sampler = Sampler(every=4, size=4)
+        texts = self.texts * 4
+        with ThreadPoolExecutor(4) as executor:
+            list(executor.map(lambda text: EmailMessage(text, sampler=sampler).read(), texts))
+        self.assertEqual((len(texts) + 3) // 4, sampler.sampled)
+        self.assertEqual(4, len(sampler.slowest()))
+
+    def test_invalid_settings(self):
+        with self.assertRaises(ValueError):
+            Sampler(every=0)
+        with self.assertRaises(ValueError):
+            Sampler(store='plain')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import json
+import os
+import pickle
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from email_reply_parser import EmailReplyParser
+from email_reply_parser import bench, harness, serialization
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'emails')
+SLOW = os.environ.get('EMAIL_REPLY_PARSER_SLOW_TESTS')
+
+
+class SerializationTest(unittest.TestCase):
+    def setUp(self):
+        self.bodies = [text for _, text in harness.fixture_corpus(FIXTURES)]
+        self.messages = [EmailReplyParser.read(text) for text in self.bodies]
+
+    def assertSameResult(self, message, view):
+        self.assertEqual(message.reply, view.reply)
+        self.assertEqual(message.chain, view.chain)
+        self.assertEqual(
+            [(f.content, f.quoted, f.signature, f.headers, f.hidden) for f in message.fragments],
+            [(f.content, f.quoted, f.signature, f.headers, f.hidden) for f in view.fragments])
+
+    def test_round_trip_with_text(self):
+        for message in self.messages:
+            self.assertSameResult(message, serialization.loads(serialization.dumps(message, include_text=True)))
+
+    def test_round_trip_with_original_body(self):
+        for body, message in zip(self.bodies, self.messages):
+            self.assertSameResult(message, serialization.loads(serialization.dumps(message), text=body))
+
+    def test_round_trip_json(self):
+        for body, message in zip(self.bodies, self.messages):
+            data = json.loads(json.dumps(serialization.to_dict(message)))
+            self.assertSameResult(message, serialization.from_dict(data, text=body))
+            data = json.loads(json.dumps(serialization.to_dict(message, include_text=True)))
+            self.assertSameResult(message, serialization.from_dict(data))
+
+    def test_fragment_spans(self):
+        for message in self.messages:
+            position = 0
+            for f in message.fragments:
+                self.assertEqual(position, f.start)
+                self.assertEqual(f.content, message.text[f.start:f.end].strip())
+                position = f.end + 1
+            self.assertEqual(len(message.text) + 1, position)
+
+    def test_smaller_than_pickle(self):
+        compact = sum(len(serialization.dumps(m)) for m in self.messages)
+        pickled = sum(len(pickle.dumps(m)) for m in self.messages)
+        self.assertTrue(compact * 10 < pickled, (compact, pickled))
+
+        compact = sum(len(serialization.dumps(m, include_text=True)) for m in self.messages)
+        self.assertTrue(compact * 3 < pickled, (compact, pickled))
+
+    def test_embedded_text_is_decoded_lazily(self):
+        message = EmailReplyParser.read('Hi Bob\n\nOn Mon, Bob wrote:\n> %s' % ('quoted\n> ' * 1000))
+        view = serialization.loads(serialization.dumps(message, include_text=True))
+        self.assertEqual('Hi Bob', view.reply)
+        self.assertIsNone(view._text.text)
+        self.assertEqual(message.text, view.text)
+
+        message = EmailReplyParser.read('Grüße\n\n> quoted')
+        data = serialization.dumps(message, include_text=True)
+        self.assertEqual('Grüße', serialization.loads(data).reply)
+        view = serialization.loads(data.replace('Grüße'.encode('utf-8'), b'Gruesse'))
+        self.assertRaises(ValueError, getattr, view, 'reply')
+
+    @unittest.skipUnless(SLOW, 'timed, set EMAIL_REPLY_PARSER_SLOW_TESTS=1 to run')
+    def test_loads_faster_than_pickle(self):
+        bench.check_load_speed(self.bodies * 10)
+
+    def test_opaque_flag(self):
+        message = EmailReplyParser.read('Hi\n\n%s\n\n> quoted' % ('A' * 10000))
+        view = serialization.loads(serialization.dumps(message, include_text=True))
+        self.assertEqual([True, False], [f.opaque for f in view.fragments])
+
+    def test_view_is_read_only(self):
+        view = serialization.loads(serialization.dumps(self.messages[0], include_text=True))
+        self.assertRaises(AttributeError, setattr, view, 'text', '')
+        self.assertRaises(AttributeError, setattr, view.fragments[0], 'hidden', True)
+
+    def test_rejects_wrong_text(self):
+        data = serialization.dumps(self.messages[0])
+        self.assertRaises(ValueError, serialization.loads, data)
+        self.assertRaises(ValueError, serialization.loads, data, text='something else')
+        self.assertRaises(ValueError, serialization.loads, b'nope')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from email_reply_parser import EmailReplyParser
+from email_reply_parser import harness, tracing
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'emails')
+
+
+class TracingTest(unittest.TestCase):
+    def test_same_results(self):
+        corpus = list(harness.fixture_corpus(FIXTURES))
+        corpus += list(harness.generated_corpus(300, seed=3, fixtures=corpus))
+        report = harness.run(lambda text: EmailReplyParser.read(text, trace=True), corpus,
+                             reference=EmailReplyParser.read, shrink_failures=False)
+        self.assertTrue(report.ok, report.summary())
+
+        report = harness.run(lambda text: EmailReplyParser.read(text, locales=['de'], trace=True), corpus,
+                             reference=lambda text: EmailReplyParser.read(text, locales=['de']),
+                             shrink_failures=False)
+        self.assertTrue(report.ok, report.summary())
+
+    def test_fragment_rules(self):
+        message = self.get_email('email_1_2', trace=True)
+        self.assertEqual([None], [f.rules for f in message.fragments][:1])
+        self.assertEqual([tracing.QUOTED, tracing.QUOTE_HEADER], message.fragments[1].rules)
+        self.assertEqual([tracing.QUOTED, tracing.HIDDEN_BEFORE_VISIBLE], message.fragments[3].rules)
+        self.assertIn(tracing.UNDERSCORE_SIGNATURE, message.fragments[-1].rules)
+
+        message = self.get_email('email_iPhone', trace=True)
+        self.assertIn(tracing.SENT_FROM_MY, message.fragments[-1].rules)
+
+        message = self.get_email('email_headers_no_delimiter', trace=True)
+        self.assertTrue(any(f.rules and tracing.HEADERS_HIDE_PREVIOUS in f.rules for f in message.fragments))
+
+        message = self.get_email('separator-border', trace=True)
+        self.assertIn(tracing.DASH_LOOKAHEAD, message.fragments[0].rules)
+
+    def test_untraced(self):
+        message = self.get_email('email_1_2')
+        self.assertIsNone(message.trace)
+        self.assertTrue(all(f.rules is None for f in message.fragments))
+        self.assertRaises(ValueError, tracing.aggregate, [message])
+
+    def test_aggregate(self):
+        messages = [EmailReplyParser.read(text, trace=True) for _, text in harness.fixture_corpus(FIXTURES)]
+        total = tracing.aggregate(messages)
+        self.assertEqual(len(messages), total.messages)
+        lines = sum(len(m.lines) for m in messages)
+        self.assertEqual(lines, total.calls[tracing.QUOTE_HEADER])
+        self.assertEqual(len(messages), total.calls[tracing.NORMALIZE])
+        self.assertTrue(all(rule in tracing.RULES for rule, _, _, _, _ in total.rows()))
+        self.assertTrue(total.seconds[tracing.QUOTE_HEADER] > 0)
+
+        report = tracing.format_report(total)
+        self.assertIn('concatenated_headers', report)
+        self.assertTrue(report.endswith('%d messages' % len(messages)))
+
+    def get_email(self, name, trace=False):
+        with open(os.path.join(FIXTURES, '%s.txt' % name)) as f:
+            return EmailReplyParser.read(f.read(), trace=trace)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+import io
+import json
+import os
+import struct
+import subprocess
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from email_reply_parser import EmailReplyParser
+from email_reply_parser import harness, worker
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'emails')
+
+
+class FlushCounter(io.BytesIO):
+    def __init__(self):
+        io.BytesIO.__init__(self)
+        self.flushes = 0
+
+    def flush(self):
+        self.flushes += 1
+
+
+class BrokenPipe(io.BytesIO):
+    def write(self, data):
+        raise BrokenPipeError()
+
+
+class WorkerTest(unittest.TestCase):
+    def setUp(self):
+        self.texts = [text for _, text in harness.fixture_corpus(FIXTURES)]
+        self.jsonl = b''.join(json.dumps({'id': i, 'text': text}).encode('utf-8') + b'\n'
+                              for i, text in enumerate(self.texts))
+
+    def test_jsonl(self):
+        out = io.BytesIO()
+        self.assertEqual(len(self.texts), worker.run(io.BytesIO(self.jsonl), out, batch_size=7))
+        results = [json.loads(line) for line in out.getvalue().decode('utf-8').splitlines()]
+        self.assertEqual(list(range(len(self.texts))), [r['id'] for r in results])
+        for text, result in zip(self.texts, results):
+            message = EmailReplyParser.read(text)
+            self.assertEqual({'id', 'reply', 'chain'}, set(result))
+            self.assertEqual((message.reply, message.chain), (result['reply'], result['chain']))
+
+    def test_workers_keep_order(self):
+        serial = io.BytesIO()
+        worker.run(io.BytesIO(self.jsonl), serial, batch_size=3)
+        parallel = io.BytesIO()
+        worker.run(io.BytesIO(self.jsonl), parallel, batch_size=3, workers=2)
+        self.assertEqual(serial.getvalue(), parallel.getvalue())
+
+    def test_frames(self):
+        frames = b''.join(struct.pack('>I', len(data)) + data for data in (t.encode('utf-8') for t in self.texts))
+        out = io.BytesIO()
+        worker.run(io.BytesIO(frames), out, input_format='frames', output_format='frames', fields=['reply'])
+        data = out.getvalue()
+        results = []
+        while data:
+            size, = struct.unpack('>I', data[:4])
+            results.append(json.loads(data[4:4 + size].decode('utf-8')))
+            data = data[4 + size:]
+        self.assertEqual([{'reply': EmailReplyParser.parse_reply(t)} for t in self.texts], results)
+
+        self.assertRaises(ValueError, worker.run, io.BytesIO(frames[:-1]), io.BytesIO(), input_format='frames')
+
+    def test_bad_records(self):
+        out = io.BytesIO()
+        worker.run(io.BytesIO(b'"Hi there"\n\nnot json\n{"id": 3}\n'), out, fields=['reply', 'fragments'])
+        results = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual('Hi there', results[0]['reply'])
+        self.assertEqual('Hi there', results[0]['fragments'][0]['content'])
+        self.assertIn('error', results[1])
+        self.assertEqual(3, results[2]['id'])
+        self.assertIn('error', results[2])
+
+    def test_unencodable_records(self):
+        out = io.BytesIO()
+        records = b'{"id": 1, "text": "Hi"}\n{"id": 2, "text": "\\ud800 x"}\n{"id": 3, "text": "Bye"}\n'
+        self.assertEqual(3, worker.run(io.BytesIO(records), out))
+        results = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([1, 2, 3], [r['id'] for r in results])
+        self.assertEqual('Hi', results[0]['reply'])
+        self.assertIn('surrogates not allowed', results[1]['error'])
+        self.assertNotIn('reply', results[1])
+        self.assertEqual('Bye', results[2]['reply'])
+
+    def test_flush(self):
+        batches = (len(self.texts) + 19) // 20
+        for flush, expected in [('record', len(self.texts) + 1), ('batch', batches + 1), ('end', 1)]:
+            out = FlushCounter()
+            worker.run(io.BytesIO(self.jsonl), out, batch_size=20, flush=flush)
+            self.assertEqual(expected, out.flushes, flush)
+
+    def test_timeout(self):
+        out = io.BytesIO()
+        worker.run(io.BytesIO(self.jsonl), out, timeout=0)
+        results = [json.loads(line) for line in out.getvalue().decode('utf-8').splitlines()]
+        self.assertEqual(len(self.texts), len(results))
+        self.assertTrue(all(r['error'] == 'Parse deadline exceeded' for r in results))
+
+        out = io.BytesIO()
+        worker.run(io.BytesIO(self.jsonl), out, timeout=60)
+        self.assertNotIn(b'"error"', out.getvalue())
+
+    def test_invalid_options(self):
+        self.assertRaises(ValueError, worker.run, io.BytesIO(), io.BytesIO(), fields=['html'])
+        self.assertRaises(ValueError, worker.run, io.BytesIO(), io.BytesIO(), flush='never')
+        self.assertRaises(ValueError, worker.run, io.BytesIO(), io.BytesIO(), locales=['xx'])
+
+    def test_command_line(self):
+        root = os.path.join(os.path.dirname(__file__), '..')
+        result = subprocess.run(
+            [sys.executable, '-m', 'email_reply_parser', '--fields', 'reply', '--locales', 'de'],
+            input=self.jsonl, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=root, check=True)
+        lines = result.stdout.splitlines()
+        self.assertEqual(len(self.texts), len(lines))
+        self.assertEqual(EmailReplyParser.parse_reply(self.texts[0]), json.loads(lines[0])['reply'])
+
+        result = subprocess.run([sys.executable, '-m', 'email_reply_parser', '--disable', 'nothing'],
+                                input=b'', stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=root)
+        self.assertEqual(1, result.returncode)
+        self.assertIn(b'Unknown stage', result.stderr)
+
+    def test_broken_pipe(self):
+        with self.assertRaises(BrokenPipeError):
+            worker.run(io.BytesIO(self.jsonl * 5), BrokenPipe(), workers=2, batch_size=1)
+
+        root = os.path.join(os.path.dirname(__file__), '..')
+        with tempfile.TemporaryFile() as stdin:
+            stdin.write(self.jsonl * 20)
+            stdin.seek(0)
+            process = subprocess.Popen([sys.executable, '-m', 'email_reply_parser', '--flush', 'record'],
+                                       stdin=stdin, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=root)
+            process.stdout.close()
+            stderr = process.stderr.read()
+            process.stderr.close()
+            self.assertEqual(0, process.wait())
+        self.assertEqual(b'', stderr)
+
+
+if __name__ == '__main__':
+    unittest.main()